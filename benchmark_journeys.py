@@ -0,0 +1,93 @@
+from tgbot.misc.setup_django import setup_django; setup_django()
+import random
+import datetime
+import statistics
+import time
+
+from django.utils import timezone
+
+from tgbot.services.journeys import ConnectionScan
+from tgbot.services.timetable import RouteStop, RouteTimetable
+
+
+def generate_routes(
+    stations: int,
+    routes: int,
+    stops_per_route: int,
+    days: int,
+    seed: int = 0,
+) -> list[RouteTimetable]:
+    '''Routes of random stations departing at random times of the days'''
+    rng = random.Random(seed)
+    start = timezone.make_aware(datetime.datetime.combine(
+        datetime.date.today(), datetime.time(),
+    ))
+    generated = []
+    for route_id in range(routes):
+        departure_time = start + datetime.timedelta(
+            minutes=rng.randrange(days * 24 * 60),
+        )
+        stops = []
+        for station_index, station_id in enumerate(
+            rng.sample(range(stations), stops_per_route),
+        ):
+            stops.append(RouteStop(station_id, station_index, departure_time))
+            departure_time += datetime.timedelta(minutes=rng.randint(20, 120))
+        generated.append(
+            RouteTimetable(
+                id=route_id,
+                code=str(route_id),
+                bus_id=route_id,
+                seats=50,
+                stops=tuple(stops),
+                prices={},
+                disallowed_ways=frozenset(),
+            )
+        )
+    return generated
+
+
+def main():
+    stations, routes, stops_per_route, days, searches = 500, 3000, 12, 14, 1000
+    rng = random.Random(1)
+    generated = generate_routes(stations, routes, stops_per_route, days)
+
+    started = time.perf_counter()
+    scan = ConnectionScan(generated)
+    print(f'Connections built in {time.perf_counter() - started:.3f} s')
+
+    seats_taken = {
+        (route.id, segment_index): rng.randint(40, 50)
+        for route in generated
+        for segment_index in range(stops_per_route - 1)
+        if rng.random() < 0.1
+    }
+    now = timezone.now()
+    timings = []
+    found = 0
+    for _ in range(searches):
+        start_station_id, end_station_id = rng.sample(range(stations), 2)
+        after = now + datetime.timedelta(days=rng.randrange(days))
+        started = time.perf_counter()
+        journey = scan.search(
+            start_station_id=start_station_id,
+            end_station_id=end_station_id,
+            after=after,
+            departure_before=after + datetime.timedelta(days=1),
+            arrival_before=after + datetime.timedelta(days=2),
+            min_transfer_time=datetime.timedelta(minutes=15),
+            seats_taken=seats_taken,
+        )
+        timings.append(time.perf_counter() - started)
+        found += journey is not None
+    timings.sort()
+    print(
+        f'{searches} searches, {found} found\n'
+        f'median: {statistics.median(timings) * 1000:.2f} ms\n'
+        f'p95: {timings[int(len(timings) * 0.95)] * 1000:.2f} ms\n'
+        f'max: {timings[-1] * 1000:.2f} ms'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@ from datetime import datetime
 
 from aiogram import Bot, Dispatcher
 from aiogram import types
-from aioredis import ConnectionPool
+from aioredis import ConnectionPool, Redis
 from aiogram.types import BotCommand
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -29,10 +29,24 @@ from tgbot.filters.inline_query_to_send import InlineQueryToSend
 from tgbot.middlewares.redis import RedisMiddleware
 from tgbot.filters.operator_deep_link import OperatorDeepLink
 from tgbot.middlewares.environment import EnvironmentMiddleware
-from tgbot.services.ticket_generator import TicketGenerator
+from tgbot.services.ticket_generator import TicketGenerator, TicketArtifacts
+from tgbot.services.timetable import Timetable
+from tgbot.services.reservations import ReservationSweeper
+from tgbot.services.reminders import ReminderDispatcher
+from tgbot.services.broadcasts import Broadcaster
+from tgbot.services.search_cache import RouteSearchCache
+from tgbot.services.journeys import JourneyPlanner
+from tgbot.services import invalidation
+from tgbot.services.user_profiles import user_profiles
+from tgbot.services.db_executor import db_executor
+from tgbot.services.async_db import async_db
+from tgbot.services.message_sender import message_sender
+from tgbot.services.station_search import station_search
+from tgbot.services.single_flight import single_flight
 from tgbot.filters.state_exclude import StatesExcludeFilter
 from tgbot.middlewares.locale import LocaleMiddleware
 from tgbot.handlers.share_bot import register_share_bot_handlers
+from tgbot.handlers.station_autocomplete import register_station_autocomplete_handlers
 from tgbot.handlers.send_package import register_send_package_handlers
 from tgbot.handlers.search_tickets import register_search_tickets_handlers
 from tgbot.handlers.docs import register_docs_handlers
@@ -50,6 +64,13 @@ def register_all_middlewares(
     i18n: LocaleMiddleware,
     ticket_generator: TicketGenerator,
     redis_connection_pool: ConnectionPool,
+    timetable: Timetable,
+    ticket_artifacts: TicketArtifacts,
+    reservations: ReservationSweeper,
+    reminders: ReminderDispatcher,
+    broadcaster: Broadcaster,
+    search_cache: RouteSearchCache,
+    journey_planner: JourneyPlanner,
     ):
     dp.setup_middleware(
         EnvironmentMiddleware(
@@ -59,6 +80,13 @@ def register_all_middlewares(
             scheduler=scheduler,
             i18n=i18n,
             ticket_generator=ticket_generator,
+            timetable=timetable,
+            ticket_artifacts=ticket_artifacts,
+            reservations=reservations,
+            reminders=reminders,
+            broadcaster=broadcaster,
+            search_cache=search_cache,
+            journey_planner=journey_planner,
         )
     )
     dp.setup_middleware(
@@ -88,6 +116,7 @@ def register_all_handlers(dp: Dispatcher):
     register_menu_handlers(dp)
     register_start_handlers(dp)
     register_share_bot_handlers(dp)
+    register_station_autocomplete_handlers(dp)
     # register_request_operator_handlers(dp)
     register_error_handlers(dp)
     register_search_tickets_handlers(dp)
@@ -112,6 +141,7 @@ async def main():
     )
     logger.info("Starting bot")
     config = load_config(".env")
+    db_executor.setup(config.db.pool_size)
 
     
     job_stores = {
@@ -129,6 +159,13 @@ async def main():
     redis_connection_pool = ConnectionPool.from_url(config.redis.url)
     i18n = LocaleMiddleware(config.locale.domain, config.locale.dir)
     ticket_generator = TicketGenerator()
+    timetable = Timetable()
+    ticket_artifacts = TicketArtifacts(ticket_generator, redis_connection_pool)
+    reservations = ReservationSweeper(redis_connection_pool)
+    reminders = ReminderDispatcher(redis_connection_pool)
+    broadcaster = Broadcaster(redis_connection_pool)
+    search_cache = RouteSearchCache(redis_connection_pool, timetable)
+    journey_planner = JourneyPlanner(timetable)
     scheduler = ContextSchedulerDecorator(AsyncIOScheduler(jobstores=job_stores))
 
 
@@ -140,18 +177,38 @@ async def main():
 
     register_all_middlewares(
         dp, config, storage, scheduler,i18n, 
-        ticket_generator, redis_connection_pool,
+        ticket_generator, redis_connection_pool, timetable,
+        ticket_artifacts, reservations, reminders,
+        broadcaster, search_cache, journey_planner,
     )
     register_all_filters(dp)
     register_all_handlers(dp)
 
-
+    user_profiles.setup(redis_connection_pool)
+    single_flight.setup(redis_connection_pool)
+    await async_db.setup(config.db)
+    invalidation.subscribe('timetable', timetable.invalidate)
+    invalidation_listener = asyncio.create_task(
+        invalidation.listen(Redis(connection_pool=redis_connection_pool))
+    )
+    reservations_sweeper = asyncio.create_task(reservations.run(bot))
+    reminders_dispatcher = asyncio.create_task(reminders.run(bot))
+    await broadcaster.resume(bot)
+    await station_search.warm_up()
 
     # start
     try:
         scheduler.start()
         await dp.start_polling()
     finally:
+        invalidation_listener.cancel()
+        reservations_sweeper.cancel()
+        reminders_dispatcher.cancel()
+        await broadcaster.close()
+        ticket_generator.close()
+        db_executor.close()
+        await async_db.close()
+        await message_sender.close()
         await dp.storage.close()
         await dp.storage.wait_closed()
         await bot.session.close()
@@ -31,7 +31,7 @@ def distinct_in_python(queryset):
     return unique
 
 
-def copy_routes():
+def schedule_regular_routes():
     departure_time_subquery = Subquery(
         models.RouteStation.objects
         .filter(route=OuterRef('pk'))
@@ -48,51 +48,13 @@ def copy_routes():
     last_routes = [route 
                    for route in last_routes
                    if route.is_regular == True]
-    today = timezone.now()
-    in_month = today + datetime.timedelta(weeks=4, )
     for route in last_routes:
-        for week in range(1, 5):
-            new_route_departure_time = \
-                route.route_departure_time + datetime.timedelta(weeks=week)
-            if new_route_departure_time > in_month:
-                new_route_departure_time = \
-                route.route_departure_time + datetime.timedelta(weeks=week-1)
-                week = week - 1
-                break
-            logger.info(f"update {route}")
-        for w in range(1, week +1):
-            new_route_departure_time = \
-                route.route_departure_time + datetime.timedelta(weeks=w)
-            new_route=models.Route.objects.create(
-                start_station=route.start_station,
-                end_station=route.end_station,
-                bus=route.bus,
-                driver=route.driver,
-                is_regular=True,
-                active=True,
-            )
-            for station in models.RouteStation.objects.filter(route=route):
-                models.RouteStation.objects.create(
-                    station_index=station.station_index,
-                    station=station.station,
-                    route=new_route,
-                    departure_time=station.departure_time + datetime.timedelta(weeks=w),
-                )
-            
-            for price in models.Price.objects.filter(route=route):
-                models.Price.objects.create(
-                    route=new_route,
-                    from_station=price.from_station,
-                    to_station=price.to_station,
-                    ticket_price=price.ticket_price,
-                    package_price=price.package_price,
-                )
-            for dis in models.DisallowedWay.objects.filter(route=route):
-                models.DisallowedWay.objects.create(
-                    route=new_route,
-                    from_station = dis.from_station,
-                    to_station = dis.to_station,
-                )
+        # the departures of the next weeks come from the schedule, a route
+        # is created for one only when it is booked
+        if route.schedule_id is not None or route.route_departure_time is None:
+            continue
+        logger.info(f"schedule {route}")
+        models.RouteSchedule.from_route(route)
  
 
 def main():
@@ -104,7 +66,7 @@ def main():
 
     scheduler = BlockingScheduler()
     scheduler.add_job(
-        copy_routes,
+        schedule_regular_routes,
         trigger=IntervalTrigger(days=4),
     )
     scheduler.start()
@@ -10,6 +10,9 @@ class DbConfig:
     password: str
     user: str
     database: str
+    port: int = 5432
+    pool_size: int = 10
+    conn_max_age: int = 60
 
 
 @dataclass
@@ -84,6 +87,9 @@ def load_config(path: str = None):
             password=env.str("DB_PASS"),
             user=env.str("DB_USER"),
             database=env.str("DB_NAME"),
+            port=env.int("DB_PORT", 5432),
+            pool_size=env.int("DB_POOL_SIZE", 10),
+            conn_max_age=env.int("DB_CONN_MAX_AGE", 60),
         ),
         redis=Redis(
             host=env.str("REDIS_HOST"),
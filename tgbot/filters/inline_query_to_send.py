@@ -15,8 +15,5 @@ class InlineQueryToSend(BoundFilter):
     async def check(self, obj):
         if not self.is_send_message or not obj.via_bot :
             return False
-        users = await db.get_telegram_users()
-        if obj.text in [user.full_name for user in users]:
-            return True
-        return False
+        return await db.is_telegram_user_full_name(obj.text)
 
@@ -2,8 +2,7 @@ import typing
 
 from aiogram.dispatcher.filters import BoundFilter
 
-from tgbot.services import db
-from tgbot.misc import schemas
+from tgbot.services.operators import operators
 
 class OperatorFilter(BoundFilter):
     key = 'is_operator'
@@ -14,6 +13,5 @@ class OperatorFilter(BoundFilter):
     async def check(self, obj):
         if self.is_operator is None:
             return False
-        operators: list[schemas.Operator] = await db.get_operators()
-        operators_ids = [operator.telegram_id for operator in operators]
-        return (obj.from_user.id in operators_ids) == self.is_operator
+        is_operator = await operators.is_operator(obj.from_user.id)
+        return is_operator == self.is_operator
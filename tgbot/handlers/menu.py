@@ -1,14 +1,13 @@
-import datetime
 
 from aiogram.dispatcher import Dispatcher, FSMContext
 from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from aiogram.types import CallbackQuery
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.base import JobLookupError
-from apscheduler.job import Job
 
 from tgbot.keyboards import inline
 from tgbot.config import Config
+from tgbot.services.reservations import ReservationSweeper
 
 
 async def show_menu_handler(
@@ -16,6 +15,7 @@ async def show_menu_handler(
     scheduler: AsyncIOScheduler,
     state: FSMContext,
     i18n: I18nMiddleware,
+    reservations: ReservationSweeper,
     ):
     await state.finish()
     try: 
@@ -26,12 +26,7 @@ async def show_menu_handler(
         scheduler.remove_job(f'say_that_ticket_reservation_was_deleted_{call.from_user.id}')
     except JobLookupError:
         pass
-    try: 
-        job: Job = scheduler.get_job('delete_ticket_reservation_{}'.format(call.from_user.id))
-        if job:
-            job.modify(next_run_time=datetime.datetime.now())
-    except JobLookupError:
-        pass
+    await reservations.expire(call.from_user.id)
     await state.finish()
     if call.message.photo:
         await call.message.delete()
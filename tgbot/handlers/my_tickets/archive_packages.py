@@ -1,4 +1,3 @@
-import io
 from aiogram.dispatcher import Dispatcher
 from aiogram.types import CallbackQuery
 from aiogram import types
@@ -7,13 +6,13 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.keyboards import inline
 from tgbot.services import db
 from tgbot.misc import schemas
-from tgbot.services.ticket_generator import TicketGenerator
+from tgbot.services.ticket_generator import TicketArtifacts
 
 
 async def show_package(
     call: CallbackQuery,
     callback_data: dict,
-    ticket_generator: TicketGenerator,
+    ticket_artifacts: TicketArtifacts,
     i18n: I18nMiddleware,
 ):
     page_index = int(callback_data.get('page_index'))
@@ -28,27 +27,26 @@ async def show_package(
         return
     await call.answer()
     package: schemas.Package = packages[page_index]
-    package_image_bytes = await ticket_generator.generate_package(package)
+    photo = await ticket_artifacts.get_package_photo(package)
     markup = inline.archive_package_markup(page_index, len(packages))
-    args = (call, package_image_bytes, package, markup, i18n)
+    args = (call, photo, package, markup, i18n)
     if not call.message.photo:
-        await send_new_and_delete_old_message(*args)
+        message = await send_new_and_delete_old_message(*args)
     else:
-        await edit_existing_message(*args)
+        message = await edit_existing_message(*args)
+    await ticket_artifacts.remember_package_photo(package, message)
  
 
 async def edit_existing_message(
     call: CallbackQuery,
-    package_image_bytes: bytes,
+    photo: str | types.InputFile,
     package: schemas.Package,
     markup: types.InlineKeyboardMarkup,
     i18n: I18nMiddleware,
 ):
-    await call.message.edit_media(
+    return await call.message.edit_media(
         media=types.InputMediaPhoto(
-            media=types.input_file.InputFile(
-                path_or_bytesio=io.BytesIO(package_image_bytes),
-            ),
+            media=photo,
             caption=i18n.gettext(
                 '🎫 <b>Ваші посилки з архіву</b> 🎫\n'
                 '-------------------------------------------\n'
@@ -60,16 +58,14 @@ async def edit_existing_message(
 
 async def send_new_and_delete_old_message(
     call: CallbackQuery,
-    package_image_bytes: bytes,
+    photo: str | types.InputFile,
     package: schemas.Package,
     markup: types.InlineKeyboardMarkup,
     i18n: I18nMiddleware,
 ):
     await call.message.delete()
-    await call.message.answer_photo(
-        photo=types.input_file.InputFile(
-            path_or_bytesio=io.BytesIO(package_image_bytes),
-        ),
+    return await call.message.answer_photo(
+        photo=photo,
         caption=i18n.gettext(
             '🎫 <b>Ваші посилки з архіву</b> 🎫\n'
             '-------------------------------------------\n'
@@ -5,6 +5,7 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.keyboards import inline
 from tgbot.misc import schemas
 from tgbot.services import db
+from tgbot.services.async_db import async_db
 
 
 async def show_main(
@@ -18,7 +19,7 @@ async def show_main(
     else:
         answer = call.message.edit_text
 
-    valid_tickets: list[schemas.Ticket] = await db.get_user_valid_tickets(
+    valid_tickets: list[schemas.Ticket] = await async_db.get_user_valid_tickets(
         telegram_id=call.from_user.id,
     )
     archive_tickets: list[schemas.Ticket] = await db.get_user_archive_tickets(
@@ -1,4 +1,3 @@
-import io
 import logging
 
 from aiogram.dispatcher import Dispatcher
@@ -7,19 +6,19 @@ from aiogram import types
 from aiogram.contrib.middlewares.i18n import I18nMiddleware
 
 from tgbot.keyboards import inline
-from tgbot.services import db
-from tgbot.services.ticket_generator import TicketGenerator
+from tgbot.services.async_db import async_db
+from tgbot.services.ticket_generator import TicketArtifacts
 from tgbot.misc import schemas
 
 
 async def show_ticket(
     call: CallbackQuery,
     callback_data: dict,
-    ticket_generator: TicketGenerator,
+    ticket_artifacts: TicketArtifacts,
     i18n: I18nMiddleware,
 ):
     page_index = int(callback_data.get('page_index'))
-    tickets: list[schemas.Ticket] = await db.get_user_valid_tickets(
+    tickets: list[schemas.Ticket] = await async_db.get_user_valid_tickets(
         call.from_user.id,
     )
     if not tickets:
@@ -30,27 +29,26 @@ async def show_ticket(
         return
     await call.answer()
     ticket: schemas.Ticket = tickets[page_index]
-    ticket_image_bytes = await ticket_generator.generate_ticket(ticket)
+    photo = await ticket_artifacts.get_ticket_photo(ticket)
     markup = inline.ticket_markup(ticket, page_index, len(tickets), i18n)
-    args = (call, ticket_image_bytes, ticket, markup, i18n)
+    args = (call, photo, ticket, markup, i18n)
     if not call.message.photo:
-        await send_new_and_delete_old_message(*args)
+        message = await send_new_and_delete_old_message(*args)
     else:
-        await edit_existing_message(*args)
+        message = await edit_existing_message(*args)
+    await ticket_artifacts.remember_ticket_photo(ticket, message)
  
 
 async def edit_existing_message(
     call: CallbackQuery,
-    ticket_image_bytes: bytes,
+    photo: str | types.InputFile,
     ticket: schemas.Ticket,
     markup: types.InlineKeyboardMarkup,
     i18n: I18nMiddleware,
 ):
-    await call.message.edit_media(
+    return await call.message.edit_media(
         media=types.InputMediaPhoto(
-            media=types.input_file.InputFile(
-                path_or_bytesio=io.BytesIO(ticket_image_bytes),
-            ),
+            media=photo,
             caption=i18n.gettext(
                 '🎫 <b>Ваші квитки</b> 🎫\n'
                 '-------------------------------------------\n'
@@ -67,16 +65,14 @@ async def edit_existing_message(
 
 async def send_new_and_delete_old_message(
     call: CallbackQuery,
-    ticket_image_bytes: bytes,
+    photo: str | types.InputFile,
     ticket: schemas.Ticket,
     markup: types.InlineKeyboardMarkup,
     i18n: I18nMiddleware,
 ):
     await call.message.delete()
-    await call.message.answer_photo(
-        photo=types.input_file.InputFile(
-            path_or_bytesio=io.BytesIO(ticket_image_bytes),
-        ),
+    return await call.message.answer_photo(
+        photo=photo,
         caption=i18n.gettext(
             '🎫 <b>Ваші квитки</b> 🎫\n'
             '-------------------------------------------\n'
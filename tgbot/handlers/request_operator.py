@@ -13,6 +13,7 @@ from tgbot.keyboards import inline
 from tgbot.keyboards import reply
 from tgbot.misc import schemas
 from tgbot.services import db
+from tgbot.services.reservations import ReservationSweeper
 from tgbot.handlers.request_call import send_request_call_to_operators
 from tgbot.handlers import menu
 
@@ -141,11 +142,12 @@ async def cancel_operator_request(
     state: FSMContext,
     i18n: I18nMiddleware,
     scheduler: AsyncIOScheduler,
+    reservations: ReservationSweeper,
     ):
     await state.finish()
     if scheduler.get_job(f'request_operator_{call.from_user.id}'):
         scheduler.remove_job(f'request_operator_{call.from_user.id}')
-    await menu.show_menu_handler(call, scheduler, state, i18n)
+    await menu.show_menu_handler(call, scheduler, state, i18n, reservations)
 
 async def start_support_conversation(
     call: CallbackQuery,
@@ -6,7 +6,8 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 
 from tgbot.keyboards import inline
 from tgbot.services import db
-from tgbot.misc import states
+from tgbot.services.station_search import station_search
+from tgbot.misc import schemas, states
 
 
 async def get_station_name_from_message(
@@ -14,9 +15,12 @@ async def get_station_name_from_message(
     i18n: I18nMiddleware,
     state: FSMContext,
 ):
-    finded_stations = await db.search_station_by_name(
+    user: schemas.TelegramUser = await db.get_telegram_user(
+        message.from_user.id,
+    )
+    finded_stations = await station_search.search(
         message.text,
-        telegram_id=message.from_user.id,
+        language_id=user.language.id,
     )
     if finded_stations:
         text = finded_stations_text(i18n)
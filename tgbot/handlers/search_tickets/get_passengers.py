@@ -15,7 +15,9 @@ from tgbot.config import Config
 
 from tgbot.keyboards import reply, inline
 from tgbot.services import db
-from tgbot.misc import states, schemas
+from tgbot.services.reservations import ReservationSweeper
+from tgbot.services.async_db import async_db
+from tgbot.misc import states, schemas, exceptions
 from tgbot.handlers.search_tickets.payloads import ticket_payment_payload
 
 
@@ -38,11 +40,15 @@ async def get_passengers(
         route_code,
     ) = regexp_command.groups()
 
-    route = await db.get_route(
+    route = await async_db.get_route(
         start_station_code,
         end_station_code,
         route_code,
     )
+    if route is None:
+        return await message.answer(
+            text=i18n.gettext('🚫 Цей рейс більше недоступний'),
+        )
 
     if route.available_seats // 5:
         show_seats = 5
@@ -187,7 +193,7 @@ async def get_passenger_full_name(
     i18n: I18nMiddleware,
     state: FSMContext,
     config: Config,
-    scheduler: AsyncIOScheduler,
+    reservations: ReservationSweeper,
     redis: Redis,
 ):
     state_data = await state.get_data()
@@ -236,17 +242,27 @@ async def get_passenger_full_name(
         )
     
 
-    booked_tickets = []
-    for person in persons:
-        ticket: schemas.Ticket = await db.book_ticket(
+    try:
+        booked_tickets: list[schemas.Ticket] = await db.book_tickets(
             route_id=state_data['route'].id,
             start_station_id=state_data['route'].user_start_station.id,
             end_station_id=state_data['route'].user_end_station.id,
             telegram_id=message.from_user.id,
-            passenger=person,
-            type_id=state_data['passenger_info'][person.id]['ticket_type_id'],
+            passengers=[
+                (
+                    person,
+                    state_data['passenger_info'][person.id]['ticket_type_id'],
+                ) for person in persons
+            ],
+            route_code=state_data['route'].code,
+        )
+    except exceptions.NotEnoughSeats as error:
+        return await message.answer(
+            text=i18n.gettext(
+                '😔 Поки ви оформлювали замовлення, місця закінчились.\n'
+                'Доступно місць: {available_seats}'
+            ).format(available_seats=error.available_seats),
         )
-        booked_tickets.append(ticket)
 
     text = generate_payment_message(booked_tickets, i18n)
 
@@ -282,17 +298,14 @@ async def get_passenger_full_name(
         payment_message.message_id,
     )
 
-    scheduler.add_job(
-        edit_payment_message,
-        trigger='date',
-        run_date=datetime.datetime.now() + datetime.timedelta(minutes=10),
-        kwargs={
-            'user_id': message.from_user.id,
-            'payment_message_id': payment_message.message_id,
-        }
+    await reservations.hold(
+        user_id=message.from_user.id,
+        payment_message_id=payment_message.message_id,
+        tickets_ids=[ticket.id for ticket in booked_tickets],
     )
-    
 
+
+# kept for the jobs which are already in the job store
 async def edit_payment_message(
     bot: Bot,
     user_id: int,
@@ -361,7 +374,7 @@ def register_get_passengers_handlers(dp: Dispatcher):
         get_passengers,
         RegexpCommandsFilter(
             regexp_commands=[
-                r'/ticket_(\w{4})(\w{4})(\w{6})',
+                r'/ticket_(\w{4})(\w{4})(\w{8}|\w{6})',
             ]
         ),
         state='*'
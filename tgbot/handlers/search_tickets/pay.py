@@ -11,9 +11,11 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.base import JobLookupError
 
 from tgbot.services import db
+from tgbot.services.reservations import ReservationSweeper
+from tgbot.services.reminders import ReminderDispatcher
 from tgbot.handlers.search_tickets.payloads import ticket_payment_payload
 from tgbot.handlers.start import start_handler_for_registered
-from tgbot.services.ticket_generator.main import TicketGenerator
+from tgbot.services.ticket_generator import TicketArtifacts
 from tgbot.misc import schemas
 from tgbot.keyboards import inline
 
@@ -39,16 +41,21 @@ async def confirm_payment(
 
 async def succesfull_payment_for_ticket(
     message: Message,
-    ticket_generator: TicketGenerator,
+    ticket_artifacts: TicketArtifacts,
     i18n: I18nMiddleware,
     invoice_payload: dict,
     redis: Redis,
     state: FSMContext,
     scheduler: AsyncIOScheduler,
+    reservations: ReservationSweeper,
+    reminders: ReminderDispatcher,
 ):
     payment_message_id = await redis.get(
         f"ticket_payment_message_id:{message.from_user.id}"
     )
+    await reservations.release(
+        message.from_user.id, int(payment_message_id),
+    )
 
     await message.bot.delete_message(
         chat_id=message.from_user.id,
@@ -66,81 +73,35 @@ async def succesfull_payment_for_ticket(
         bot=message.bot,
         i18n=i18n,
         tickets_ids=tickets_ids,
-        ticket_generator=ticket_generator,
+        ticket_artifacts=ticket_artifacts,
         user_id=message.from_user.id,
     )
 
     await add_remind_to_tickets(
-        bot=message.bot,
+        reminders=reminders,
         ticket_ids=tickets_ids,
-        i18n=i18n,
-        scheduler=scheduler,
-    )
-    await remind_game(
-        scheduler=scheduler,
-        ticket_id=tickets_ids[0],
     )
     await start_handler_for_registered(message, i18n, state, message.bot['config'])
 
-async def remind_game(
-    scheduler: AsyncIOScheduler,
-    ticket_id: int,
-):
-    ticket: schemas.Ticket = await db.get_ticket(ticket_id)
-    try: 
-        scheduler.remove_job(f"play_game:{ticket.ticket_code}")
-    except JobLookupError:
-        pass 
-    
-    scheduler.add_job(
-        recommend_to_play_game,
-        trigger='date',
-        id=f"play_game:{ticket.ticket_code}",
-        run_date=ticket.departure_time + datetime.timedelta(minutes=5),
-        kwargs={
-            'user_id': ticket.owner.telegram_id,
-        }
-    )
-
 async def add_remind_to_tickets(
-    bot: Bot,
+    reminders: ReminderDispatcher,
     ticket_ids: list[int],
-    scheduler: AsyncIOScheduler,
-    i18n: I18nMiddleware,
 ):
-    for ticket_id in ticket_ids:
-        ticket: schemas.Ticket = await db.get_ticket(ticket_id)
-        try:
-            scheduler.remove_job(f"remind_about_ticket_route:{ticket.ticket_code}")
-            scheduler.remove_job(f"remind_about_ticket_route2:{ticket.ticket_code}")
-        except JobLookupError:
-            pass
-        scheduler.add_job(
-            remind_about_ticket_route,
-            trigger='date',   
-            run_date=ticket.departure_time - datetime.timedelta(hours=1),
-            id=f'remind_about_ticket_route:{ticket.ticket_code}',
-            kwargs={
-                'ticket_id': ticket_id,
-            }
-        )
-        scheduler.add_job(
-            remind_about_ticket_route,
-            trigger='date',   
-            run_date=ticket.departure_time - datetime.timedelta(hours=3),
-            id=f'remind_about_ticket_route2:{ticket.ticket_code}',
-            kwargs={
-                'ticket_id': ticket_id,
-            }
-        )
-
+    # tickets of one order share the route and the start station
+    ticket: schemas.Ticket = await db.get_ticket(ticket_ids[0])
+    await reminders.schedule(
+        route_id=ticket.route.id,
+        start_station_id=ticket.start_station.id,
+        departure_time=ticket.departure_time,
+        kinds=reminders.TICKET_REMINDERS,
+    )
 
 
 async def send_tickets(
     bot: Bot,
     i18n: I18nMiddleware,
     tickets_ids: list[int],
-    ticket_generator: TicketGenerator,
+    ticket_artifacts: TicketArtifacts,
     user_id: int,
 ):
     await bot.send_message(
@@ -152,15 +113,16 @@ async def send_tickets(
         )
     )
 
-    for ticket_id in tickets_ids:
-        ticket: schemas.Ticket = await db.get_ticket(ticket_id)
-        ticket_image_bytes = await ticket_generator.generate_ticket(ticket)
-        await bot.send_photo(
+    tickets: list[schemas.Ticket] = [
+        await db.get_ticket(ticket_id) for ticket_id in tickets_ids
+    ]
+    tickets_photos = await ticket_artifacts.get_tickets_photos(tickets)
+    for ticket, photo in zip(tickets, tickets_photos):
+        message = await bot.send_photo(
             chat_id=user_id,
-                photo=input_file.InputFile(
-                io.BytesIO(ticket_image_bytes),
-            )
+            photo=photo,
         )
+        await ticket_artifacts.remember_ticket_photo(ticket, message)
 
         await bot.send_message(
             chat_id=bot.get("config").tg_bot.group_id,
@@ -194,6 +156,8 @@ async def send_tickets(
     # )
 
         
+# recommend_to_play_game and remind_about_ticket_route are kept for the
+# jobs which are already in the job store
 async def recommend_to_play_game(
     bot: Bot,
     user_id: int,
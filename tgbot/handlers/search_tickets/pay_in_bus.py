@@ -6,10 +6,12 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from tgbot.keyboards import inline
 from tgbot.services import db
+from tgbot.services.reservations import ReservationSweeper
+from tgbot.services.reminders import ReminderDispatcher
 from tgbot.handlers.search_tickets.pay import send_tickets
 from tgbot.handlers.start import start_handler_for_registered
-from tgbot.services.ticket_generator.main import TicketGenerator
-from tgbot.handlers.search_tickets.pay import add_remind_to_tickets, remind_game
+from tgbot.services.ticket_generator import TicketArtifacts
+from tgbot.handlers.search_tickets.pay import add_remind_to_tickets
 
 
 async def pay_in_bus(
@@ -17,9 +19,11 @@ async def pay_in_bus(
     callback_data: dict,
     redis: Redis,
     state: FSMContext,
-    ticket_generator: TicketGenerator,
+    ticket_artifacts: TicketArtifacts,
     i18n: I18nMiddleware,
     scheduler: AsyncIOScheduler,
+    reservations: ReservationSweeper,
+    reminders: ReminderDispatcher,
 ):
     await call.answer()
 
@@ -32,6 +36,7 @@ async def pay_in_bus(
     payment_message_id = await redis.get(
         f'ticket_payment_message_id:{call.from_user.id}'
     )
+    await reservations.release(call.from_user.id, int(payment_message_id))
     await call.bot.delete_message(
         chat_id=call.from_user.id,
         message_id=payment_message_id.decode(),
@@ -41,18 +46,12 @@ async def pay_in_bus(
         bot=call.bot,
         i18n=i18n,
         tickets_ids=tickets_ids,
-        ticket_generator=ticket_generator,
+        ticket_artifacts=ticket_artifacts,
         user_id=call.from_user.id,
     )
     await add_remind_to_tickets(
-        bot=call.bot,
+        reminders=reminders,
         ticket_ids=tickets_ids,
-        i18n=i18n,
-        scheduler=scheduler,
-    )
-    await remind_game(
-        scheduler=scheduler,
-        ticket_id=tickets_ids[0],
     )
 
     await start_handler_for_registered(call.message, i18n, state, call.bot['config'])
@@ -0,0 +1,79 @@
+import datetime
+
+from aioredis import Redis
+from aiogram.dispatcher import Dispatcher, FSMContext
+from aiogram.types import CallbackQuery
+from aiogram.contrib.middlewares.i18n import I18nMiddleware
+
+from tgbot.misc import schemas, states
+from tgbot.keyboards import inline
+from tgbot.services.journeys import JourneyPlanner
+from tgbot.services.search_cache import RouteSearchCache
+from tgbot.handlers.search_tickets.route_date import get_route_calendar
+from tgbot.handlers.search_tickets.show_routes import send_routes
+
+
+async def choose_calendar_day(
+    call: CallbackQuery,
+    callback_data: dict,
+    state: FSMContext,
+    i18n: I18nMiddleware,
+    redis: Redis,
+    search_cache: RouteSearchCache,
+    journey_planner: JourneyPlanner,
+):
+    await call.answer()
+    await send_routes(
+        message=call.message,
+        telegram_id=call.from_user.id,
+        date=datetime.datetime.strptime(callback_data['date'], '%Y%m%d'),
+        state=state,
+        i18n=i18n,
+        redis=redis,
+        search_cache=search_cache,
+        journey_planner=journey_planner,
+    )
+
+
+async def show_calendar_page(
+    call: CallbackQuery,
+    callback_data: dict,
+    redis: Redis,
+):
+    chosen_route_data = schemas.ChosenRouteData.parse_raw(
+        await redis.get(f'{call.from_user.id}:chosen_route_data')
+    )
+    await call.answer()
+    await call.message.edit_reply_markup(
+        reply_markup=await get_route_calendar(
+            chosen_route_data.start_station.id,
+            chosen_route_data.end_station.id,
+            datetime.datetime.strptime(
+                callback_data['date_from'], '%Y%m%d',
+            ).date(),
+        ),
+    )
+
+
+async def choose_empty_calendar_day(call: CallbackQuery, i18n: I18nMiddleware):
+    await call.answer(
+        text=i18n.gettext('На цей день немає вільних місць'),
+    )
+
+
+def register_route_calendar_handlers(dp: Dispatcher):
+    dp.register_callback_query_handler(
+        choose_calendar_day,
+        inline.route_calendar_callback.filter(),
+        state=[states.SelectTicket.get_route_date, None],
+    )
+    dp.register_callback_query_handler(
+        show_calendar_page,
+        inline.route_calendar_page_callback.filter(),
+        state=[states.SelectTicket.get_route_date, None],
+    )
+    dp.register_callback_query_handler(
+        choose_empty_calendar_day,
+        text='route_calendar_empty',
+        state='*',
+    )
@@ -1,11 +1,41 @@
+import datetime
+
 from aioredis import Redis
 from aiogram.dispatcher import Dispatcher, FSMContext
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
 from aiogram.contrib.middlewares.i18n import I18nMiddleware
 
+from django.utils import timezone
+
 from tgbot.misc import schemas, states
 from tgbot.services import db
 from tgbot.keyboards import reply, inline
+from tgbot.services.async_db import async_db
+from tgbot.services.timetable import Timetable
+
+
+CALENDAR_DAYS = 16
+
+
+async def get_route_calendar(
+    start_station_id: int,
+    end_station_id: int,
+    date_from: datetime.date | None = None,
+) -> InlineKeyboardMarkup:
+    today = timezone.localdate()
+    date_from = max(date_from or today, today)
+    days = await async_db.get_available_days(
+        start_station_id=start_station_id,
+        end_station_id=end_station_id,
+        date_from=date_from,
+        days=CALENDAR_DAYS,
+    )
+    return inline.route_calendar_markup(
+        days=days,
+        date_from=date_from,
+        days_count=CALENDAR_DAYS,
+        is_first_page=date_from == today,
+    )
 
 
 async def enter_route_date(
@@ -14,6 +44,7 @@ async def enter_route_date(
     callback_data: dict,
     state: FSMContext,
     redis: Redis,
+    timetable: Timetable,
 ):
 
     end_station: schemas.Station = await db.get_station(
@@ -27,7 +58,7 @@ async def enter_route_date(
         )
     chosen_route_data.end_station = end_station
 
-    routes = await db.get_routes_from_to_with_available_seats(
+    routes = await timetable.find_with_available_seats(
         start_station_id=chosen_route_data.start_station.id,
         end_station_id=chosen_route_data.end_station.id,
     )
@@ -43,7 +74,9 @@ async def enter_route_date(
             '🚉 Станція прибуття: {end_station}\n\n'
         ).format(end_station=chosen_route_data.end_station.full_name),
     )
-    if not routes: 
+    if not routes and not await db.has_schedules_between(
+        chosen_route_data.start_station.id, chosen_route_data.end_station.id,
+    ):
         await state.finish()
         return await call.message.answer(
             text=i18n.gettext(
@@ -61,6 +94,13 @@ async def enter_route_date(
         ),
         reply_markup=reply.route_dates_markup(routes=routes),
     )
+    await call.message.answer(
+        text=i18n.gettext('📆 Дні з вільними місцями:'),
+        reply_markup=await get_route_calendar(
+            chosen_route_data.start_station.id,
+            chosen_route_data.end_station.id,
+        ),
+    )
     await redis.set(
         name=f'{call.from_user.id}:chosen_route_data',
         value=chosen_route_data.json()
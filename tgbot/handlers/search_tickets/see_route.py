@@ -8,7 +8,7 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 
 from tgbot.keyboards import inline
 from tgbot.misc import schemas
-from tgbot.services import db
+from tgbot.services.async_db import async_db
 
 
 async def show_route_stations(
@@ -24,13 +24,17 @@ async def show_route_stations(
         route_code,
     ) = regexp_command.groups()
 
-    route_stations = await db.get_route_from_to_stations(
+    route_stations = await async_db.get_route_from_to_stations(
         start_station_code,
         end_station_code,
         route_code,
         message.from_user.id,
     )
-
+    if not route_stations:
+        return await message.answer(
+            text=i18n.gettext('🚫 Цей рейс більше недоступний'),
+            reply_markup=inline.close_markup,
+        )
 
     text = generate_route_stations_message(route_stations, i18n)
     
@@ -65,7 +69,7 @@ def register_see_route_handlers(dp: Dispatcher):
     dp.register_message_handler(
         show_route_stations,
         RegexpCommandsFilter(
-            regexp_commands=[r'/route_(\w{4})(\w{4})(\w{6})$', ]
+            regexp_commands=[r'/route_(\w{4})(\w{4})(\w{8}|\w{6})$', ]
         ),
         state='*',
     )
\ No newline at end of file
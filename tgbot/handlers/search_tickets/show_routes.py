@@ -10,7 +10,13 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.keyboards import reply, inline
 from tgbot.misc import schemas, states
 from tgbot.services import db
-from tgbot.handlers.search_tickets.route_date import enter_route_date
+from tgbot.services.journeys import Journey, JourneyPlanner
+from tgbot.services.search_cache import RouteSearchCache
+from tgbot.services.timetable import Timetable
+from tgbot.services.station_search import station_search
+from tgbot.services.message_sender import message_sender
+from tgbot.handlers.search_tickets.route_date import enter_route_date, \
+    get_route_calendar, CALENDAR_DAYS
 
 
 async def show_routes(
@@ -18,6 +24,8 @@ async def show_routes(
     state: FSMContext,
     i18n: I18nMiddleware,
     redis: Redis,
+    search_cache: RouteSearchCache,
+    journey_planner: JourneyPlanner,
 ):
     if not message.text.count('.') or not message.text.replace('.', '').isdigit() or \
         message.text.split('.')[0].isdigit() and int(message.text.split('.')[0]) > 31 or \
@@ -42,7 +50,28 @@ async def show_routes(
         day=int(day),
         month=int(month),
     )
+    await send_routes(
+        message=message,
+        telegram_id=message.from_user.id,
+        date=date,
+        state=state,
+        i18n=i18n,
+        redis=redis,
+        search_cache=search_cache,
+        journey_planner=journey_planner,
+    )
+
 
+async def send_routes(
+    message: Message,
+    telegram_id: int,
+    date: datetime.datetime,
+    state: FSMContext,
+    i18n: I18nMiddleware,
+    redis: Redis,
+    search_cache: RouteSearchCache,
+    journey_planner: JourneyPlanner,
+):
     await message.answer(
         text=i18n.gettext(
             '🔍 Починаю пошук квитків...'
@@ -51,39 +80,136 @@ async def show_routes(
     )
 
     chosen_route_data = schemas.ChosenRouteData.parse_raw(
-        await redis.get(f'{message.from_user.id}:chosen_route_data')
+        await redis.get(f'{telegram_id}:chosen_route_data')
     )
 
-    routes = await db.get_routes_from_to_in_date(
+    routes, ticket_types = await search_cache.get_routes(
         start_station_id=chosen_route_data.start_station.id,
         end_station_id=chosen_route_data.end_station.id,
         date=date,
-        telegram_id=message.from_user.id,
+        telegram_id=telegram_id,
     )
-    ticket_types = await db.get_ticket_types(message.from_user.id)
     
     if not routes:
+        journeys = [
+            journey for journey in await journey_planner.find(
+                start_station_id=chosen_route_data.start_station.id,
+                end_station_id=chosen_route_data.end_station.id,
+                date=date.date(),
+            )
+            if journey.transfers
+        ]
+        if journeys:
+            await send_journeys(
+                message, telegram_id, journeys, chosen_route_data, date, i18n,
+            )
+            return await state.finish()
+        # the nearest days with free seats instead of guessing again
         return await message.answer(
             text=i18n.gettext(
                 'На жаль, на цю дату немає автобусів 😔'
                 'Спробуйте ввести іншу дату.'
             ),
+            reply_markup=await get_route_calendar(
+                chosen_route_data.start_station.id,
+                chosen_route_data.end_station.id,
+                date.date() - datetime.timedelta(days=CALENDAR_DAYS // 2),
+            ),
         )
 
     messages = generate_messages(routes, ticket_types, i18n)
     for i, message_send in enumerate(messages):
         if i == len(messages) - 1:
-            await message.answer(
+            await message_sender.send(
+                message.chat.id,
+                message.answer,
                 text=''.join(message_send),
                 reply_markup=inline.routes_markup(i18n, chosen_route_data.end_station.id, date.strftime('%d.%m')),
             )
             continue
-        await message.answer(
+        await message_sender.send(
+            message.chat.id,
+            message.answer,
             text=''.join(message_send),
         )
     await state.finish()
 
 
+async def send_journeys(
+    message: Message,
+    telegram_id: int,
+    journeys: list[Journey],
+    chosen_route_data: schemas.ChosenRouteData,
+    date: datetime.datetime,
+    i18n: I18nMiddleware,
+):
+    user: schemas.TelegramUser = await db.get_telegram_user(telegram_id)
+    stations = {}
+    for journey in journeys:
+        for leg in journey.legs:
+            for stop in (leg.start_stop, leg.end_stop):
+                stations[stop.station_id] = await station_search.get_by_id(
+                    stop.station_id, user.language.id,
+                )
+    messages = generate_journey_messages(journeys, stations, i18n)
+    for i, text in enumerate(messages):
+        await message_sender.send(
+            message.chat.id,
+            message.answer,
+            text=text,
+            reply_markup=inline.routes_markup(
+                i18n,
+                chosen_route_data.end_station.id,
+                date.strftime('%d.%m'),
+            ) if i == len(messages) - 1 else None,
+        )
+
+
+def generate_journey_messages(
+    journeys: list[Journey],
+    stations: dict[int, schemas.Station],
+    i18n: I18nMiddleware,
+) -> list[str]:
+    messages = [
+        i18n.gettext(
+            'Прямих автобусів на {date} немає, але можна доїхати '
+            'з пересадками 🔀\n\n'
+            '〰️〰️〰️〰️〰️〰️〰️〰️'
+        ).format(date=journeys[0].departure_time.strftime('%d.%m.%Y')),
+    ]
+    for journey in journeys:
+        text = i18n.gettext(
+            '🕚 відправлення в {departure_time}\n'
+            '🕙 прибуття в {arrival_time}\n'
+            '🔀 Пересадок: {transfers}\n'
+        ).format(
+            departure_time=journey.departure_time.strftime('%d.%m.%Y %H:%M'),
+            arrival_time=journey.arrival_time.strftime('%d.%m.%Y %H:%M'),
+            transfers=journey.transfers,
+        )
+        for leg in journey.legs:
+            start_station = stations[leg.start_stop.station_id]
+            end_station = stations[leg.end_stop.station_id]
+            text += i18n.gettext(
+                '\n🚌 {start_station} — {end_station}\n'
+                '🕚 {departure_time} — 🕙 {arrival_time}\n'
+                '🎫 Вільних місць: {available_seats}\n'
+                '👉 Купити квитки: {buy_command}\n'
+            ).format(
+                start_station=start_station.full_name,
+                end_station=end_station.full_name,
+                departure_time=leg.user_departure_time.strftime('%d.%m %H:%M'),
+                arrival_time=leg.user_arrival_time.strftime('%d.%m %H:%M'),
+                available_seats=leg.available_seats,
+                buy_command=(
+                    '/ticket_' + start_station.code + end_station.code
+                    + leg.route.code
+                ),
+            )
+        messages.append(text + '\n〰️〰️〰️〰️〰️〰️〰️〰️')
+    return messages
+
+
 def generate_messages(
     routes: list[schemas.Route], 
     ticket_types: list[schemas.TicketType],
@@ -97,8 +223,7 @@ def generate_messages(
     ]
     i = 0
     j = 0
-    while routes: 
-        route = routes.pop()
+    for route in reversed(routes):
         prices = ''.join(
             f"💵 {type.name.lower()} - {get_ticket_price(route.ticket_price, type.discount)} грн \n" 
             for type in ticket_types
@@ -151,6 +276,8 @@ async def refresh_routes(
     redis: Redis,
     i18n: I18nMiddleware,
     state: FSMContext,
+    search_cache: RouteSearchCache,
+    journey_planner: JourneyPlanner,
 ):
     await call.message.delete()
     call.message.from_user.id = call.from_user.id
@@ -160,6 +287,8 @@ async def refresh_routes(
         state=state,
         i18n=i18n,
         redis=redis,
+        search_cache=search_cache,
+        journey_planner=journey_planner,
     )
 
 
@@ -168,6 +297,7 @@ async def change_stations(
     redis: Redis,
     i18n: I18nMiddleware,
     state: FSMContext,
+    timetable: Timetable,
 ):
     call.message.from_user.id = call.from_user.id
     chosen_route_data = schemas.ChosenRouteData.parse_raw(
@@ -185,6 +315,7 @@ async def change_stations(
         i18n=i18n,
         callback_data={'station_id': chosen_route_data.end_station.id},
         redis=redis, 
+        timetable=timetable,
     )
 
 
@@ -102,6 +102,7 @@ async def get_receiver_phone(
             'start_station_id': start_station.id,
             'end_station_id': end_station.id,
             'route_id': state_data['route'].id,
+            'route_code': state_data['route'].code,
         }),
     )
 
@@ -6,7 +6,7 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from aiogram.dispatcher.filters.builtin import RegexpCommandsFilter
 
 from tgbot.keyboards import inline
-from tgbot.services import db
+from tgbot.services.async_db import async_db
 from tgbot.misc import states
 
 
@@ -22,11 +22,15 @@ async def enter_sender_full_name(
         route_code,
     ) = regexp_command.groups()
 
-    route = await db.get_route(
+    route = await async_db.get_route(
         start_station_code,
         end_station_code,
         route_code,
     )
+    if route is None:
+        return await message.answer(
+            text=i18n.gettext('🚫 Цей рейс більше недоступний'),
+        )
 
     await states.SelectPackage.get_sender_full_name.set()
     await message.answer(
@@ -99,7 +103,7 @@ def register_get_sender_handlers(dp: Dispatcher):
         enter_sender_full_name,
         RegexpCommandsFilter(
             regexp_commands=[
-                r'\A/package_(\w{4})(\w{4})(\w{6})$',
+                r'\A/package_(\w{4})(\w{4})(\w{8}|\w{6})$',
             ]
         ),    
         state='*',
@@ -13,6 +13,7 @@ from apscheduler.jobstores.base import JobLookupError
 
 
 from tgbot.services import db
+from tgbot.services.reminders import ReminderDispatcher
 from tgbot.misc import schemas
 from tgbot.handlers.start import start_handler_for_registered
 from tgbot.keyboards import inline
@@ -55,6 +56,7 @@ async def successfull_payment_for_package(
     i18n: I18nMiddleware,
     scheduler: AsyncIOScheduler,
     state: FSMContext,
+    reminders: ReminderDispatcher,
 ):
     payment_message_id = await redis.get(
         f'ticket_payment_message_id:{message.from_user.id}'
@@ -69,6 +71,7 @@ async def successfull_payment_for_package(
     package_id = await db.create_package(
         telegram_id=message.from_user.id,
         route_id=package_info['route_id'],
+        route_code=package_info.get('route_code'),
         start_station_id=package_info['start_station_id'],
         end_station_id=package_info['end_station_id'],
         is_paid=True,
@@ -121,10 +124,8 @@ async def successfull_payment_for_package(
     )
 
     await add_remind_to_package(
-        bot=message.bot,
-        package_id=package_id,
-        i18n=i18n,
-        scheduler=scheduler,
+        reminders=reminders,
+        package=package,
     )
     await start_handler_for_registered(
         message, i18n, state, message.bot['config']
@@ -132,37 +133,18 @@ async def successfull_payment_for_package(
 
 
 async def add_remind_to_package(
-    bot: Bot,
-    package_id: int,
-    scheduler: AsyncIOScheduler,
-    i18n: I18nMiddleware,
+    reminders: ReminderDispatcher,
+    package: schemas.Package,
 ):
-    package: schemas.Package = await db.get_package(package_id)
-    try:
-        scheduler.remove_job(f"remind_about_package_route:{package.package_code}")
-        scheduler.remove_job(f"remind_about_package_route2:{package.package_code}")
-    except JobLookupError:
-        pass
-    scheduler.add_job(
-        remind_about_package_route,
-        trigger='date',   
-        run_date=package.departure_time - datetime.timedelta(hours=1),
-        id=f'remind_about_package_route:{package.package_code}',
-        kwargs={
-            'package_id': package_id,
-        }
-    )
-    scheduler.add_job(
-        remind_about_package_route,
-        trigger='date',   
-        run_date=package.departure_time - datetime.timedelta(hours=3),
-        id=f'remind_about_package_route2:{package.package_code}',
-        kwargs={
-            'package_id': package_id,
-        }
+    await reminders.schedule(
+        route_id=package.route.id,
+        start_station_id=package.start_station.id,
+        departure_time=package.departure_time,
+        kinds=reminders.PACKAGE_REMINDERS,
     )
 
 
+# kept for the jobs which are already in the job store
 async def remind_about_package_route(
     bot: Bot,
     package_id: int,
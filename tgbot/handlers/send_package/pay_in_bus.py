@@ -12,6 +12,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from tgbot.handlers.send_package.pay import add_remind_to_package
 from tgbot.handlers.start import start_handler_for_registered
 from tgbot.services import db
+from tgbot.services.reminders import ReminderDispatcher
 from tgbot.keyboards import inline
 from tgbot.services.ticket_generator.main import TicketGenerator
 
@@ -24,6 +25,7 @@ async def pay_for_package_in_bus(
     i18n: I18nMiddleware,
     state: FSMContext,
     scheduler: AsyncIOScheduler,
+    reminders: ReminderDispatcher,
 ):
     await call.answer()
     payment_message_id = await redis.get(
@@ -39,6 +41,7 @@ async def pay_for_package_in_bus(
     package_id = await db.create_package(
         telegram_id=call.from_user.id,
         route_id=package_info['route_id'],
+        route_code=package_info.get('route_code'),
         start_station_id=package_info['start_station_id'],
         end_station_id=package_info['end_station_id'],
         is_paid=False,
@@ -88,10 +91,8 @@ async def pay_for_package_in_bus(
         )
     )
     await add_remind_to_package(
-        bot=call.bot,
-        package_id=package_id,
-        i18n=i18n,
-        scheduler=scheduler,
+        reminders=reminders,
+        package=package,
     )
     await start_handler_for_registered(
         call.message, i18n, state, call.bot['config']
@@ -6,6 +6,7 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.misc import schemas, states
 from tgbot.services import db
 from tgbot.keyboards import reply, inline
+from tgbot.services.timetable import Timetable
 
 
 async def enter_route_date(
@@ -14,6 +15,7 @@ async def enter_route_date(
     callback_data: dict,
     state: FSMContext,
     redis: Redis,
+    timetable: Timetable,
 ):
     await call.answer()
 
@@ -35,7 +37,7 @@ async def enter_route_date(
         value=chosen_route_data.json()
     )
 
-    routes = await db.get_routes_from_to_with_available_seats(
+    routes = await timetable.find_with_available_seats(
         start_station_id=chosen_route_data.start_station.id,
         end_station_id=chosen_route_data.end_station.id,
     )
@@ -50,7 +52,9 @@ async def enter_route_date(
             '🚉 Станція прибуття: {end_station}\n\n'
         ).format(end_station=chosen_route_data.end_station.full_name),
     )
-    if not routes: 
+    if not routes and not await db.has_schedules_between(
+        chosen_route_data.start_station.id, chosen_route_data.end_station.id,
+    ):
         await state.finish()
         return await call.message.answer(
             text=i18n.gettext(
@@ -10,6 +10,8 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.keyboards import reply, inline
 from tgbot.misc import schemas, states
 from tgbot.services import db
+from tgbot.services.search_cache import RouteSearchCache
+from tgbot.services.timetable import Timetable
 from tgbot.handlers.send_package.route_date import enter_route_date
 
 
@@ -18,6 +20,7 @@ async def show_routes(
     state: FSMContext,
     i18n: I18nMiddleware,
     redis: Redis,
+    search_cache: RouteSearchCache,
 ):
     if not message.text.count('.') or not message.text.replace('.', '').isdigit() or \
         message.text.split('.')[0].isdigit() and int(message.text.split('.')[0]) > 31 or \
@@ -55,13 +58,12 @@ async def show_routes(
         await redis.get(f'{message.from_user.id}:chosen_route_data')
     )
 
-    routes = await db.get_routes_from_to_in_date(
+    routes, ticket_types = await search_cache.get_routes(
         start_station_id=chosen_route_data.start_station.id,
         end_station_id=chosen_route_data.end_station.id,
         date=date,
         telegram_id=message.from_user.id,
     )
-    ticket_types = await db.get_ticket_types(message.from_user.id)
     
     if not routes:
         await message.answer(
@@ -101,8 +103,7 @@ def generate_messages(
     ]
     i = 0
     j = 0
-    while routes: 
-        route = routes.pop()
+    for route in reversed(routes):
         messages.append(
             i18n.gettext(
                 '🚌 {start_station} — {end_station}\n'
@@ -149,6 +150,7 @@ async def refresh_routes(
     redis: Redis,
     i18n: I18nMiddleware,
     state: FSMContext,
+    search_cache: RouteSearchCache,
 ):
     await call.message.delete()
     call.message.from_user.id = call.from_user.id
@@ -158,6 +160,7 @@ async def refresh_routes(
         state=state,
         i18n=i18n,
         redis=redis,
+        search_cache=search_cache,
     )
 
 
@@ -166,6 +169,7 @@ async def change_stations(
     redis: Redis,
     i18n: I18nMiddleware,
     state: FSMContext,
+    timetable: Timetable,
 ):
     call.message.from_user.id = call.from_user.id
     chosen_route_data = schemas.ChosenRouteData.parse_raw(
@@ -182,6 +186,7 @@ async def change_stations(
         i18n=i18n,
         callback_data={'station_id': chosen_route_data.end_station.id},
         redis=redis, 
+        timetable=timetable,
         state=state,
     )
 
@@ -191,6 +196,7 @@ async def another_day(
     redis: Redis,
     i18n: I18nMiddleware,
     state: FSMContext,
+    timetable: Timetable,
 ):
     call.message.from_user.id = call.from_user.id
     chosen_route_data = schemas.ChosenRouteData.parse_raw(
@@ -201,6 +207,7 @@ async def another_day(
         i18n=i18n,
         callback_data={'station_id': chosen_route_data.end_station.id},
         redis=redis, 
+        timetable=timetable,
         state=state,
     )
 
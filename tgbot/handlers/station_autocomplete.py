@@ -0,0 +1,112 @@
+import re
+import inspect
+
+from aiogram.dispatcher import Dispatcher
+from aiogram.types import InlineQuery, InlineQueryResultArticle, \
+    InputTextMessageContent, Message, User
+
+from tgbot.misc import schemas, states
+from tgbot.services import db
+from tgbot.services.station_search import station_search
+from tgbot.handlers.search_tickets import end_station as ticket_end_station
+from tgbot.handlers.search_tickets import route_date as ticket_route_date
+from tgbot.handlers.send_package import end_station as package_end_station
+from tgbot.handlers.send_package import route_date as package_route_date
+
+
+STATION_CODE = re.compile(r'#(\d{4})\Z')
+
+# state: callback of a station button in this state
+STATION_CALLBACKS = {
+    states.SelectTicket.get_start_station.state:
+        ticket_end_station.enter_end_station_callback,
+    states.SelectTicket.get_end_station.state:
+        ticket_route_date.enter_route_date,
+    states.SelectPackage.get_start_station.state:
+        package_end_station.enter_end_station_callback,
+    states.SelectPackage.get_end_station.state:
+        package_route_date.enter_route_date,
+}
+
+
+class InlineStationChoice:
+    '''
+    Stands for the CallbackQuery of a station button when the station is
+    chosen in inline mode, so the station callbacks are used as they are.
+    '''
+
+    def __init__(self, from_user: User, message: Message) -> None:
+        self.from_user = from_user
+        self.message = message
+
+    async def answer(self, *args, **kwargs) -> None:
+        pass
+
+
+async def autocomplete_stations(inline_query: InlineQuery):
+    if not await db.is_telegram_user_registered(inline_query.from_user.id):
+        return await inline_query.answer(results=[], is_personal=True)
+    user: schemas.TelegramUser = await db.get_telegram_user(
+        inline_query.from_user.id,
+    )
+    stations = await station_search.complete(
+        inline_query.query, user.language.id,
+    )
+    await inline_query.answer(
+        results=[
+            InlineQueryResultArticle(
+                id=station.code,
+                title=station.full_name,
+                description=f'Код станції: {station.code}',
+                input_message_content=InputTextMessageContent(
+                    message_text=f'🚉 {station.full_name} #{station.code}',
+                ),
+            )
+            for station in stations
+        ],
+        cache_time=300,
+        is_personal=True,
+    )
+
+
+async def choose_inline_station(
+    message: Message,
+    regexp: re.Match,
+    raw_state: str,
+    **data,
+):
+    user: schemas.TelegramUser = await db.get_telegram_user(
+        message.from_user.id,
+    )
+    station = await station_search.get_by_code(
+        regexp.group(1), user.language.id,
+    )
+    await message.delete()
+    if station is None:
+        return
+    station_message = await message.answer(text=f'🚉 {station.full_name}')
+    callback = STATION_CALLBACKS[raw_state]
+    data.update(
+        call=InlineStationChoice(message.from_user, station_message),
+        callback_data={'station_id': station.id},
+    )
+    await callback(**{
+        name: value for name, value in data.items()
+        if name in inspect.signature(callback).parameters
+    })
+
+
+def register_station_autocomplete_handlers(dp: Dispatcher):
+    # registered after share_bot, which takes its own query
+    dp.register_inline_handler(
+        autocomplete_stations,
+        lambda inline_query: inline_query.query != 'share_bot',
+        state='*',
+    )
+    dp.register_message_handler(
+        choose_inline_station,
+        lambda message: message.via_bot.id == message.bot.id \
+            if message.via_bot else False,
+        regexp=STATION_CODE,
+        state=list(STATION_CALLBACKS),
+    )
@@ -4,6 +4,7 @@ from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from tgbot.config import Config
 
 from tgbot.services import db
+from tgbot.services.operators import operators
 from tgbot.keyboards import inline
 from tgbot.misc import schemas
 
@@ -26,8 +27,9 @@ async def see_all_operators(
     )
 
 async def create_markup_for_view_operators(page: int, i18n: I18nMiddleware):
-    operators: list[schemas.Operator] = await db.get_operators()
-    markup = inline.page_navigation_for_operators_markup(operators, page, i18n)
+    markup = inline.page_navigation_for_operators_markup(
+        await operators.get_operators(), page, i18n,
+    )
     return markup
 
 async def view_info_about_operator(
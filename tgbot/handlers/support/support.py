@@ -1,3 +1,6 @@
+import asyncio
+import logging
+
 from aiogram.bot import Bot
 from aiogram.dispatcher import Dispatcher, FSMContext
 from aiogram.types import Message, CallbackQuery, ContentType
@@ -10,22 +13,29 @@ from tgbot.keyboards import inline, reply
 from tgbot.handlers import menu
 from tgbot.misc import schemas
 from tgbot.services import db
+from tgbot.services.operators import operators
+from tgbot.services.message_sender import message_sender
+from tgbot.services.reservations import ReservationSweeper
 from web.app.models import SupportRequest
 
 
+logger = logging.getLogger(__name__)
+
+
 async def cancel_operator_request(
     call: CallbackQuery,
     i18n: I18nMiddleware,
     state: FSMContext,
     scheduler: AsyncIOScheduler,
     callback_data: dict[str, str],
+    reservations: ReservationSweeper,
 ):
     await call.answer()
     try:
         await db.delete_support_request(int(callback_data['id']))
     except SupportRequest.DoesNotExist:
         pass 
-    await menu.show_menu_handler(call, scheduler, state, i18n)
+    await menu.show_menu_handler(call, scheduler, state, i18n, reservations)
 
 
 async def support_handler(message: CallbackQuery, i18n: I18nMiddleware):
@@ -54,15 +64,28 @@ async def send_request_to_operators(
     text: str,
     support_request: schemas.SupportRequest
     ):
-    operators: list[schemas.Operator] = await db.get_operators()
-    for operator in operators:
-        await bot.send_message(
-            chat_id=operator.telegram_id,
-            text=text,
-            reply_markup=inline.confirm_support_request_markup(
-                support_request_id=support_request.id,
-            ),    
-        )
+    reply_markup = inline.confirm_support_request_markup(
+        support_request_id=support_request.id,
+    )
+    operators_list = await operators.get_operators()
+    results = await asyncio.gather(
+        *(
+            message_sender.send_message(
+                bot,
+                chat_id=operator.telegram_id,
+                text=text,
+                reply_markup=reply_markup,
+            )
+            for operator in operators_list
+        ),
+        return_exceptions=True,
+    )
+    for operator, result in zip(operators_list, results):
+        if isinstance(result, Exception):
+            logger.error(
+                'Could not send support request %s to operator %s',
+                support_request.id, operator.telegram_id, exc_info=result,
+            )
 
 async def confirm_support_request_handler(
     call: CallbackQuery,
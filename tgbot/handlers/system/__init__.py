@@ -2,8 +2,12 @@ from aiogram.dispatcher import Dispatcher
 
 from .delete_messages_via_bot import register_delete_messages_via_bot
 from .cancel_callback import register_cancel_handlers
+from .stats import register_stats_handlers
+from .broadcast import register_broadcast_handlers
 
 
 def register_system_handlers(dp: Dispatcher):
     register_cancel_handlers(dp)
-    register_delete_messages_via_bot(dp)
\ No newline at end of file
+    register_delete_messages_via_bot(dp)
+    register_stats_handlers(dp)
+    register_broadcast_handlers(dp)
\ No newline at end of file
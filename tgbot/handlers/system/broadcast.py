@@ -0,0 +1,63 @@
+from aiogram.dispatcher import Dispatcher
+from aiogram import types
+
+from tgbot.services.broadcasts import Broadcaster, format_progress
+
+
+async def start_broadcast(
+    message: types.Message,
+    broadcaster: Broadcaster,
+) -> None:
+    if not message.reply_to_message:
+        return await message.answer(
+            text='Надішліть /broadcast у відповідь на повідомлення для розсилки',
+        )
+    progress_message = await message.answer(text='Розсилка починається...')
+    is_started = await broadcaster.start(
+        bot=message.bot,
+        from_chat_id=message.chat.id,
+        message_id=message.reply_to_message.message_id,
+        progress_message_id=progress_message.message_id,
+    )
+    if not is_started:
+        await progress_message.edit_text(
+            text='Інша розсилка ще триває, /broadcast_stop щоб зупинити її',
+        )
+
+
+async def stop_broadcast(
+    message: types.Message,
+    broadcaster: Broadcaster,
+) -> None:
+    if await broadcaster.cancel():
+        await message.answer(text='Розсилку зупинено')
+    else:
+        await message.answer(text='Немає активної розсилки')
+
+
+async def show_broadcast_progress(
+    message: types.Message,
+    broadcaster: Broadcaster,
+) -> None:
+    progress = await broadcaster.get_progress()
+    if progress is None:
+        return await message.answer(text='Розсилок ще не було')
+    await message.answer(text=format_progress(progress))
+
+
+def register_broadcast_handlers(dp: Dispatcher):
+    dp.register_message_handler(
+        start_broadcast,
+        commands=['broadcast'],
+        is_admin=True,
+    )
+    dp.register_message_handler(
+        stop_broadcast,
+        commands=['broadcast_stop'],
+        is_admin=True,
+    )
+    dp.register_message_handler(
+        show_broadcast_progress,
+        commands=['broadcast_status'],
+        is_admin=True,
+    )
@@ -0,0 +1,59 @@
+from aiogram.dispatcher import Dispatcher
+from aiogram import types
+
+from tgbot.services.db_executor import db_executor
+from tgbot.services.message_sender import message_sender
+from tgbot.services.search_cache import RouteSearchCache
+from tgbot.services.single_flight import single_flight
+
+
+async def show_stats(
+    message: types.Message,
+    search_cache: RouteSearchCache,
+) -> None:
+    db_stats = db_executor.stats()
+    sender_stats = message_sender.stats()
+    search_stats = search_cache.stats()
+    single_flight_stats = single_flight.stats()
+    await message.answer(
+        text=(
+            '<b>Database</b>\n'
+            f'Workers: {db_stats.workers}\n'
+            f'Running: {db_stats.running}\n'
+            f'Queued: {db_stats.queued}\n'
+            f'Calls: {db_stats.calls}\n'
+            f'Average wait: {db_stats.average_wait * 1000:.1f} ms\n'
+            f'Max wait: {db_stats.max_wait * 1000:.1f} ms\n'
+            '\n'
+            '<b>Outbound messages</b>\n'
+            f'Workers: {sender_stats.workers}\n'
+            f'In flight: {sender_stats.in_flight}\n'
+            f'Queued: {sender_stats.transactional_queued} transactional, '
+            f'{sender_stats.promotional_queued} promotional\n'
+            f'Sent: {sender_stats.sent}\n'
+            f'Failed: {sender_stats.failed}\n'
+            f'Flood waits: {sender_stats.flood_waits}\n'
+            f'Average latency: {sender_stats.average_latency * 1000:.1f} ms\n'
+            f'Max latency: {sender_stats.max_latency * 1000:.1f} ms\n'
+            '\n'
+            '<b>Route search cache</b>\n'
+            f'Hits: {search_stats.hits}\n'
+            f'Misses: {search_stats.misses}\n'
+            f'Hit rate: {search_stats.hit_rate:.0%}\n'
+            f'Average hit: {search_stats.average_hit_time * 1000:.1f} ms\n'
+            f'Average miss: {search_stats.average_miss_time * 1000:.1f} ms\n'
+            '\n'
+            '<b>Single flight</b>\n'
+            f'Calls: {single_flight_stats.calls}\n'
+            f'Shared in process: {single_flight_stats.shared}\n'
+            f'From other processes: {single_flight_stats.from_other_process}'
+        ),
+    )
+
+
+def register_stats_handlers(dp: Dispatcher):
+    dp.register_message_handler(
+        show_stats,
+        commands=['stats'],
+        is_admin=True,
+    )
@@ -1,3 +1,5 @@
+import datetime
+
 from aiogram.contrib.middlewares.i18n import I18nMiddleware
 from aiogram import types
 from aiogram.utils.callback_data import CallbackData
@@ -562,6 +564,13 @@ def user_station_history_markup(
                 )
             ]
             for station in stations
+        ] + [
+            [
+                InlineKeyboardButton(
+                    text='🔎 Пошук станції',
+                    switch_inline_query_current_chat='',
+                )
+            ]
         ]
     )
 
@@ -719,6 +728,56 @@ def routes_markup(
         ]
     )
 
+route_calendar_callback = CallbackData('route_calendar', 'date')
+route_calendar_page_callback = CallbackData('route_calendar_page', 'date_from')
+def route_calendar_markup(
+    days: list[schemas.AvailableDay],
+    date_from: datetime.date,
+    days_count: int,
+    is_first_page: bool,
+) -> InlineKeyboardMarkup:
+    available_days = {day.date for day in days}
+    markup = InlineKeyboardMarkup(row_width=4)
+    for i in range(days_count):
+        date = date_from + datetime.timedelta(days=i)
+        if date in available_days:
+            button = InlineKeyboardButton(
+                text=date.strftime('🟢 %d.%m'),
+                callback_data=route_calendar_callback.new(
+                    date=date.strftime('%Y%m%d'),
+                ),
+            )
+        else:
+            button = InlineKeyboardButton(
+                text=date.strftime('%d.%m'),
+                callback_data='route_calendar_empty',
+            )
+        markup.insert(button)
+    navigation = [
+        InlineKeyboardButton(
+            text='▶️',
+            callback_data=route_calendar_page_callback.new(
+                date_from=(
+                    date_from + datetime.timedelta(days=days_count)
+                ).strftime('%Y%m%d'),
+            ),
+        ),
+    ]
+    if not is_first_page:
+        navigation.insert(
+            0,
+            InlineKeyboardButton(
+                text='◀️',
+                callback_data=route_calendar_page_callback.new(
+                    date_from=(
+                        date_from - datetime.timedelta(days=days_count)
+                    ).strftime('%Y%m%d'),
+                ),
+            ),
+        )
+    return markup.row(*navigation)
+
+
 def package_routes_markup(
     i18n: I18nMiddleware,
     end_station_id: int,
@@ -16,10 +16,9 @@ class LocaleMiddleware(I18nMiddleware):
         args: tuple
     ) -> Literal['ru', 'uk']:
         user_telegram: types.User = types.User.get_current()
-        try: 
-            user: schemas.TelegramUser = \
-                await db.get_telegram_user(user_telegram.id)
-        except AttributeError:
+        user: schemas.TelegramUser | None = \
+            await db.get_telegram_user(user_telegram.id)
+        if user is None:
             return user_telegram.language_code
         return user.language.code
 
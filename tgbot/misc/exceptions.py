@@ -0,0 +1,4 @@
+class NotEnoughSeats(Exception):
+    def __init__(self, available_seats: int) -> None:
+        super().__init__(f'Only {available_seats} seats are available')
+        self.available_seats = available_seats
@@ -1,4 +1,5 @@
 import datetime
+from decimal import Decimal
 import logging
 import math
 from typing import Any, Optional, Type
@@ -40,7 +41,9 @@ class TelegramUser(BaseModel):
         return object_
     
     @validator('join_time', pre=True)
-    def join_time_validator(cls, v: datetime.datetime):
+    def join_time_validator(cls, v: datetime.datetime | str):
+        if isinstance(v, str):
+            v = datetime.datetime.fromisoformat(v)
         return timezone.localtime(v)
 
 class SupportRequest(BaseModel):
@@ -155,7 +158,8 @@ class Bus(BaseModel):
 
 class Route(BaseModel):
     
-    id: int 
+    # None for a departure of a schedule which is not booked yet
+    id: int | None
     start_station: Station
     end_station: Station
     bus: Bus
@@ -172,6 +176,7 @@ class Route(BaseModel):
     user_end_station: Station | None = None
     user_departure_time: datetime.datetime | None = None
     user_arrival_time: datetime.datetime | None = None
+    schedule_id: int | None = None
 
     @classmethod
     def parse_obj(cls: Type['Route'], obj: Any, **kwargs) -> 'Route':
@@ -396,6 +401,13 @@ class ChosenRouteData(BaseModel):
         # return timezone.localtime(v)
 
 
+class AvailableDay(BaseModel):
+    date: datetime.date
+    routes: int
+    available_seats: int
+    min_ticket_price: Decimal | None
+
+
 class Payment(BaseModel):
     result: str
     payment_id: int
@@ -0,0 +1,723 @@
+import asyncio
+import datetime
+from typing import Any
+
+import asyncpg
+from django.conf import settings
+from django.utils import timezone
+from django.core.files.storage import default_storage
+
+from tgbot.config import DbConfig
+from tgbot.misc import schemas
+from tgbot.services import db
+from tgbot.services.db_executor import db_executor
+from tgbot.services.single_flight import single_flight
+from tgbot.services.translations import LanguageTranslations, translations
+from web.app import models
+
+
+def _station_columns(alias: str) -> str:
+    return (
+        f'{alias}.id AS {alias}_id, {alias}.code AS {alias}_code, '
+        f'{alias}.name AS {alias}_name, {alias}.latitude AS {alias}_latitude, '
+        f'{alias}.longitude AS {alias}_longitude, '
+        f'{alias}_town.id AS {alias}_town_id, '
+        f'{alias}_town.name AS {alias}_town_name'
+    )
+
+
+def _station_joins(alias: str, station_id: str) -> str:
+    return (
+        f'JOIN station {alias} ON {alias}.id = {station_id} '
+        f'JOIN town {alias}_town ON {alias}_town.id = {alias}.town_id'
+    )
+
+
+BUS_COLUMNS = '''
+    bus.id AS bus_id, bus.seats AS bus_seats, bus.name AS bus_name,
+    bus.numbers AS bus_numbers, bus.description AS bus_description,
+    bus.code AS bus_code,
+    driver.telegram_id AS driver_telegram_id,
+    driver.full_name AS driver_full_name, driver.phone AS driver_phone
+'''
+
+ROUTE_COLUMNS = f'''
+    route.id AS route_id, route.code AS route_code,
+    route.active AS route_active, route.is_regular AS route_is_regular,
+    {_station_columns('route_start')},
+    {_station_columns('route_end')},
+    {BUS_COLUMNS}
+'''
+
+ROUTE_JOINS = f'''
+    {_station_joins('route_start', 'route.start_station_id')}
+    {_station_joins('route_end', 'route.end_station_id')}
+    JOIN bus ON bus.id = route.bus_id
+    JOIN driver ON driver.telegram_id = route.driver_id
+'''
+
+SEARCH_JOINS = '''
+    JOIN routes_stations user_start_stop
+        ON user_start_stop.route_id = route.id
+    JOIN routes_stations user_end_stop
+        ON user_end_stop.route_id = route.id
+    LEFT JOIN ticket_price price
+        ON price.route_id = route.id
+        AND price.from_station_id = user_start_stop.station_id
+        AND price.to_station_id = user_end_stop.station_id
+    LEFT JOIN LATERAL (
+        SELECT max(occupancy.seats_taken) AS seats_taken
+        FROM route_segment_occupancy occupancy
+        WHERE occupancy.route_id = route.id
+            AND occupancy.segment_index >= user_start_stop.station_index
+            AND occupancy.segment_index < user_end_stop.station_index
+    ) occupancy ON true
+'''
+
+SEARCH_COLUMNS = '''
+    user_start_stop.departure_time AS departure_time,
+    user_end_stop.departure_time AS arrival_time,
+    price.ticket_price, price.package_price,
+    bus.seats - coalesce(occupancy.seats_taken, 0) AS available_seats
+'''
+
+GET_ROUTE = f'''
+    SELECT {ROUTE_COLUMNS}, {SEARCH_COLUMNS},
+        {_station_columns('user_start')}, {_station_columns('user_end')}
+    FROM route
+    {ROUTE_JOINS}
+    {SEARCH_JOINS}
+    {_station_joins('user_start', 'user_start_stop.station_id')}
+    {_station_joins('user_end', 'user_end_stop.station_id')}
+    WHERE route.code = $3
+        AND route.active
+        AND user_start.code = $1
+        AND user_end.code = $2
+        AND user_start_stop.station_index < user_end_stop.station_index
+        AND bus.seats - coalesce(occupancy.seats_taken, 0) > 0
+    LIMIT 1
+'''
+
+GET_ROUTES_FROM_TO_IN_DATE = f'''
+    SELECT {ROUTE_COLUMNS}, {SEARCH_COLUMNS}
+    FROM route
+    {ROUTE_JOINS}
+    {SEARCH_JOINS}
+    WHERE route.active
+        AND user_start_stop.station_id = $1
+        AND user_end_stop.station_id = $2
+        AND user_start_stop.station_index < user_end_stop.station_index
+        AND ($5 OR bus.seats - coalesce(occupancy.seats_taken, 0) > 0)
+        AND (user_start_stop.departure_time AT TIME ZONE $4)::date = $3
+        AND NOT EXISTS (
+            SELECT 1 FROM disallowed_way
+            WHERE from_station_id = $1 AND to_station_id = $2
+        )
+    ORDER BY user_start_stop.departure_time, route.id
+    LIMIT 10
+'''
+
+GET_AVAILABLE_DAYS = f'''
+    SELECT (user_start_stop.departure_time AT TIME ZONE $5)::date AS date,
+        count(*) AS routes,
+        sum(bus.seats - coalesce(occupancy.seats_taken, 0))
+            AS available_seats,
+        min(price.ticket_price) AS min_ticket_price
+    FROM route
+    JOIN bus ON bus.id = route.bus_id
+    {SEARCH_JOINS}
+    WHERE route.active
+        AND user_start_stop.station_id = $1
+        AND user_end_stop.station_id = $2
+        AND user_start_stop.station_index < user_end_stop.station_index
+        AND bus.seats - coalesce(occupancy.seats_taken, 0) > 0
+        AND user_start_stop.departure_time > now()
+        AND (user_start_stop.departure_time AT TIME ZONE $5)::date
+            BETWEEN $3 AND $4
+        AND NOT EXISTS (
+            SELECT 1 FROM disallowed_way
+            WHERE from_station_id = $1 AND to_station_id = $2
+        )
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+# departures of schedules which are not booked yet, run.date is the date
+# the schedule departs on; $1 start station, $2 end station, $3 time zone
+SCHEDULE_STOP_JOINS = '''
+    JOIN schedule_station user_start_stop
+        ON user_start_stop.schedule_id = schedule.id
+    JOIN schedule_station user_end_stop
+        ON user_end_stop.schedule_id = schedule.id
+    LEFT JOIN schedule_price price
+        ON price.schedule_id = schedule.id
+        AND price.from_station_id = user_start_stop.station_id
+        AND price.to_station_id = user_end_stop.station_id
+'''
+
+# the schedule has a departure without a route on run.date
+SCHEDULE_RUNS = '''
+    schedule.active
+    AND run.date >= schedule.valid_from
+    AND (schedule.valid_until IS NULL OR run.date <= schedule.valid_until)
+    AND strpos(schedule.weekdays, to_char(run.date, 'ID')) > 0
+    AND NOT EXISTS (
+        SELECT 1 FROM route
+        WHERE route.schedule_id = schedule.id
+            AND route.departure_date = run.date
+    )
+'''
+
+SCHEDULE_CONDITIONS = f'''
+    {SCHEDULE_RUNS}
+    AND user_start_stop.station_id = $1
+    AND user_end_stop.station_id = $2
+    AND user_start_stop.station_index < user_end_stop.station_index
+    AND (
+        run.date + user_start_stop.day_offset + user_start_stop.departure_time
+    ) AT TIME ZONE $3 > now()
+    AND NOT EXISTS (
+        SELECT 1 FROM schedule_disallowed_way
+        WHERE schedule_id = schedule.id
+            AND from_station_id = $1 AND to_station_id = $2
+    )
+'''
+
+GET_SCHEDULE_DEPARTURES_FROM_TO_IN_DATE = f'''
+    SELECT NULL::int AS route_id,
+        schedule.code || to_char(run.date, 'DDMM') AS route_code,
+        true AS route_active, true AS route_is_regular,
+        {_station_columns('route_start')},
+        {_station_columns('route_end')},
+        {BUS_COLUMNS},
+        schedule.id AS schedule_id,
+        (
+            run.date + user_start_stop.day_offset
+            + user_start_stop.departure_time
+        ) AT TIME ZONE $3 AS departure_time,
+        (
+            run.date + user_end_stop.day_offset + user_end_stop.departure_time
+        ) AT TIME ZONE $3 AS arrival_time,
+        price.ticket_price, price.package_price,
+        bus.seats AS available_seats
+    FROM route_schedule schedule
+    {_station_joins('route_start', 'schedule.start_station_id')}
+    {_station_joins('route_end', 'schedule.end_station_id')}
+    JOIN bus ON bus.id = schedule.bus_id
+    JOIN driver ON driver.telegram_id = schedule.driver_id
+    {SCHEDULE_STOP_JOINS}
+    CROSS JOIN LATERAL (
+        SELECT $4::date - user_start_stop.day_offset AS date
+    ) run
+    WHERE {SCHEDULE_CONDITIONS}
+    ORDER BY departure_time, schedule.id
+    LIMIT 10
+'''
+
+GET_SCHEDULE_DEPARTURE = f'''
+    SELECT NULL::int AS route_id,
+        schedule.code || to_char(run.date, 'DDMM') AS route_code,
+        true AS route_active, true AS route_is_regular,
+        {_station_columns('route_start')},
+        {_station_columns('route_end')},
+        {BUS_COLUMNS},
+        {_station_columns('user_start')}, {_station_columns('user_end')},
+        schedule.id AS schedule_id,
+        (
+            run.date + user_start_stop.day_offset
+            + user_start_stop.departure_time
+        ) AT TIME ZONE $5 AS departure_time,
+        (
+            run.date + user_end_stop.day_offset + user_end_stop.departure_time
+        ) AT TIME ZONE $5 AS arrival_time,
+        price.ticket_price, price.package_price,
+        bus.seats AS available_seats
+    FROM route_schedule schedule
+    {_station_joins('route_start', 'schedule.start_station_id')}
+    {_station_joins('route_end', 'schedule.end_station_id')}
+    JOIN bus ON bus.id = schedule.bus_id
+    JOIN driver ON driver.telegram_id = schedule.driver_id
+    {SCHEDULE_STOP_JOINS}
+    {_station_joins('user_start', 'user_start_stop.station_id')}
+    {_station_joins('user_end', 'user_end_stop.station_id')}
+    CROSS JOIN (SELECT $4::date AS date) run
+    WHERE schedule.code = $3
+        AND {SCHEDULE_RUNS}
+        AND user_start.code = $1
+        AND user_end.code = $2
+        AND user_start_stop.station_index < user_end_stop.station_index
+    LIMIT 1
+'''
+
+GET_SCHEDULE_AVAILABLE_DAYS = f'''
+    SELECT $4::date + day.number AS date,
+        count(*) AS routes,
+        sum(bus.seats) AS available_seats,
+        min(price.ticket_price) AS min_ticket_price
+    FROM generate_series(0, $5::int - 1) AS day(number)
+    CROSS JOIN route_schedule schedule
+    JOIN bus ON bus.id = schedule.bus_id
+    {SCHEDULE_STOP_JOINS}
+    CROSS JOIN LATERAL (
+        SELECT $4::date + day.number - user_start_stop.day_offset AS date
+    ) run
+    WHERE {SCHEDULE_CONDITIONS}
+    GROUP BY 1
+    ORDER BY 1
+'''
+
+GET_STATIONS = f'''
+    SELECT {_station_columns('station')}
+    FROM station
+    JOIN town station_town ON station_town.id = station.town_id
+    WHERE station.id = ANY($1::int[])
+'''
+
+GET_USER_VALID_TICKETS = f'''
+    SELECT {ROUTE_COLUMNS},
+        ticket.id, ticket.is_paid, ticket.payment_id, ticket.ticket_code,
+        ticket.is_booked, ticket.paid_time,
+        start_stop.departure_time AS departure_time,
+        end_stop.departure_time AS arrival_time,
+        price.ticket_price AS price,
+        {_station_columns('ticket_start')}, {_station_columns('ticket_end')},
+        owner.telegram_id AS owner_telegram_id,
+        owner.full_name AS owner_full_name, owner.join_time AS owner_join_time,
+        owner.phone AS owner_phone,
+        owner.is_notifications_enabled AS owner_is_notifications_enabled,
+        language.id AS language_id, language.code AS language_code,
+        language.name AS language_name,
+        passenger.id AS passenger_id, passenger.name AS passenger_name,
+        passenger.surname AS passenger_surname,
+        passenger.phone AS passenger_phone,
+        ticket_type.id AS type_id, ticket_type.name AS type_name,
+        ticket_type.discount AS type_discount
+    FROM ticket
+    JOIN telegram_user owner ON owner.id = ticket.owner_id
+    JOIN language ON language.id = owner.language_id
+    JOIN route ON route.id = ticket.route_id
+    {ROUTE_JOINS}
+    {_station_joins('ticket_start', 'ticket.start_station_id')}
+    {_station_joins('ticket_end', 'ticket.end_station_id')}
+    JOIN persons passenger ON passenger.id = ticket.passenger_id
+    JOIN ticket_type ON ticket_type.id = ticket.type_id
+    JOIN routes_stations start_stop
+        ON start_stop.route_id = ticket.route_id
+        AND start_stop.station_id = ticket.start_station_id
+    LEFT JOIN routes_stations end_stop
+        ON end_stop.route_id = ticket.route_id
+        AND end_stop.station_id = ticket.end_station_id
+    LEFT JOIN ticket_price price
+        ON price.route_id = ticket.route_id
+        AND price.from_station_id = ticket.start_station_id
+        AND price.to_station_id = ticket.end_station_id
+    WHERE owner.telegram_id = $1
+        AND start_stop.departure_time >= $2
+        AND NOT ticket.is_booked
+    ORDER BY start_stop.departure_time
+'''
+
+GET_ROUTE_FROM_TO_STATIONS = f'''
+    SELECT {_station_columns('station')},
+        route_stop.departure_time AS station_departure_time
+    FROM route
+    JOIN routes_stations start_stop ON start_stop.route_id = route.id
+    JOIN station start_station
+        ON start_station.id = start_stop.station_id
+        AND start_station.code = $1
+    JOIN routes_stations end_stop ON end_stop.route_id = route.id
+    JOIN station end_station
+        ON end_station.id = end_stop.station_id
+        AND end_station.code = $2
+    JOIN routes_stations route_stop
+        ON route_stop.route_id = route.id
+        AND route_stop.station_index
+            BETWEEN start_stop.station_index AND end_stop.station_index
+    {_station_joins('station', 'route_stop.station_id')}
+    WHERE route.code = $3
+    ORDER BY route_stop.station_index
+'''
+
+GET_SCHEDULE_FROM_TO_STATIONS = f'''
+    SELECT {_station_columns('station')},
+        (
+            run.date + route_stop.day_offset + route_stop.departure_time
+        ) AT TIME ZONE $5 AS station_departure_time
+    FROM route_schedule schedule
+    CROSS JOIN (SELECT $4::date AS date) run
+    JOIN schedule_station start_stop ON start_stop.schedule_id = schedule.id
+    JOIN station start_station
+        ON start_station.id = start_stop.station_id
+        AND start_station.code = $1
+    JOIN schedule_station end_stop ON end_stop.schedule_id = schedule.id
+    JOIN station end_station
+        ON end_station.id = end_stop.station_id
+        AND end_station.code = $2
+    JOIN schedule_station route_stop
+        ON route_stop.schedule_id = schedule.id
+        AND route_stop.station_index
+            BETWEEN start_stop.station_index AND end_stop.station_index
+    {_station_joins('station', 'route_stop.station_id')}
+    WHERE schedule.code = $3 AND {SCHEDULE_RUNS}
+    ORDER BY route_stop.station_index
+'''
+
+GET_BUSES_PHOTOS = '''
+    SELECT bus_photos.bus_id, buses_photos.photo
+    FROM bus_photos
+    JOIN buses_photos ON buses_photos.id = bus_photos.busphotos_id
+    WHERE bus_photos.bus_id = ANY($1::int[])
+    ORDER BY buses_photos.id
+'''
+
+GET_BUSES_OPTIONS = '''
+    SELECT bus_options.bus_id, app_bus_options.id, app_bus_options.name
+    FROM bus_options
+    JOIN app_bus_options ON app_bus_options.id = bus_options.busoption_id
+    WHERE bus_options.bus_id = ANY($1::int[])
+    ORDER BY app_bus_options.id
+'''
+
+
+class AsyncDatabase:
+    '''
+    Read-only queries of route search and ticket listing, run on an
+    asyncpg pool without a thread hop. Rows are mapped straight to the
+    schemas that the db module returns for the same queries; writes stay
+    in the db module.
+    '''
+
+    def __init__(self) -> None:
+        self._pool: asyncpg.Pool | None = None
+
+    async def setup(self, config: DbConfig) -> None:
+        self._pool = await asyncpg.create_pool(
+            host=config.host,
+            port=config.port,
+            user=config.user,
+            password=config.password,
+            database=config.database,
+            min_size=1,
+            max_size=config.pool_size,
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @single_flight(schemas.Route | None)
+    async def get_route(
+        self,
+        start_station_code: str,
+        end_station_code: str,
+        route_code: str,
+    ) -> schemas.Route | None:
+        row = await self._pool.fetchrow(
+            GET_ROUTE, start_station_code, end_station_code, route_code,
+        )
+        departure = models.RouteSchedule.parse_departure_code(route_code)
+        if row is None and departure is not None:
+            # a departure of a schedule gets its route when it is booked
+            schedule_code, departure_date = departure
+            row = await self._pool.fetchrow(
+                GET_SCHEDULE_DEPARTURE,
+                start_station_code,
+                end_station_code,
+                schedule_code,
+                departure_date,
+                settings.TIME_ZONE,
+            )
+        if row is None:
+            return None
+        buses = await self._get_buses([row])
+        return self._route(
+            row,
+            buses,
+            departure_time=row['departure_time'],
+            arrival_time=row['arrival_time'],
+            package_price=row['package_price'],
+            available_seats=row['available_seats'],
+            user_start_station=self._station(row, 'user_start'),
+            user_end_station=self._station(row, 'user_end'),
+            schedule_id=row.get('schedule_id'),
+        )
+
+    async def get_routes_from_to_in_date(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        date: datetime.date,
+        telegram_id: int,
+        with_full_routes: bool = False,
+    ) -> list[schemas.Route]:
+        user = await db.get_telegram_user(telegram_id)
+        language_translations = await self._get_translations(
+            user.language.id,
+        )
+        date = datetime.date(date.year, date.month, date.day)
+        rows, schedule_rows = await asyncio.gather(
+            self._pool.fetch(
+                GET_ROUTES_FROM_TO_IN_DATE,
+                start_station_id,
+                end_station_id,
+                date,
+                settings.TIME_ZONE,
+                with_full_routes,
+            ),
+            self._pool.fetch(
+                GET_SCHEDULE_DEPARTURES_FROM_TO_IN_DATE,
+                start_station_id,
+                end_station_id,
+                settings.TIME_ZONE,
+                date,
+            ),
+        )
+        rows = sorted(
+            [*rows, *schedule_rows], key=lambda row: row['departure_time'],
+        )[:10]
+        if not rows:
+            return []
+        stations = {
+            station['station_id']: self._station(
+                station, 'station', language_translations,
+            )
+            for station in await self._pool.fetch(
+                GET_STATIONS, [start_station_id, end_station_id],
+            )
+        }
+        buses = await self._get_buses(rows)
+        return list(
+            self._route(
+                row,
+                buses,
+                departure_time=row['departure_time'],
+                arrival_time=row['arrival_time'],
+                ticket_price=row['ticket_price'],
+                package_price=row['package_price'],
+                available_seats=row['available_seats'],
+                user_start_station=stations[start_station_id],
+                user_end_station=stations[end_station_id],
+                user_departure_time=row['departure_time'],
+                user_arrival_time=row['arrival_time'],
+                schedule_id=row.get('schedule_id'),
+            )
+            for row in rows
+        )
+
+    async def get_available_days(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        date_from: datetime.date,
+        days: int,
+    ) -> list[schemas.AvailableDay]:
+        rows, schedule_rows = await asyncio.gather(
+            self._pool.fetch(
+                GET_AVAILABLE_DAYS,
+                start_station_id,
+                end_station_id,
+                date_from,
+                date_from + datetime.timedelta(days=days - 1),
+                settings.TIME_ZONE,
+            ),
+            self._pool.fetch(
+                GET_SCHEDULE_AVAILABLE_DAYS,
+                start_station_id,
+                end_station_id,
+                settings.TIME_ZONE,
+                date_from,
+                days,
+            ),
+        )
+        available_days: dict[datetime.date, schemas.AvailableDay] = {}
+        for row in [*rows, *schedule_rows]:
+            day = available_days.get(row['date'])
+            if day is None:
+                available_days[row['date']] = schemas.AvailableDay(**row)
+                continue
+            day.routes += row['routes']
+            day.available_seats += row['available_seats']
+            day.min_ticket_price = min(
+                (
+                    price for price in
+                    (day.min_ticket_price, row['min_ticket_price'])
+                    if price is not None
+                ),
+                default=None,
+            )
+        return sorted(available_days.values(), key=lambda day: day.date)
+
+    async def get_user_valid_tickets(
+        self,
+        telegram_id: int,
+    ) -> list[schemas.Ticket]:
+        rows = await self._pool.fetch(
+            GET_USER_VALID_TICKETS, telegram_id, timezone.now(),
+        )
+        buses = await self._get_buses(rows)
+        return list(
+            schemas.Ticket(
+                id=row['id'],
+                owner=schemas.TelegramUser(
+                    telegram_id=row['owner_telegram_id'],
+                    full_name=row['owner_full_name'],
+                    join_time=row['owner_join_time'],
+                    language=schemas.Language(
+                        id=row['language_id'],
+                        code=row['language_code'],
+                        name=row['language_name'],
+                    ),
+                    phone=row['owner_phone'],
+                    is_notifications_enabled=(
+                        row['owner_is_notifications_enabled']
+                    ),
+                ),
+                route=self._route(row, buses),
+                start_station=self._station(row, 'ticket_start'),
+                end_station=self._station(row, 'ticket_end'),
+                is_paid=row['is_paid'],
+                payment_id=row['payment_id'],
+                ticket_code=row['ticket_code'],
+                passenger=schemas.Person(
+                    id=row['passenger_id'],
+                    name=row['passenger_name'],
+                    surname=row['passenger_surname'],
+                    phone=row['passenger_phone'],
+                ),
+                is_booked=row['is_booked'],
+                type=schemas.TicketType(
+                    id=row['type_id'],
+                    name=row['type_name'],
+                    discount=row['type_discount'],
+                ),
+                paid_time=row['paid_time'],
+                departure_time=row['departure_time'],
+                arrival_time=row['arrival_time'],
+                price=row['price'],
+            )
+            for row in rows
+        )
+
+    async def get_route_from_to_stations(
+        self,
+        start_station_code: str,
+        end_station_code: str,
+        route_code: str,
+        telegram_id: int,
+    ) -> list[schemas.Station]:
+        user = await db.get_telegram_user(telegram_id)
+        language_translations = await self._get_translations(
+            user.language.id,
+        )
+        rows = await self._pool.fetch(
+            GET_ROUTE_FROM_TO_STATIONS,
+            start_station_code,
+            end_station_code,
+            route_code,
+        )
+        departure = models.RouteSchedule.parse_departure_code(route_code)
+        if not rows and departure is not None:
+            # a departure of a schedule without a route yet
+            schedule_code, departure_date = departure
+            rows = await self._pool.fetch(
+                GET_SCHEDULE_FROM_TO_STATIONS,
+                start_station_code,
+                end_station_code,
+                schedule_code,
+                departure_date,
+                settings.TIME_ZONE,
+            )
+        return list(
+            self._station(row, 'station', language_translations)
+            for row in rows
+        )
+
+    async def _get_buses(
+        self,
+        rows: list[asyncpg.Record],
+    ) -> dict[int, schemas.Bus]:
+        bus_ids = list({row['bus_id'] for row in rows})
+        photos: dict[int, list[str]] = {bus_id: [] for bus_id in bus_ids}
+        for photo in await self._pool.fetch(GET_BUSES_PHOTOS, bus_ids):
+            photos[photo['bus_id']].append(
+                default_storage.path(photo['photo'])
+            )
+        options: dict[int, list[schemas.BusOption]] = {
+            bus_id: [] for bus_id in bus_ids
+        }
+        for option in await self._pool.fetch(GET_BUSES_OPTIONS, bus_ids):
+            options[option['bus_id']].append(
+                schemas.BusOption(id=option['id'], name=option['name'])
+            )
+        return {
+            row['bus_id']: schemas.Bus(
+                id=row['bus_id'],
+                photos=photos[row['bus_id']],
+                seats=row['bus_seats'],
+                name=row['bus_name'],
+                numbers=row['bus_numbers'],
+                description=row['bus_description'],
+                options=options[row['bus_id']],
+                code=row['bus_code'],
+            )
+            for row in rows
+        }
+
+    @staticmethod
+    async def _get_translations(language_id: int) -> LanguageTranslations:
+        language_translations = translations.get_loaded(language_id)
+        if language_translations is None:
+            language_translations = await db_executor.run(
+                translations.get, language_id,
+            )
+        return language_translations
+
+    @classmethod
+    def _route(
+        cls,
+        row: asyncpg.Record,
+        buses: dict[int, schemas.Bus],
+        **kwargs: Any,
+    ) -> schemas.Route:
+        return schemas.Route(
+            id=row['route_id'],
+            start_station=cls._station(row, 'route_start'),
+            end_station=cls._station(row, 'route_end'),
+            bus=buses[row['bus_id']],
+            driver=schemas.Driver(
+                telegram_id=row['driver_telegram_id'],
+                full_name=row['driver_full_name'],
+                phone=row['driver_phone'],
+            ),
+            active=row['route_active'],
+            is_regular=row['route_is_regular'],
+            code=row['route_code'],
+            **kwargs,
+        )
+
+    @staticmethod
+    def _station(
+        row: asyncpg.Record,
+        alias: str,
+        language_translations: LanguageTranslations | None = None,
+    ) -> schemas.Station:
+        name = row[f'{alias}_name']
+        town_name = row[f'{alias}_town_name']
+        if language_translations is not None:
+            name = language_translations.stations.get(row[f'{alias}_id'], name)
+            town_name = language_translations.towns.get(
+                row[f'{alias}_town_id'], town_name,
+            )
+        return schemas.Station(
+            id=row[f'{alias}_id'],
+            name=name,
+            town=schemas.Town(id=row[f'{alias}_town_id'], name=town_name),
+            code=row[f'{alias}_code'],
+            latitude=row[f'{alias}_latitude'],
+            longitude=row[f'{alias}_longitude'],
+            departure_time=row.get(f'{alias}_departure_time'),
+        )
+
+
+async_db = AsyncDatabase()
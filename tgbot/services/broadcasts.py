@@ -0,0 +1,191 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aioredis import Redis, ConnectionPool
+from aiogram.utils.exceptions import TelegramAPIError
+
+from tgbot.services import db
+from tgbot.services.message_sender import message_sender, PROMOTIONAL
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BroadcastProgress:
+    status: str
+    sent: int
+    failed: int
+    seconds: float
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.sent / self.seconds if self.seconds else 0
+
+
+class Broadcaster:
+    '''
+    Copies one message to every user with notifications enabled. Users
+    are read page by page ordered by id and the id of the last user of a
+    sent page is kept in Redis with the counters, so after a restart the
+    broadcast goes on from the next page. Messages go through the
+    promotional lane of the message sender.
+    '''
+
+    STATE_KEY = 'broadcast'
+    RUNNING = 'running'
+    CANCELLED = 'cancelled'
+    FINISHED = 'finished'
+
+    def __init__(
+        self,
+        connection_pool: ConnectionPool,
+        page_size: int = 500,
+        progress_interval: int = 5,
+    ) -> None:
+        self._connection_pool = connection_pool
+        self._page_size = page_size
+        self._progress_interval = progress_interval
+        self._task: asyncio.Task | None = None
+
+    async def start(
+        self,
+        bot: Bot,
+        from_chat_id: int,
+        message_id: int,
+        progress_message_id: int,
+    ) -> bool:
+        '''Returns False if another broadcast is running'''
+        redis = Redis(connection_pool=self._connection_pool)
+        if await redis.hget(self.STATE_KEY, 'status') == self.RUNNING.encode():
+            return False
+        await redis.delete(self.STATE_KEY)
+        await redis.hset(self.STATE_KEY, mapping={
+            'status': self.RUNNING,
+            'from_chat_id': from_chat_id,
+            'message_id': message_id,
+            'progress_message_id': progress_message_id,
+            'last_user_id': 0,
+            'sent': 0,
+            'failed': 0,
+            'seconds': 0,
+        })
+        self._run_task(bot)
+        return True
+
+    async def resume(self, bot: Bot) -> None:
+        redis = Redis(connection_pool=self._connection_pool)
+        if await redis.hget(self.STATE_KEY, 'status') == self.RUNNING.encode():
+            self._run_task(bot)
+
+    async def cancel(self) -> bool:
+        redis = Redis(connection_pool=self._connection_pool)
+        if await redis.hget(self.STATE_KEY, 'status') != self.RUNNING.encode():
+            return False
+        await redis.hset(self.STATE_KEY, 'status', self.CANCELLED)
+        return True
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def get_progress(self) -> BroadcastProgress | None:
+        redis = Redis(connection_pool=self._connection_pool)
+        state = await redis.hgetall(self.STATE_KEY)
+        if not state:
+            return None
+        return BroadcastProgress(
+            status=state[b'status'].decode(),
+            sent=int(state[b'sent']),
+            failed=int(state[b'failed']),
+            seconds=float(state[b'seconds']),
+        )
+
+    def _run_task(self, bot: Bot) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def _run(self, bot: Bot) -> None:
+        try:
+            await self._send_pages(bot)
+        except Exception:
+            logger.exception('Broadcast stopped')
+
+    async def _send_pages(self, bot: Bot) -> None:
+        redis = Redis(connection_pool=self._connection_pool)
+        state = await redis.hgetall(self.STATE_KEY)
+        admin_id = int(state[b'from_chat_id'])
+        message_id = int(state[b'message_id'])
+        progress_message_id = int(state[b'progress_message_id'])
+        last_user_id = int(state[b'last_user_id'])
+        started = time.monotonic() - float(state[b'seconds'])
+        progress_shown = time.monotonic()
+        status = self.RUNNING.encode()
+        while status == self.RUNNING.encode():
+            users = await db.get_notified_users_after(
+                last_user_id, self._page_size,
+            )
+            if not users:
+                break
+            results = await asyncio.gather(
+                *(
+                    message_sender.send(
+                        telegram_id,
+                        bot.copy_message,
+                        chat_id=telegram_id,
+                        from_chat_id=admin_id,
+                        message_id=message_id,
+                        priority=PROMOTIONAL,
+                    )
+                    for _, telegram_id in users
+                ),
+                return_exceptions=True,
+            )
+            failed = sum(isinstance(result, Exception) for result in results)
+            last_user_id = users[-1][0]
+            async with redis.pipeline(transaction=True) as pipeline:
+                pipeline.hget(self.STATE_KEY, 'status')
+                pipeline.hset(self.STATE_KEY, 'last_user_id', last_user_id)
+                pipeline.hincrby(self.STATE_KEY, 'sent', len(users) - failed)
+                pipeline.hincrby(self.STATE_KEY, 'failed', failed)
+                pipeline.hset(
+                    self.STATE_KEY, 'seconds', time.monotonic() - started,
+                )
+                status, *_ = await pipeline.execute()
+            if time.monotonic() - progress_shown > self._progress_interval:
+                progress_shown = time.monotonic()
+                await self._show_progress(bot, admin_id, progress_message_id)
+        if status == self.RUNNING.encode():
+            await redis.hset(self.STATE_KEY, 'status', self.FINISHED)
+        await self._show_progress(bot, admin_id, progress_message_id)
+
+    async def _show_progress(
+        self,
+        bot: Bot,
+        admin_id: int,
+        progress_message_id: int,
+    ) -> None:
+        progress = await self.get_progress()
+        try:
+            await bot.edit_message_text(
+                chat_id=admin_id,
+                message_id=progress_message_id,
+                text=format_progress(progress),
+            )
+        except TelegramAPIError:
+            logger.warning('Could not show broadcast progress')
+
+
+def format_progress(progress: BroadcastProgress) -> str:
+    return (
+        f'<b>Розсилка</b>: {progress.status}\n'
+        f'Надіслано: {progress.sent}\n'
+        f'Не доставлено: {progress.failed}\n'
+        f'Час: {progress.seconds:.0f} с\n'
+        f'Швидкість: {progress.messages_per_second:.1f} повідомлень/с'
+    )
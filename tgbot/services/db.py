@@ -1,17 +1,20 @@
 import datetime
 import logging
 import uuid
+from collections import Counter
 
-from asgiref.sync import sync_to_async
-
-from django.db.models.functions import Concat, Lower, Upper
+from django.db.models.functions import Concat, Lower, Upper, Coalesce
+from django.db import connection, transaction
 from django.utils import timezone
-from django.db.models import F, Value, CharField, Subquery, OuterRef, Q, Count, Func, Exists, QuerySet 
+from django.db.models import F, Value, CharField, Subquery, OuterRef, Q, Count, Func, Exists, QuerySet, Max, FilteredRelation
 
 
 from web.app import models
 from web.translations import models as translations_models
-from tgbot.misc import schemas
+from tgbot.misc import schemas, exceptions
+from tgbot.services.db_executor import db_executor
+from tgbot.services.translations import translations
+from tgbot.services.user_profiles import user_profiles
 
 models.BusTranslation = translations_models.BusTranslation
 models.TownTranslations = translations_models.TownTranslations
@@ -21,9 +24,14 @@ models.TicketTypeTranslations = translations_models.TicketTypeTranslations
 
 
 
-@sync_to_async
+@db_executor
 def add_telegram_user(telegram_id: int, full_name: str, phone: str) -> None:
-    if models.TelegramUser.objects.filter(phone=phone).exists():
+    previous_telegram_ids = list(
+        models.TelegramUser.objects
+        .filter(phone=phone)
+        .values_list('telegram_id', flat=True)
+    )
+    if previous_telegram_ids:
         (
         models.TelegramUser.objects.filter(phone=phone)
         .update(
@@ -39,47 +47,64 @@ def add_telegram_user(telegram_id: int, full_name: str, phone: str) -> None:
             language=models.Language.objects.get(code='uk'),
             phone=phone,
         )
-
-@sync_to_async
-def get_telegram_users() -> schemas.TelegramUser:
+    for id_ in {telegram_id, *previous_telegram_ids} - {None}:
+        user_profiles.invalidate(id_)
+
+@db_executor
+def get_notified_users_after(
+    after_id: int,
+    limit: int,
+) -> list[tuple[int, int]]:
     return list(
-        schemas.TelegramUser.parse_obj(user) \
-            for user in models.TelegramUser.objects.all().prefetch_related()
+        models.TelegramUser.objects
+        .filter(
+            id__gt=after_id,
+            is_notifications_enabled=True,
+            telegram_id__isnull=False,
+        )
+        .order_by('id')
+        .values_list('id', 'telegram_id')[:limit]
     )
 
-@sync_to_async
-def is_telegram_user_registered(telegram_id: int) -> bool:
-    return models.TelegramUser.objects.filter(
-        telegram_id=telegram_id,
-    ).exists()
+@db_executor
+def is_telegram_user_full_name(full_name: str) -> bool:
+    return models.TelegramUser.objects.filter(full_name=full_name).exists()
 
-@sync_to_async
+async def is_telegram_user_registered(telegram_id: int) -> bool:
+    return await get_telegram_user(telegram_id) is not None
+
+@db_executor
 def turn_notifications(telegram_id: int) -> None:
     user = models.TelegramUser.objects.get(
         telegram_id=telegram_id,
     )
     user.is_notifications_enabled = not user.is_notifications_enabled
     user.save()
-
-@sync_to_async
-def get_telegram_user(telegram_id: int) -> schemas.TelegramUser:
-    return schemas.TelegramUser.parse_obj(
-        (
-            models.TelegramUser.objects
-            .filter(telegram_id=telegram_id)
-            .first()
-        )
+    user_profiles.invalidate(telegram_id)
+
+@user_profiles.cached
+@db_executor
+def get_telegram_user(telegram_id: int) -> schemas.TelegramUser | None:
+    user = (
+        models.TelegramUser.objects
+        .filter(telegram_id=telegram_id)
+        .select_related('language')
+        .first()
     )
+    if user is None:
+        return None
+    return schemas.TelegramUser.parse_obj(user)
 
 
-@sync_to_async
+@db_executor
 def update_telegram_user_phone(telegram_id: int, phone: str) -> None:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     user.phone = phone
     user.save()
+    user_profiles.invalidate(telegram_id)
 
 
-@sync_to_async
+@db_executor
 def search_telegram_users_by_full_name(full_name: str) -> list[schemas.TelegramUser]:
     return list(
         schemas.TelegramUser(**user) \
@@ -89,14 +114,15 @@ def search_telegram_users_by_full_name(full_name: str) -> list[schemas.TelegramU
     )
 
 
-@sync_to_async
+@db_executor
 def set_language_to_user(telegram_id: int, language_id: int) -> None:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     user.language = models.Language.objects.get(id=language_id)
     user.save()
+    user_profiles.invalidate(telegram_id)
 
 
-@sync_to_async
+@db_executor
 def add_support_request(
     user_telegram_id: int,
     ) -> schemas.SupportRequest:
@@ -107,16 +133,16 @@ def add_support_request(
     return schemas.SupportRequest(**request.dict())
 
 
-@sync_to_async
+@db_executor
 def delete_support_request(request_id) -> None:
     models.SupportRequest.objects.get(id=request_id).delete()
 
-@sync_to_async
+@db_executor
 def get_support_request(id: int) -> schemas.SupportRequest:
     request: models.SupportRequest = models.SupportRequest.objects.get(id=id)
     return schemas.SupportRequest(**request.dict())
 
-@sync_to_async
+@db_executor
 def update_send_message_ids_in_support_request(
     request_id: int,
     message_ids: list,
@@ -126,7 +152,7 @@ def update_send_message_ids_in_support_request(
     request.save()
     return schemas.SupportRequest(**request.dict())
 
-@sync_to_async
+@db_executor
 def add_operator(telegram_id: int, full_name: str) -> schemas.Operator:
     operator: models.Operator = models.Operator.objects.create(
         telegram_id=telegram_id,
@@ -134,80 +160,63 @@ def add_operator(telegram_id: int, full_name: str) -> schemas.Operator:
     )
     return schemas.Operator(**operator.dict())
 
-@sync_to_async
+@db_executor
 def delete_operator(id: int) -> schemas.Operator:
     operator: models.Operator = models.Operator.objects.get(telegram_id=id)
     operator_schema = schemas.Operator(**operator.dict())
     operator.delete()
     return operator_schema
 
-@sync_to_async
+@db_executor
 def get_operators() -> list[schemas.Operator]:
     return list(
         schemas.Operator(**operator) \
             for operator in models.Operator.objects.all().values()
     )
 
-@sync_to_async
+@db_executor
 def get_operator(id: int) -> schemas.Operator:
     operator: models.Operator = models.Operator.objects.get(telegram_id=id)
     return schemas.Operator(**operator.dict())
 
-@sync_to_async
+@db_executor
 def add_operator_confirm_uuid() -> uuid.UUID:
     uuid_ = models.OperatorConfirmUUID.objects.create()
     return uuid_.uuid 
 
-@sync_to_async
+@db_executor
 def delete_operator_confirm_uuid(uuid_: uuid.UUID) -> None:
     models.OperatorConfirmUUID.objects.get(uuid=uuid_).delete()
 
-@sync_to_async
+@db_executor
 def get_all_operator_confirm_uuids() -> list[uuid.UUID]:
     return list(
         uuid_.uuid \
             for uuid_ in models.OperatorConfirmUUID.objects.all()
     )
 # Station functions -----------------------------------------------------------
-@sync_to_async
-def get_stations_by_name(name: str) -> list[schemas.Station]:
+@db_executor
+def get_translated_stations(language_id: int) -> list[schemas.Station]:
     return list(
-        schemas.Station.parse_obj(station) \
-            for station in (
-                models.Station.objects
-                .annotate(
-                    full_name=Concat(
-                        F('town__name'),
-                        Value('-'),
-                        'name',
-                        output_field=CharField(),
-                    )
-                )
-                .filter(full_name__icontains=name)
-                .order_by('full_name')
-            )
+        schemas.Station.parse_obj(station) for station in
+        translations.translate_stations(
+            models.Station.objects.select_related('town'), language_id,
+        )
     )
 
-@sync_to_async
+@db_executor
 def get_station(
     station_id: int,
     telegram_id: int,
 ) -> schemas.Station:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    station = models.Station.objects.get(id=station_id)
-    station.name = models.StationTranslations.objects.get(
-        station=station,
-        language=user.language,
-    ).translation
-    station.town.name = models.TownTranslations.objects.get(
-        town=station.town,
-        language=user.language,
-    ).translation
+    station = models.Station.objects.select_related('town').get(id=station_id)
+    translations.translate_station(station, user.language_id)
     return schemas.Station.parse_obj(
         station
     )
 
-@sync_to_async
+@db_executor
 def get_user_ticket_stations_history(telegram_id: int) -> list[schemas.Station]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     ticket_with_station_subquery = Subquery(
@@ -227,7 +236,7 @@ def get_user_ticket_stations_history(telegram_id: int) -> list[schemas.Station]:
             for station in user_station_history[:5]
     )
 
-@sync_to_async
+@db_executor
 def get_user_package_stations_history(telegram_id: int) -> list[schemas.Station]:
     package_with_station_subquery = Subquery(
         models.Package.objects
@@ -250,7 +259,7 @@ def get_user_package_stations_history(telegram_id: int) -> list[schemas.Station]
 # ------------------------------------------------------------Station functions
 
     
-@sync_to_async
+@db_executor
 def update_chosen_route_data(
     telegram_id: int,
     **kwargs,
@@ -270,7 +279,7 @@ def update_chosen_route_data(
     chosen_route_data.update(**kwargs)
     return schemas.ChosenRouteData.parse_obj(chosen_route_data.first())
 
-@sync_to_async
+@db_executor
 def create_or_clean_chosen_route_data(
     telegram_id: int
     ) -> schemas.ChosenRouteData:
@@ -283,7 +292,7 @@ def create_or_clean_chosen_route_data(
         )
     return schemas.ChosenRouteData.parse_obj(chosen_route_data)
 
-@sync_to_async
+@db_executor
 def get_chosen_route_data(telegram_id: int) -> schemas.ChosenRouteData:
     package_price_subquery = Subquery(
         models.Price.objects
@@ -317,7 +326,7 @@ def get_chosen_route_data(telegram_id: int) -> schemas.ChosenRouteData:
     return schemas.ChosenRouteData.parse_obj(chosen_route_data.first())
     
 
-# @sync_to_async
+# @db_executor
 # def get_user_ticket_choose_data(telegram_id: int) -> schemas.UserTicketChooseData:
 #     user: models.TelegramUser = (
 #         models.TelegramUser.objects.get(telegram_id=telegram_id)
@@ -328,7 +337,7 @@ def get_chosen_route_data(telegram_id: int) -> schemas.ChosenRouteData:
 #     return schemas.UserTicketChooseData.parse_obj(ticket_data)
 
 
-@sync_to_async
+@db_executor
 def get_routes_with_available_seats() -> list[schemas.Route]:
     routes = (
         models.Route.objects
@@ -367,86 +376,162 @@ def get_routes_with_available_seats() -> list[schemas.Route]:
 
 # Ticket funcions ------------------------
 
-@sync_to_async
-def book_ticket(
-    route_id: int,
+@db_executor
+def book_tickets(
+    route_id: int | None,
     start_station_id: int,
     end_station_id: int,
     telegram_id: int,
-    passenger: schemas.Person,
-    type_id: int,
-): 
-    user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    person = models.Person.objects.filter(name=passenger.name, surname=passenger.surname, telegram_user=user).first()
-    if not person:
-        person = models.Person.objects.create(
-                name=passenger.name,
-                surname=passenger.surname,
-                telegram_user=user,
+    passengers: list[tuple[schemas.Person, int]],
+    route_code: str | None = None,
+) -> list[schemas.Ticket]:
+    """
+    Reserve tickets for all (passenger, ticket type id) of one order.
+    Orders of one route are serialized by locking the route row, so seats
+    are checked and taken atomically. A departure of a schedule (route_id
+    is None) gets its route here. Raises NotEnoughSeats.
+    """
+    user = (
+        models.TelegramUser.objects
+        .select_related('language')
+        .get(telegram_id=telegram_id)
+    )
+    stations = (
+        models.Station.objects
+        .select_related('town')
+        .in_bulk([start_station_id, end_station_id])
+    )
+    start_station, end_station = translations.translate_stations(
+        [stations[start_station_id], stations[end_station_id]],
+        user.language_id,
+    )
+    ticket_types = {
+        ticket_type.id: ticket_type
+        for ticket_type in translations.translate_ticket_types(
+            models.TicketType.objects.filter(
+                id__in={type_id for _, type_id in passengers},
+            ),
+            user.language_id,
+        )
+    }
+    with transaction.atomic():
+        if route_id is None:
+            route_id = materialize_departure(route_code)
+        route = (
+            models.Route.objects
+            .select_for_update(of=('self',))
+            .select_related(
+                'start_station__town', 'end_station__town', 'bus', 'driver',
+            )
+            .prefetch_related('bus__photos', 'bus__options')
+            .get(id=route_id)
+        )
+        departure_time = (
+            models.RouteStation.objects
+            .filter(route_id=route_id)
+            .filter(station_id=start_station_id)
+            .first()
+            .departure_time
+        )
+        price = (
+            models.Price.objects
+            .filter(route_id=route_id)
+            .filter(from_station_id=start_station_id)
+            .filter(to_station_id=end_station_id)
+            .first()
+            .ticket_price
+        )
+        release_expired_bookings(route_id)
+        available_seats = route.bus.seats - (
+            models.RouteSegmentOccupancy.get_seats_taken(
+                route_id, start_station_id, end_station_id,
+            )
+        )
+        if available_seats < len(passengers):
+            raise exceptions.NotEnoughSeats(max(available_seats, 0))
+        persons = get_or_create_persons(
+            user, [passenger for passenger, _ in passengers],
+        )
+        # bulk_create does not send post_save, so seats are occupied below
+        tickets = models.Ticket.objects.bulk_create(
+            models.Ticket(
+                owner=user,
+                route=route,
+                start_station=start_station,
+                end_station=end_station,
+                passenger=persons[(passenger.name, passenger.surname)],
+                type=ticket_types[type_id],
+                ticket_code=uuid.uuid4(),
+                is_paid=False,
+                is_booked=True,
+            ) for passenger, type_id in passengers
+        )
+        if not models.RouteSegmentOccupancy.occupy(
+            route_id, start_station_id, end_station_id, seats=len(tickets),
+        ):
+            transaction.on_commit(
+                lambda: models.RouteSegmentOccupancy.rebuild(route_id)
             )
+    for ticket in tickets:
+        ticket.departure_time = departure_time
+        ticket.price = price
+    return list(schemas.Ticket.parse_obj(ticket) for ticket in tickets)
 
-    ticket = models.Ticket.objects.create(
-        owner=user,
-        route_id=route_id,
-        start_station_id=start_station_id,
-        end_station_id=end_station_id,
-        passenger=person,
-        type_id=type_id,
-        is_paid=False,
-        is_booked=True,
-    )
-    ticket.departure_time = (
-        models.RouteStation.objects
-        .filter(route_id=route_id)
-        .filter(station_id=start_station_id)
-        .first()
-        .departure_time
-    )
-    ticket.start_station.name = (
-        models.StationTranslations.objects
-        .filter(station_id=start_station_id)
-        .filter(language=user.language)
-        .first()
-        .translation
-    )
-    ticket.start_station.town.name = (
-        models.TownTranslations.objects
-        .filter(town_id=ticket.start_station.town.id)
-        .filter(language=user.language)
-        .first()
-        .translation
-    )
-    ticket.end_station.name = (
-        models.StationTranslations.objects
-        .filter(station_id=end_station_id)
-        .filter(language=user.language)
-        .first()
-        .translation
-    )
-    ticket.end_station.town.name = (
-        models.TownTranslations.objects
-        .filter(town_id=ticket.end_station.town.id)
-        .filter(language=user.language)
-        .first()
-        .translation
-    )
-    ticket.type.name = (
-        models.TicketTypeTranslations.objects
-        .get(ticket_type_id=type_id, language=user.language)
-        .translation
-    )
-    price = (
-        models.Price.objects
-        .filter(route_id=route_id)
-        .filter(from_station_id=start_station_id)
-        .filter(to_station_id=end_station_id)
-        .first()
-        .ticket_price 
-    ) 
-    ticket.price = price
-    return schemas.Ticket.parse_obj(ticket)
 
-@sync_to_async
+def release_expired_bookings(route_id: int) -> None:
+    # post_delete of every ticket releases its segments
+    (
+        models.Ticket.objects
+        .filter(route=route_id)
+        .filter(is_booked=True)
+        .filter(created_time__lt=timezone.now() - models.Ticket.booking_time)
+        .delete()
+    )
+
+
+@db_executor
+def delete_expired_bookings(tickets_ids: list[int]) -> int:
+    """Delete tickets of expired orders which were not paid in one query"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM ticket WHERE id = ANY(%s) AND is_booked '
+                'RETURNING route_id, start_station_id, end_station_id',
+                [tickets_ids],
+            )
+            released = Counter(cursor.fetchall())
+        # raw delete sends no post_delete, so seats are released here
+        for (route_id, start_station_id, end_station_id), seats in (
+            released.items()
+        ):
+            models.RouteSegmentOccupancy.occupy(
+                route_id, start_station_id, end_station_id, seats=-seats,
+            )
+    return sum(released.values())
+
+
+def get_or_create_persons(
+    user: models.TelegramUser,
+    passengers: list[schemas.Person],
+) -> dict[tuple[str, str], models.Person]:
+    names = {(passenger.name, passenger.surname) for passenger in passengers}
+    persons = {}
+    for person in (
+        models.Person.objects
+        .filter(telegram_user=user)
+        .filter(name__in={name for name, _ in names})
+        .filter(surname__in={surname for _, surname in names})
+    ):
+        persons.setdefault((person.name, person.surname), person)
+    created_persons = models.Person.objects.bulk_create(
+        models.Person(name=name, surname=surname, telegram_user=user)
+        for name, surname in names - persons.keys()
+    )
+    for person in created_persons:
+        persons[(person.name, person.surname)] = person
+    return persons
+
+@db_executor
 def get_ticket(ticket_id: int) -> schemas.Ticket:
     departure_time_subquery = Subquery(
         models.RouteStation.objects
@@ -479,12 +564,12 @@ def get_ticket(ticket_id: int) -> schemas.Ticket:
     return schemas.Ticket.parse_obj(ticket)
 
 
-@sync_to_async
+@db_executor
 def is_ticket_exists(ticket_id: int) -> bool:
     return models.Ticket.objects.filter(id=ticket_id).exists()
 
 
-@sync_to_async
+@db_executor
 def mark_ticket_as_paid(ticket_id: int, payment_id: int) -> schemas.Ticket:
     (
         models.Ticket.objects
@@ -499,7 +584,7 @@ def mark_ticket_as_paid(ticket_id: int, payment_id: int) -> schemas.Ticket:
     ticket = models.Ticket.objects.get(id=ticket_id)
     return schemas.Ticket.parse_obj(ticket)
 
-@sync_to_async
+@db_executor
 def mark_ticket_as_pay_in_bus(ticket_id: int) -> schemas.Ticket:
     (
         models.Ticket.objects
@@ -512,34 +597,25 @@ def mark_ticket_as_pay_in_bus(ticket_id: int) -> schemas.Ticket:
     ticket = models.Ticket.objects.get(id=ticket_id)
     return schemas.Ticket.parse_obj(ticket)
 
-@sync_to_async
+@db_executor
 def delete_ticket(ticket_id: int) -> schemas.Ticket:
     ticket = models.Ticket.objects.get(id=ticket_id)
     ticket_schema = schemas.Ticket.parse_obj(ticket)
     ticket.delete()
     return ticket_schema
 
-@sync_to_async
+@db_executor
 def get_ticket_types(telegram_id: int) -> list[schemas.TicketType]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    ticket_types = (
-        models.TicketType.objects
-        .all()
-    )
-    for ticket_type in ticket_types:
-        ticket_type.name = (
-        models.TicketTypeTranslations.objects
-        .filter(language=user.language)
-        .filter(ticket_type=ticket_type)
-        .first()
-        .translation
+    ticket_types = translations.translate_ticket_types(
+        models.TicketType.objects.all(), user.language_id,
     )
     return list(
         schemas.TicketType.parse_obj(ticket_type)
         for ticket_type in ticket_types
     )
 
-@sync_to_async
+@db_executor
 def get_tickets_with_unique_passengers(
     telegram_id: int,
 ) -> list[schemas.Ticket]:
@@ -555,7 +631,7 @@ def get_tickets_with_unique_passengers(
     )
 
 
-@sync_to_async
+@db_executor
 def get_user_valid_tickets(telegram_id: int):
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     departure_time_subquery = Subquery(
@@ -596,7 +672,7 @@ def get_user_valid_tickets(telegram_id: int):
     )
 
 
-@sync_to_async
+@db_executor
 def get_user_archive_tickets(telegram_id: int) -> list[schemas.Ticket]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     departure_time_subquery = Subquery(
@@ -627,110 +703,33 @@ def get_user_archive_tickets(telegram_id: int) -> list[schemas.Ticket]:
 
 # Route functions ------------------------
 
-@sync_to_async
+@db_executor
 def get_route(
     start_station_code: str,
     end_station_code: str,
     route_code: str,
 ) -> schemas.Route:
-    user_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station__code=start_station_code)
-        .values('station_index')
-    )
-    user_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station__code=end_station_code)
-        .values('station_index')
-        )
-    departure_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station__code=start_station_code)
-        .values('departure_time')
-    )
-    arrival_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station__code=end_station_code)
-        .values('departure_time')
-    )
-    route_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
-    )
-    ticket_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('start_station'))
-        .values('station_index')
-    )
-    ticket_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
-    )
-    seats_taken_subquery = Subquery(
-        models.Ticket.objects
-        .annotate(
-            ticket_start_station_index=ticket_start_station_index_subquery,
-            ticket_end_station_index=ticket_end_station_index_subquery,
-        )
-        .filter(
-            ticket_start_station_index__lte=OuterRef('user_end_station_index'),
-            ticket_end_station_index__gt=OuterRef('user_start_station_index'),
-            route=OuterRef('pk'),
-        )
-        .annotate(count=Func(F('id'), function='Count'))
-        .values('count')
-    )
-    get_available_seats = (
-        F('bus__seats') - F('seats_taken')
+    user_start_station = (
+        models.Station.objects.select_related('town')
+        .get(code=start_station_code)
     )
-    beneficiary_count_subquery = Subquery(
-        models.Ticket.objects
-        .filter(route=OuterRef('pk'))
-        .exclude(type__name='Дорослий')
-        .annotate(count=Func(F('id'), function='Count'))
-        .values('count')
-    )
-    package_price_subquery = Subquery(
-        models.Price.objects
-        .filter(route=OuterRef('pk'))
-        .filter(from_station__code=start_station_code)
-        .filter(to_station__code=end_station_code)
-        .values('package_price')
+    user_end_station = (
+        models.Station.objects.select_related('town')
+        .get(code=end_station_code)
     )
     route = (
-        models.Route.objects
-        .annotate(
-            user_start_station_index=user_start_station_index_subquery,
-            user_end_station_index=user_end_station_index_subquery,
-            route_start_station_index=Value(1),
-            route_end_station_index=route_end_station_index_subquery,
-            departure_time=departure_time_subquery,
-            arrival_time=arrival_time_subquery,
-            seats_taken=seats_taken_subquery,
-            available_seats=get_available_seats,
-            beneficiary_count=beneficiary_count_subquery,
-            pack_price=package_price_subquery,
-        )
-        .filter(user_start_station_index__lt=F('user_end_station_index'))
+        get_route_search_queryset(user_start_station.id, user_end_station.id)
+        .prefetch_related('bus__photos', 'bus__options')
         .filter(available_seats__gt=0)
         .filter(active=True)
         .filter(code=route_code)
         .first()
     )
-    route.user_start_station = models.Station.objects.get(code=start_station_code)
-    route.user_end_station = models.Station.objects.get(code=end_station_code)
+    route.user_start_station = user_start_station
+    route.user_end_station = user_end_station
     return schemas.Route.parse_obj(route)
 
-@sync_to_async
+@db_executor
 def is_route_started(
     route_id: int,
     from_station_id: int,
@@ -751,178 +750,46 @@ def is_route_started(
         .first()
     )
     
-@sync_to_async
+@db_executor
 def get_routes_with_user_route_data(telegram_id: int) -> list[schemas.Route]:
     chosen_route_data: models.ChosenRouteData = (
         models.ChosenRouteData.objects.
         filter(user=telegram_id).first()
     )
-    user_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=chosen_route_data.from_station)
-        .values('station_index')
-    )
-    user_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=chosen_route_data.to_station)
-        .values('station_index')
-        )
-    departure_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=chosen_route_data.from_station)
-        .values('departure_time')
-    )
-    arrival_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=chosen_route_data.to_station)
-        .values('departure_time')
-    )
-    is_allowed_subquery = Exists(
-        Subquery(
-            models.DisallowedWay.objects
-            .filter(from_station=chosen_route_data.from_station)
-            .filter(to_station=chosen_route_data.to_station)
-        ),
-        negated=True,
-    )
-    package_price_subquery = Subquery(
-        models.Price.objects
-        .filter(route=OuterRef('pk'))
-        .filter(from_station=chosen_route_data.from_station)
-        .filter(to_station=chosen_route_data.to_station)
-        .values('package_price')
-    )
     routes = (
-        models.Route.objects
-        .annotate(
-            user_start_station_index=user_start_station_index_subquery,
-            user_end_station_index=user_end_station_index_subquery,
-            departure_time=departure_time_subquery,
-            arrival_time=arrival_time_subquery,
-            is_allowed=is_allowed_subquery,
-            package_price=package_price_subquery,
+        get_route_search_queryset(
+            chosen_route_data.from_station,
+            chosen_route_data.to_station,
+        )
+        .prefetch_related('bus__photos', 'bus__options')
+        .filter(
+            get_is_allowed_way_filter(
+                chosen_route_data.from_station,
+                chosen_route_data.to_station,
+            )
         )
-        .filter(user_start_station_index__lt=F('user_end_station_index'))
-        .filter(is_allowed=True)
         .filter(departure_time__gt=timezone.now())
         .filter(departure_time__lt=timezone.now()+datetime.timedelta(weeks=3))
     )
     return list(schemas.Route.parse_obj(route) for route in routes)
 
-@sync_to_async
+@db_executor
 def get_routes_from_to_with_available_seats(
     start_station_id: int,
     end_station_id: int,
 ) -> list[schemas.Route]:
-    user_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=start_station_id)
-        .values('station_index')
-    )
-    user_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=end_station_id)
-        .values('station_index')
-        )
-    departure_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=end_station_id)
-        .values('departure_time')
-    )
-    arrival_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=end_station_id)
-        .values('departure_time')
-    )
-    is_allowed_subquery = Exists(
-        Subquery(
-            models.DisallowedWay.objects
-            .filter(from_station=start_station_id)
-            .filter(to_station=end_station_id)
-        ),
-        negated=True,
-    )
-    ticket_price_subquery = Subquery(
-        models.Price.objects
-        .filter(route=OuterRef('pk'))
-        .filter(from_station=start_station_id)
-        .filter(to_station=end_station_id)
-        .values('ticket_price')
-    )
-    route_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
-    )
-    ticket_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('start_station'))
-        .values('station_index')
-    )
-    ticket_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
-    )
-    seats_taken_subquery = Subquery(
-        models.Ticket.objects
-        .annotate(
-            ticket_start_station_index=ticket_start_station_index_subquery,
-            ticket_end_station_index=ticket_end_station_index_subquery,
-        )
-        .filter(
-            route=OuterRef('pk'),
-            ticket_start_station_index__lte=OuterRef('user_end_station_index'),
-            ticket_end_station_index__gt=OuterRef('user_start_station_index'),
-        )
-        .annotate(count=Func(F('id'), function='Count'))
-        .values('count')
-    )
-    get_available_seats = (
-        F('bus__seats') - F('seats_taken')
-    )
-    user_departure_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=start_station_id)
-        .values('departure_time')
-    )
     routes = (
-        models.Route.objects
-        .annotate(
-            user_start_station_index=user_start_station_index_subquery,
-            user_end_station_index=user_end_station_index_subquery,
-            route_start_station_index=Value(1),
-            route_end_station_index=route_end_station_index_subquery,
-            departure_time=departure_time_subquery,
-            arrival_time=arrival_time_subquery,
-            is_allowed=is_allowed_subquery,
-            ticket_price=ticket_price_subquery,
-            seats_taken=seats_taken_subquery,
-            available_seats=get_available_seats,
-            user_departure_time=user_departure_time_subquery,
-        )
-        .filter(user_start_station_index__lt=F('user_end_station_index'))
+        get_route_search_queryset(start_station_id, end_station_id)
+        .prefetch_related('bus__photos', 'bus__options')
         .filter(available_seats__gt=0)
-        .filter(is_allowed=True)
+        .filter(get_is_allowed_way_filter(start_station_id, end_station_id))
         .filter(active=True)
         .filter(departure_time__gt=timezone.now())
     )
     return list(schemas.Route.parse_obj(route) for route in routes)
 
 
-@sync_to_async
+@db_executor
 def get_routes_from_to_in_date(
     start_station_id: int,
     end_station_id: int,
@@ -930,160 +797,320 @@ def get_routes_from_to_in_date(
     telegram_id: int
 ):
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    user_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=start_station_id)
-        .values('station_index')
-    )
-    user_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=end_station_id)
-        .values('station_index')
-        )
-    departure_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=start_station_id)
-        .values('departure_time')
-    )
-    arrival_time_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=end_station_id)
-        .values('departure_time')
+    routes = (
+        get_route_search_queryset(start_station_id, end_station_id)
+        .prefetch_related('bus__photos', 'bus__options')
+        .filter(available_seats__gt=0)
+        .filter(get_is_allowed_way_filter(start_station_id, end_station_id))
+        .filter(active=True)
+        .filter(departure_time__year=date.year)
+        .filter(departure_time__month=date.month)
+        .filter(departure_time__day=date.day)
+        .order_by('departure_time', 'id')
+    )[:10]
+    user_start_station, user_end_station = translations.translate_stations(
+        (
+            models.Station.objects.select_related('town').get(pk=start_station_id),
+            models.Station.objects.select_related('town').get(pk=end_station_id),
+        ),
+        user.language_id,
     )
-    is_allowed_subquery = Exists(
-        Subquery(
+    for route in routes:
+        route.user_start_station = user_start_station
+        route.user_end_station = user_end_station
+    return list(schemas.Route.parse_obj(route) for route in routes)
+
+
+@db_executor
+def get_timetable_rows(route_ids: list[int] | None = None) -> dict[str, list]:
+    routes = (
+        models.Route.objects
+        .filter(active=True)
+        .filter(routestation__departure_time__gt=timezone.now())
+    )
+    if route_ids is not None:
+        routes = routes.filter(id__in=route_ids)
+    routes = list(
+        routes.distinct()
+        .values_list('id', 'code', 'bus_id', 'bus__seats')
+    )
+    active_route_ids = [route[0] for route in routes]
+    return {
+        'routes': routes,
+        'route_stations': list(
+            models.RouteStation.objects
+            .filter(route__in=active_route_ids)
+            .order_by('route', 'station_index')
+            .values_list(
+                'route_id', 'station_id', 'station_index', 'departure_time',
+            )
+        ),
+        'prices': list(
+            models.Price.objects
+            .filter(route__in=active_route_ids)
+            .values_list(
+                'route_id', 'from_station_id', 'to_station_id',
+                'ticket_price', 'package_price',
+            )
+        ),
+        'disallowed_ways': list(
             models.DisallowedWay.objects
-            .filter(from_station=start_station_id)
-            .filter(to_station=end_station_id)
+            .filter(route__in=active_route_ids)
+            .values_list('route_id', 'from_station_id', 'to_station_id')
         ),
-        negated=True,
-    )
-    ticket_price_subquery = Subquery(
-        models.Price.objects
-        .filter(route=OuterRef('pk'))
-        .filter(from_station=start_station_id)
-        .filter(to_station=end_station_id)
-        .values('ticket_price')
-    )
-    package_price_subquery = Subquery(
-        models.Price.objects
-        .filter(route=OuterRef('pk'))
-        .filter(from_station=start_station_id)
-        .filter(to_station=end_station_id)
-        .values('package_price')
-    )
-    route_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('pk'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
-    )
-    ticket_start_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('start_station'))
-        .values('station_index')
+    }
+
+
+@db_executor
+def get_schedule_timetable_rows(
+    date_from: datetime.date,
+    date_to: datetime.date,
+) -> dict[str, list]:
+    schedules = list(
+        models.RouteSchedule.objects
+        .filter(active=True, valid_from__lte=date_to)
+        .filter(Q(valid_until__isnull=True) | Q(valid_until__gte=date_from))
+        .values_list(
+            'id', 'code', 'bus_id', 'bus__seats', 'weekdays', 'valid_from',
+            'valid_until',
+        )
     )
-    ticket_end_station_index_subquery = Subquery(
-        models.RouteStation.objects
-        .filter(route=OuterRef('route'))
-        .filter(station=OuterRef('end_station'))
-        .values('station_index')
+    schedule_ids = [schedule[0] for schedule in schedules]
+    return {
+        'schedules': schedules,
+        'schedule_stations': list(
+            models.ScheduleStation.objects
+            .filter(schedule__in=schedule_ids)
+            .order_by('schedule', 'station_index')
+            .values_list(
+                'schedule_id', 'station_id', 'station_index',
+                'departure_time', 'day_offset',
+            )
+        ),
+        'prices': list(
+            models.SchedulePrice.objects
+            .filter(schedule__in=schedule_ids)
+            .values_list(
+                'schedule_id', 'from_station_id', 'to_station_id',
+                'ticket_price', 'package_price',
+            )
+        ),
+        'disallowed_ways': list(
+            models.ScheduleDisallowedWay.objects
+            .filter(schedule__in=schedule_ids)
+            .values_list('schedule_id', 'from_station_id', 'to_station_id')
+        ),
+        # departures which have a route are in the timetable already
+        'routes': list(
+            models.Route.objects
+            .filter(
+                schedule__in=schedule_ids,
+                departure_date__range=(date_from, date_to),
+            )
+            .values_list('schedule_id', 'departure_date')
+        ),
+    }
+
+
+@db_executor
+def get_routes_seats_taken(
+    segments: dict[int, tuple[int, int]],
+) -> dict[int, int]:
+    if not segments:
+        return {}
+    query = Q()
+    for route_id, (start_station_index, end_station_index) in segments.items():
+        query |= Q(
+            route=route_id,
+            segment_index__gte=start_station_index,
+            segment_index__lt=end_station_index,
+        )
+    return dict(
+        models.RouteSegmentOccupancy.objects
+        .filter(query)
+        .values('route')
+        .annotate(seats_taken=Max('seats_taken'))
+        .values_list('route', 'seats_taken')
     )
-    seats_taken_subquery = Subquery(
-        models.Ticket.objects
-        .annotate(
-            ticket_start_station_index=ticket_start_station_index_subquery,
-            ticket_end_station_index=ticket_end_station_index_subquery,
+
+
+@db_executor
+def has_schedules_between(start_station_id: int, end_station_id: int) -> bool:
+    return (
+        models.ScheduleStation.objects
+        .filter(
+            station=start_station_id,
+            schedule__active=True,
+            schedule__schedulestation__station=end_station_id,
+            schedule__schedulestation__station_index__gt=F('station_index'),
         )
         .filter(
-            ticket_start_station_index__lte=OuterRef('user_end_station_index'),
-            ticket_end_station_index__gt=OuterRef('user_start_station_index'),
-            route=OuterRef('pk'),
+            Q(schedule__valid_until__isnull=True)
+            | Q(schedule__valid_until__gte=timezone.localdate())
         )
-        .annotate(count=Func(F('id'), function='Count'))
-        .values('count')
-    )
-    get_available_seats = (
-        F('bus__seats') - F('seats_taken')
+        .exists()
+    )
+
+
+def materialize_departure(route_code: str) -> int:
+    """
+    Id of the route of a departure of a schedule, created when it is booked
+    first. Raises NotEnoughSeats if the schedule does not run anymore.
+    """
+    departure = models.RouteSchedule.parse_departure_code(route_code)
+    if departure is None:
+        raise exceptions.NotEnoughSeats(0)
+    schedule_code, departure_date = departure
+    schedule = models.RouteSchedule.objects.filter(code=schedule_code).first()
+    if schedule is None or not schedule.runs_on(departure_date):
+        raise exceptions.NotEnoughSeats(0)
+    return schedule.materialize(departure_date).id
+
+
+@db_executor
+def get_segments_seats_taken(
+    route_ids: list[int],
+) -> dict[tuple[int, int], int]:
+    return {
+        (route_id, segment_index): seats_taken
+        for route_id, segment_index, seats_taken in
+        models.RouteSegmentOccupancy.objects
+        .filter(route__in=route_ids, seats_taken__gt=0)
+        .values_list('route', 'segment_index', 'seats_taken')
+    }
+
+
+@db_executor
+def get_departure_recipients(
+    route_id: int,
+    start_station_id: int,
+    with_packages: bool = True,
+    only_notified: bool = True,
+) -> tuple[schemas.Station, list[tuple[int, str]]]:
+    """
+    Start station with its departure time and (telegram id, language code)
+    of every owner of a ticket or a package which departs from it
+    """
+    route_station = (
+        models.RouteStation.objects
+        .select_related('station__town')
+        .filter(route=route_id)
+        .get(station=start_station_id)
     )
-    beneficiary_count_subquery = Subquery(
+    route_station.station.departure_time = route_station.departure_time
+    owners = (
         models.Ticket.objects
-        .filter(route=OuterRef('pk'))
-        .exclude(type__name='Дорослий')
-        .annotate(count=Func(F('id'), function='Count'))
-        .values('count')
+        .filter(route=route_id)
+        .filter(start_station=start_station_id)
+        .filter(is_booked=False)
     )
-    routes = (
+    if only_notified:
+        owners = owners.filter(owner__is_notifications_enabled=True)
+    owners = owners.values_list('owner__telegram_id', 'owner__language__code')
+    if with_packages:
+        packages_owners = (
+            models.Package.objects
+            .filter(route=route_id)
+            .filter(start_station=start_station_id)
+        )
+        if only_notified:
+            packages_owners = packages_owners.filter(
+                owner__is_notifications_enabled=True,
+            )
+        owners = owners.union(
+            packages_owners.values_list(
+                'owner__telegram_id', 'owner__language__code',
+            )
+        )
+    else:
+        owners = owners.distinct()
+    return schemas.Station.parse_obj(route_station.station), list(owners)
+
+
+# ------------------------ Route functions
+
+def get_route_search_queryset(
+    start_station_id: int,
+    end_station_id: int,
+) -> QuerySet:
+    """
+    Routes that go from start to end station, with the stops, prices and
+    seats of that way taken in one query: both RouteStation rows and the
+    price are joined once and segments are aggregated per route.
+    """
+    return (
         models.Route.objects
+        .select_related(
+            'start_station__town', 'end_station__town', 'bus', 'driver',
+        )
         .annotate(
-            user_start_station_index=user_start_station_index_subquery,
-            user_end_station_index=user_end_station_index_subquery,
-            route_start_station_index=Value(1),
-            route_end_station_index=route_end_station_index_subquery,
-            departure_time=departure_time_subquery,
-            arrival_time=arrival_time_subquery,
-            is_allowed=is_allowed_subquery,
-            ticket_price=ticket_price_subquery,
-            pack_price=package_price_subquery,
-            seats_taken=seats_taken_subquery,
-            available_seats=get_available_seats,
-            beneficiary_count=beneficiary_count_subquery,
+            user_start_stop=FilteredRelation(
+                'routestation',
+                condition=Q(routestation__station=start_station_id),
+            ),
+            user_end_stop=FilteredRelation(
+                'routestation',
+                condition=Q(routestation__station=end_station_id),
+            ),
+            user_price=FilteredRelation(
+                'price',
+                condition=Q(
+                    price__from_station=start_station_id,
+                    price__to_station=end_station_id,
+                ),
+            ),
         )
-        .filter(user_start_station_index__lt=F('user_end_station_index'))
-        .filter(available_seats__gt=0)
-        .filter(is_allowed=True)
-        .filter(active=True)
-        .filter(departure_time__year=date.year)
-        .filter(departure_time__month=date.month)
-        .filter(departure_time__day=date.day)
-    )[:10]
-    user_start_station = models.Station.objects.get(pk=start_station_id)
-    user_end_station = models.Station.objects.get(pk=end_station_id)
-    translage_station(user_start_station, user)
-    translage_station(user_end_station, user)
-    for route in routes:
-        route.user_start_station = user_start_station
-        route.user_end_station = user_end_station
-        route.user_departure_time = (
-            models.RouteStation.objects
-            .filter(route=route)
-            .filter(station=start_station_id)
-            .first().departure_time
+        .annotate(
+            user_start_station_index=F('user_start_stop__station_index'),
+            user_end_station_index=F('user_end_stop__station_index'),
+            departure_time=F('user_start_stop__departure_time'),
+            arrival_time=F('user_end_stop__departure_time'),
+            user_departure_time=F('user_start_stop__departure_time'),
+            user_arrival_time=F('user_end_stop__departure_time'),
+            ticket_price=F('user_price__ticket_price'),
+            pack_price=F('user_price__package_price'),
         )
-        route.user_arrival_time = (
-            models.RouteStation.objects
-            .filter(route=route)
-            .filter(station=end_station_id)
-            .first().departure_time
+        .filter(user_start_station_index__lt=F('user_end_station_index'))
+        .annotate(
+            seats_taken=Coalesce(
+                Max(
+                    'segments_occupancy__seats_taken',
+                    filter=Q(
+                        segments_occupancy__segment_index__gte=F(
+                            'user_start_station_index'
+                        ),
+                        segments_occupancy__segment_index__lt=F(
+                            'user_end_station_index'
+                        ),
+                    ),
+                ),
+                0,
+            ),
         )
-    return list(schemas.Route.parse_obj(route) for route in routes)
+        .annotate(available_seats=F('bus__seats') - F('seats_taken'))
+    )
 
 
+def get_is_allowed_way_filter(
+    start_station_id: int,
+    end_station_id: int,
+) -> Exists:
+    return ~Exists(
+        models.DisallowedWay.objects
+        .filter(from_station=start_station_id)
+        .filter(to_station=end_station_id)
+    )
 
-# ------------------------ Route functions
 
 def translage_station(station, user):
-    station.name = models.StationTranslations.objects.get(
-        station=station,
-        language=user.language,
-    ).translation
-    station.town.name = models.TownTranslations.objects.get(
-        town=station.town,
-        language=user.language,
-    ).translation
-    return station
+    return translations.translate_station(station, user.language_id)
 
 # Package functions ------------------------
 
-@sync_to_async
+@db_executor
 def create_package(
     telegram_id: int,
-    route_id: int,
+    route_id: int | None,
     start_station_id: int,
     sender_full_name: str,
     sender_phone_number: str,
@@ -1092,8 +1119,11 @@ def create_package(
     end_station_id: int,
     is_paid: bool,
     payment_id: str | None = None, 
+    route_code: str | None = None,
 ) -> schemas.Package:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
+    if route_id is None:
+        route_id = materialize_departure(route_code)
     package_id = (
         models.Package.objects
         .create(
@@ -1122,7 +1152,7 @@ def create_package(
     return package_id
 
 
-@sync_to_async
+@db_executor
 def get_packages_with_unique_senders(
     telegram_id: int,
 ) -> list[schemas.Package]:
@@ -1137,7 +1167,7 @@ def get_packages_with_unique_senders(
         for package in packages_with_unique_pib
     )
 
-@sync_to_async
+@db_executor
 def get_packages_with_unique_receivers(
     telegram_id: int,
 ) -> list[schemas.Package]:
@@ -1153,7 +1183,7 @@ def get_packages_with_unique_receivers(
     )
 
 
-@sync_to_async
+@db_executor
 def get_package(id: int) -> schemas.Package:
     departure_time_subquery = Subquery(
         models.RouteStation.objects
@@ -1186,7 +1216,7 @@ def get_package(id: int) -> schemas.Package:
     return schemas.Package.parse_obj(package)
 
 
-@sync_to_async
+@db_executor
 def get_user_valid_packages(telegram_id: int) -> list[schemas.Package]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     departure_time_subquery = Subquery(
@@ -1223,12 +1253,12 @@ def get_user_valid_packages(telegram_id: int) -> list[schemas.Package]:
     )
 
 
-@sync_to_async
+@db_executor
 def delete_package(id: int) -> None:
     models.Package.objects.filter(id=id).delete()
 
 
-@sync_to_async
+@db_executor
 def get_user_archive_packages(telegram_id: int) -> list[schemas.Package]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
     departure_time_subquery = Subquery(
@@ -1268,7 +1298,7 @@ def get_user_archive_packages(telegram_id: int) -> list[schemas.Package]:
 
 # Language functions ------------------------
 
-@sync_to_async
+@db_executor
 def get_languages() -> list[schemas.Language]:
     languages = models.Language.objects.all()
     return list(
@@ -1280,7 +1310,7 @@ def get_languages() -> list[schemas.Language]:
 
 # UserSearchStationHistory functions ------------------------ 
 
-@sync_to_async
+@db_executor
 def add_start_station_to_users_search_history(
     telegram_id: int,
     station_id: int,
@@ -1292,7 +1322,7 @@ def add_start_station_to_users_search_history(
     )
 
 
-@sync_to_async
+@db_executor
 def add_end_station_to_users_search_history(
     telegram_id: int,
     station_id: int,
@@ -1304,7 +1334,7 @@ def add_end_station_to_users_search_history(
     )
 
 
-@sync_to_async
+@db_executor
 def get_user_search_start_station_history(
     telegram_id: int,
 ) -> list[schemas.Station]:
@@ -1312,17 +1342,12 @@ def get_user_search_start_station_history(
     records = (
         models.UserStartStationHistory.objects
         .filter(user__telegram_id=telegram_id)
+        .select_related('station__town')
         .order_by('-id')
     )
-    for record in records:
-        record.station.name = models.StationTranslations.objects.get(
-            language=user.language,
-            station=record.station,
-        ).translation
-        record.station.town.name = models.TownTranslations.objects.get(
-            language=user.language,
-            town=record.station.town,
-        ).translation
+    translations.translate_stations(
+        (record.station for record in records), user.language_id,
+    )
             
     return list(
         schemas.Station.parse_obj(record.station)
@@ -1330,7 +1355,7 @@ def get_user_search_start_station_history(
     )
 
 
-@sync_to_async
+@db_executor
 def get_user_search_end_station_history(
     telegram_id: int,
 ) -> list[schemas.Station]:
@@ -1338,17 +1363,12 @@ def get_user_search_end_station_history(
     records = (
         models.UserEndStationHistory.objects
         .filter(user=user)
+        .select_related('station__town')
         .order_by('-id')
     )
-    for record in records:
-        record.station.name = models.StationTranslations.objects.get(
-            language=user.language,
-            station=record.station,
-        ).translation
-        record.station.town.name = models.TownTranslations.objects.get(
-            language=user.language,
-            town=record.station.town,
-        ).translation
+    translations.translate_stations(
+        (record.station for record in records), user.language_id,
+    )
         
     return list(
         schemas.Station.parse_obj(record.station)
@@ -1360,50 +1380,11 @@ def get_user_search_end_station_history(
 # StationLanguage functions ------------------------
 
 
-@sync_to_async
-def search_station_by_name(
-    name: str,
-    telegram_id: int
-) -> list[schemas.Station]:
-    user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    
-    records = (
-        models.Station.objects
-        .annotate(
-            station__name=Subquery(
-                models.StationTranslations.objects
-                .filter(language=user.language)
-                .filter(station=OuterRef('id'))
-                .values('translation')
-            ),
-        )
-        .annotate(
-            town__name=Subquery(
-                models.TownTranslations.objects
-                .filter(language=user.language)
-                .filter(town=OuterRef('town'))
-                .values('translation')
-            )
-        )
-        .annotate(
-            full_name=Concat(F('station__name'), Value('-'), F('town__name'))
-        )
-        .filter(full_name__icontains=name)
-    )    
-
-    for record in records:
-        record.name = record.station__name
-        record.town.name = record.town__name
-    return list(
-        schemas.Station.parse_obj(record)
-        for record in records
-    )
-
 # ------------------------ StationLanguage functions
 
 # RouteStation functions ------------------------
 
-@sync_to_async
+@db_executor
 def get_route_from_to_stations(
     start_station_code: str,
     end_station_code: str,
@@ -1428,13 +1409,14 @@ def get_route_from_to_stations(
             .values('station_index')
             )
         )
+        .select_related('station__town')
         .order_by('station_index')
     )
     stations = []
     for route_station in route_stations:
         route_station.station.departure_time = route_station.departure_time
-        translage_station(route_station.station, user)
         stations.append(route_station.station)
+    translations.translate_stations(stations, user.language_id)
     return list(
         schemas.Station.parse_obj(station)
         for station in stations
@@ -1446,47 +1428,35 @@ def get_route_from_to_stations(
 
 # Bus functions ------------------------
 
-@sync_to_async
+@db_executor
 def get_bus(
     bus_code: str,
     telegram_id: int,
 ):
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    bus = models.Bus.objects.get(code=bus_code)
-    translated_bus = models.BusTranslation.objects.get(
-        language=user.language,
-        bus=bus,
-    )
-    bus.name = translated_bus.name_translation
-    bus.description = translated_bus.description_translation
-    translated_options = []
-    for option in bus.options.all():
-        translated_option = models.BusOptionTranslation.objects.get(
-            language=user.language,
-            bus_option=option,
-        )
-        option.name = translated_option.translation
-        translated_options.append(
-            option
-        )
-
-    bus.options.set(translated_options)
+    bus = (
+        models.Bus.objects
+        .prefetch_related('options', 'photos')
+        .get(code=bus_code)
+    )
+    translations.translate_bus(bus, user.language_id)
+    # prefetched options are the same objects that parse_obj reads
+    translations.translate_bus_options(bus.options.all(), user.language_id)
     return schemas.Bus.parse_obj(bus)
 
     
 
-@sync_to_async
+@db_executor
 def get_popular_stations(
     telegram_id: int,
 ) -> list[schemas.Station]:
     user = models.TelegramUser.objects.get(telegram_id=telegram_id)
-    stations = (
+    stations = translations.translate_stations(
         models.Station.objects
         .filter(is_popular=True)
+        .select_related('town'),
+        user.language_id,
     )
-    for station in stations:
-        translage_station(station, user)
-        translage_station(station, user)
     return list(
         schemas.Station.parse_obj(station)
         for station in stations
@@ -1496,7 +1466,7 @@ def get_popular_stations(
 
 # ------------------------ Bus functions
 
-@sync_to_async
+@db_executor
 def get_quick_answers() -> list[schemas.QuickAnswer]:
     return [
         schemas.QuickAnswer.parse_obj(answer)
@@ -0,0 +1,132 @@
+import time
+import asyncio
+import logging
+import functools
+import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, TypeVar
+
+from django.db import close_old_connections
+
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DbExecutorStats:
+    workers: int
+    queued: int
+    running: int
+    calls: int
+    average_wait: float
+    max_wait: float
+
+
+class DbExecutor:
+    '''
+    Runs sync ORM calls of the bot in a bounded pool of threads, each with
+    its own Django connection, instead of the single thread used by
+    sync_to_async(thread_sensitive=True). Connections are kept for
+    CONN_MAX_AGE and closed by close_old_connections when stale or broken.
+    '''
+
+    def __init__(self, max_workers: int = 10, slow_wait: float = 1) -> None:
+        self._max_workers = max_workers
+        self._slow_wait = slow_wait
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._calls = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def setup(self, max_workers: int) -> None:
+        if self._executor is not None:
+            raise RuntimeError('Database executor is already running')
+        self._max_workers = max_workers
+
+    def __call__(
+        self,
+        func: Callable[..., T],
+    ) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            return await self.run(func, *args, **kwargs)
+        wrapper.func = func
+        return wrapper
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            self._queued += 1
+        future = self._get_executor().submit(
+            self._call, func, time.monotonic(), args, kwargs,
+        )
+        future.add_done_callback(self._forget_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> DbExecutorStats:
+        with self._lock:
+            return DbExecutorStats(
+                workers=self._max_workers,
+                queued=self._queued,
+                running=self._running,
+                calls=self._calls,
+                average_wait=(
+                    self._total_wait / self._calls if self._calls else 0
+                ),
+                max_wait=self._max_wait,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers,
+                        thread_name_prefix='db',
+                    )
+        return self._executor
+
+    def _forget_cancelled(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _call(
+        self,
+        func: Callable[..., T],
+        submitted: float,
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> T:
+        wait = time.monotonic() - submitted
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._calls += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        if wait > self._slow_wait:
+            logger.warning(
+                '%s waited %.2fs for a database thread', func.__name__, wait,
+            )
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._running -= 1
+
+
+db_executor = DbExecutor()
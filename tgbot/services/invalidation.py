@@ -0,0 +1,75 @@
+import json
+import asyncio
+import logging
+from typing import Callable
+
+import redis
+import aioredis
+from aioredis import Redis
+from django.conf import settings
+
+
+CHANNEL = 'cache_invalidation'
+
+logger = logging.getLogger(__name__)
+
+_handlers: dict[str, list[Callable[[int | str | None], None]]] = {}
+_connection: redis.Redis | None = None
+
+
+def subscribe(
+    cache: str,
+    handler: Callable[[int | str | None], None],
+) -> None:
+    _handlers.setdefault(cache, []).append(handler)
+
+
+def dispatch(cache: str, key: int | str | None = None) -> None:
+    for handler in _handlers.get(cache, []):
+        handler(key)
+
+
+def get_connection() -> redis.Redis:
+    '''Sync connection for Django signals and db functions'''
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _connection
+
+
+def publish(cache: str, key: int | str | None = None) -> None:
+    '''Drop local cache entries and notify other processes (sync)'''
+    dispatch(cache, key)
+    try:
+        get_connection().publish(
+            CHANNEL, json.dumps({'cache': cache, 'key': key}),
+        )
+    except redis.RedisError:
+        logger.exception('Could not publish %s invalidation', cache)
+
+
+async def listen(connection: Redis, reconnect_delay: int = 5) -> None:
+    while True:
+        pubsub = connection.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CHANNEL)
+            # messages could be lost while we were not subscribed
+            for cache in _handlers:
+                dispatch(cache)
+            async for message in pubsub.listen():
+                _handle_message(message)
+        except aioredis.ConnectionError:
+            logger.warning('Invalidation channel is lost, reconnecting')
+            await asyncio.sleep(reconnect_delay)
+        finally:
+            await pubsub.reset()
+
+
+def _handle_message(message: dict) -> None:
+    try:
+        data = json.loads(message['data'])
+        dispatch(data['cache'], data.get('key'))
+    except (ValueError, KeyError, TypeError):
+        logger.warning('Wrong invalidation message: %s', message)
+    except Exception:
+        logger.exception('Invalidation handler failed')
@@ -0,0 +1,271 @@
+import heapq
+import bisect
+import datetime
+from decimal import Decimal
+from dataclasses import dataclass
+from typing import Iterable, NamedTuple
+
+from django.utils import timezone
+
+from tgbot.services import db
+from tgbot.services.timetable import RouteStop, RouteTimetable, Timetable, \
+    TimetableMatch
+
+
+class Connection(NamedTuple):
+    departure_time: datetime.datetime
+    arrival_time: datetime.datetime
+    route: RouteTimetable
+    from_stop: RouteStop
+    to_stop: RouteStop
+
+
+@dataclass
+class Journey:
+    legs: list[TimetableMatch]
+
+    @property
+    def departure_time(self) -> datetime.datetime:
+        return self.legs[0].user_departure_time
+
+    @property
+    def arrival_time(self) -> datetime.datetime:
+        return self.legs[-1].user_arrival_time
+
+    @property
+    def transfers(self) -> int:
+        return len(self.legs) - 1
+
+    @property
+    def ticket_price(self) -> Decimal | None:
+        prices = [leg.ticket_price for leg in self.legs]
+        return None if None in prices else sum(prices)
+
+
+class ConnectionScan:
+    '''
+    Connections between neighbouring stops of all routes sorted by
+    departure. A search goes through them once from the departure time and
+    keeps the earliest arrival at every station (Connection Scan
+    Algorithm). A bus is boarded only at the start station or after the
+    minimum transfer time at a station it was reached, and is left when a
+    connection of it has no free seats. Buses are told apart by code, a
+    departure of a schedule without a route has no id.
+    '''
+
+    def __init__(self, routes: Iterable[RouteTimetable]) -> None:
+        connections = []
+        for route in routes:
+            stops = sorted(route.stops, key=lambda stop: stop.station_index)
+            for from_stop, to_stop in zip(stops, stops[1:]):
+                connections.append(
+                    Connection(
+                        from_stop.departure_time,
+                        to_stop.departure_time,
+                        route,
+                        from_stop,
+                        to_stop,
+                    )
+                )
+        connections.sort(key=lambda connection: connection[:2])
+        self._set_connections(connections)
+
+    def window(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+        routes: Iterable[RouteTimetable] = (),
+    ) -> 'ConnectionScan':
+        '''Connections departing between the times, with those of routes'''
+        scan = ConnectionScan(routes)
+        scan._set_connections(list(heapq.merge(
+            self._connections[
+                bisect.bisect_left(self._departures, after):
+                bisect.bisect_right(self._departures, before)
+            ],
+            scan._connections,
+            key=lambda connection: connection[:2],
+        )))
+        return scan
+
+    def get_route_ids(
+        self,
+        after: datetime.datetime,
+        before: datetime.datetime,
+    ) -> set[int]:
+        return {
+            connection.route.id for connection in self._connections[
+                bisect.bisect_left(self._departures, after):
+                bisect.bisect_right(self._departures, before)
+            ]
+            if connection.route.id is not None
+        }
+
+    def _set_connections(self, connections: list[Connection]) -> None:
+        self._connections = connections
+        self._departures = [
+            connection.departure_time for connection in connections
+        ]
+
+    def search(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        after: datetime.datetime,
+        departure_before: datetime.datetime,
+        arrival_before: datetime.datetime,
+        min_transfer_time: datetime.timedelta,
+        seats_taken: dict[tuple[int, int], int] | None = None,
+        seats: int = 1,
+    ) -> Journey | None:
+        seats_taken = seats_taken or {}
+        arrivals = {start_station_id: after}
+        # station: connections the bus was boarded and left with to reach it
+        reached_by: dict[int, tuple[Connection, Connection]] = {}
+        # route code: connection the bus was boarded with
+        boarded: dict[str, Connection] = {}
+        first = bisect.bisect_left(self._departures, after)
+        for connection in self._connections[first:]:
+            if connection.departure_time > arrival_before:
+                break
+            end_arrival = arrivals.get(end_station_id)
+            if end_arrival is not None and \
+                    end_arrival <= connection.departure_time:
+                break
+            route = connection.route
+            if self._get_free_seats(
+                route, connection.from_stop, connection.to_stop, seats_taken,
+            ) < seats:
+                boarded.pop(route.code, None)
+                continue
+            if route.code not in boarded:
+                from_station_id = connection.from_stop.station_id
+                arrival = arrivals.get(from_station_id)
+                if arrival is None:
+                    continue
+                if from_station_id == start_station_id:
+                    if connection.departure_time >= departure_before:
+                        continue
+                elif arrival + min_transfer_time > connection.departure_time:
+                    continue
+                boarded[route.code] = connection
+            boarding = boarded[route.code]
+            to_station_id = connection.to_stop.station_id
+            if (boarding.from_stop.station_id, to_station_id) in \
+                    route.disallowed_ways:
+                continue
+            arrival = arrivals.get(to_station_id)
+            if arrival is None or connection.arrival_time < arrival:
+                arrivals[to_station_id] = connection.arrival_time
+                reached_by[to_station_id] = (boarding, connection)
+        if end_station_id not in reached_by:
+            return None
+        legs = []
+        station_id = end_station_id
+        while station_id != start_station_id:
+            boarding, leaving = reached_by[station_id]
+            legs.append(
+                TimetableMatch(
+                    route=boarding.route,
+                    start_stop=boarding.from_stop,
+                    end_stop=leaving.to_stop,
+                    available_seats=self._get_free_seats(
+                        boarding.route,
+                        boarding.from_stop,
+                        leaving.to_stop,
+                        seats_taken,
+                    ),
+                )
+            )
+            station_id = boarding.from_stop.station_id
+        return Journey(legs[::-1])
+
+    @staticmethod
+    def _get_free_seats(
+        route: RouteTimetable,
+        from_stop: RouteStop,
+        to_stop: RouteStop,
+        seats_taken: dict[tuple[int, int], int],
+    ) -> int:
+        return route.seats - max(
+            (
+                seats_taken.get((route.id, segment_index), 0)
+                for segment_index in range(
+                    from_stop.station_index, to_stop.station_index,
+                )
+            ),
+            default=0,
+        )
+
+
+class JourneyPlanner:
+    '''
+    Journeys with transfers over the timetable. The connections are built
+    again when the timetable is reloaded, seats taken are read with one
+    query per search for the routes of the searched day. Departures of
+    schedules without a route are read for every search and merged into
+    the connections of the searched day.
+    '''
+
+    def __init__(
+        self,
+        timetable: Timetable,
+        min_transfer_time: datetime.timedelta = datetime.timedelta(minutes=15),
+        max_journey_time: datetime.timedelta = datetime.timedelta(days=1),
+    ) -> None:
+        self._timetable = timetable
+        self._min_transfer_time = min_transfer_time
+        self._max_journey_time = max_journey_time
+        self._routes: dict[int, RouteTimetable] | None = None
+        self._scan: ConnectionScan | None = None
+
+    async def find(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        date: datetime.date,
+        limit: int = 3,
+    ) -> list[Journey]:
+        '''Journeys departing on the date, by departure time'''
+        day_start = timezone.make_aware(
+            datetime.datetime(date.year, date.month, date.day),
+        )
+        after = max(day_start, timezone.now())
+        departure_before = day_start + datetime.timedelta(days=1)
+        arrival_before = departure_before + self._max_journey_time
+        # a departure of the day before can still be on its way
+        departures = await self._timetable.get_schedule_departures(
+            timezone.localdate(after - self._max_journey_time),
+            timezone.localdate(arrival_before),
+        )
+        scan = (await self._get_scan()).window(
+            after, arrival_before, departures,
+        )
+        seats_taken = await db.get_segments_seats_taken(
+            list(scan.get_route_ids(after, arrival_before)),
+        )
+        journeys = []
+        while len(journeys) < limit:
+            journey = scan.search(
+                start_station_id=start_station_id,
+                end_station_id=end_station_id,
+                after=after,
+                departure_before=departure_before,
+                arrival_before=arrival_before,
+                min_transfer_time=self._min_transfer_time,
+                seats_taken=seats_taken,
+            )
+            if journey is None:
+                break
+            journeys.append(journey)
+            # the next one leaves later
+            after = journey.departure_time + datetime.timedelta(seconds=1)
+        return journeys
+
+    async def _get_scan(self) -> ConnectionScan:
+        routes = await self._timetable.get_routes()
+        # the timetable replaces its dict of routes after every reload
+        if routes is not self._routes:
+            self._scan = ConnectionScan(routes.values())
+            self._routes = routes
+        return self._scan
@@ -0,0 +1,308 @@
+import time
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aiogram import Bot
+from aiogram.types import Message
+from aiogram.utils.exceptions import RetryAfter
+
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONAL = 0
+PROMOTIONAL = 1
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        '''Takes a token and returns 0, or returns seconds to wait for one'''
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate,
+        )
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        return (
+            self.tokens + (time.monotonic() - self.updated) * self.rate
+            >= self.capacity
+        )
+
+
+class MessageSenderClosed(Exception):
+    pass
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    number: int
+    chat_id: int = field(compare=False)
+    method: Callable[..., Awaitable[Any]] = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict[str, Any] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    queued: float = field(compare=False)
+    retries: int = field(default=0, compare=False)
+
+
+@dataclass(frozen=True)
+class MessageSenderStats:
+    workers: int
+    transactional_queued: int
+    promotional_queued: int
+    in_flight: int
+    sent: int
+    failed: int
+    flood_waits: int
+    average_latency: float
+    max_latency: float
+
+
+class MessageSender:
+    '''
+    Outbound Telegram calls go through one priority queue drained by a
+    bounded number of workers. Every call takes a token from the global
+    bucket and from the bucket of its chat, so the bot stays under the
+    Telegram limits (30 messages per second, 1 per second in a private
+    chat after a short burst, 20 per minute in a group). Transactional
+    messages are sent
+    before promotional ones, and on RetryAfter all workers wait the given
+    time before the call is repeated.
+    '''
+
+    def __init__(
+        self,
+        workers: int = 8,
+        messages_per_second: float = 30,
+        chat_messages_per_second: float = 1,
+        chat_burst: int = 5,
+        group_messages_per_minute: float = 20,
+        max_retries: int = 3,
+    ) -> None:
+        self._workers_count = workers
+        self._chat_messages_per_second = chat_messages_per_second
+        self._chat_burst = chat_burst
+        self._group_messages_per_minute = group_messages_per_minute
+        self._max_retries = max_retries
+        self._queue: asyncio.PriorityQueue[_Job] | None = None
+        self._workers: list[asyncio.Task] = []
+        # job number: handle which puts the job back to the queue, and job
+        self._delayed: dict[int, tuple[asyncio.TimerHandle, _Job]] = {}
+        self._bucket = TokenBucket(messages_per_second, messages_per_second)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._numbers = itertools.count()
+        self._paused_until = 0.0
+        self._queued = {TRANSACTIONAL: 0, PROMOTIONAL: 0}
+        self._in_flight = 0
+        self._sent = 0
+        self._failed = 0
+        self._flood_waits = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    async def send(
+        self,
+        chat_id: int,
+        method: Callable[..., Awaitable[T]],
+        *args,
+        priority: int = TRANSACTIONAL,
+        **kwargs,
+    ) -> T:
+        '''
+        Calls `method(*args, **kwargs)` within the limits of `chat_id` and
+        returns its result. Await calls to one chat one by one to keep
+        their order.
+        '''
+        self._start()
+        job = _Job(
+            priority=priority,
+            number=next(self._numbers),
+            chat_id=chat_id,
+            method=method,
+            args=args,
+            kwargs=kwargs,
+            future=asyncio.get_running_loop().create_future(),
+            queued=time.monotonic(),
+        )
+        self._put(job)
+        return await job.future
+
+    async def send_message(
+        self,
+        bot: Bot,
+        chat_id: int,
+        text: str,
+        priority: int = TRANSACTIONAL,
+        **kwargs,
+    ) -> Message:
+        return await self.send(
+            chat_id,
+            bot.send_message,
+            chat_id=chat_id,
+            text=text,
+            priority=priority,
+            **kwargs,
+        )
+
+    def stats(self) -> MessageSenderStats:
+        return MessageSenderStats(
+            workers=self._workers_count,
+            transactional_queued=self._queued[TRANSACTIONAL],
+            promotional_queued=self._queued[PROMOTIONAL],
+            in_flight=self._in_flight,
+            sent=self._sent,
+            failed=self._failed,
+            flood_waits=self._flood_waits,
+            average_latency=(
+                self._total_latency / self._sent if self._sent else 0
+            ),
+            max_latency=self._max_latency,
+        )
+
+    async def close(self) -> None:
+        '''Stops the workers, calls not sent yet raise MessageSenderClosed'''
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        delayed, self._delayed = self._delayed, {}
+        for handle, job in delayed.values():
+            handle.cancel()
+            self._close_job(job)
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._queued[job.priority] -= 1
+            self._close_job(job)
+        self._queue = None
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._work())
+            for _ in range(self._workers_count)
+        ]
+
+    def _put(self, job: _Job) -> None:
+        self._queued[job.priority] += 1
+        self._queue.put_nowait(job)
+
+    def _put_later(self, job: _Job, delay: float) -> None:
+        handle = asyncio.get_running_loop().call_later(
+            delay, self._put_delayed, job,
+        )
+        self._delayed[job.number] = (handle, job)
+
+    def _put_delayed(self, job: _Job) -> None:
+        del self._delayed[job.number]
+        self._put(job)
+
+    @staticmethod
+    def _close_job(job: _Job) -> None:
+        if not job.future.done():
+            job.future.set_exception(MessageSenderClosed())
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._queued[job.priority] -= 1
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                self._close_job(job)
+                raise
+
+    async def _run(self, job: _Job) -> None:
+        if job.future.done():
+            return
+        delay = self._get_chat_bucket(job.chat_id).take()
+        if delay:
+            # the worker takes the next job while this chat waits
+            self._put_later(job, delay)
+            return
+        await self._wait_for_token()
+        self._in_flight += 1
+        try:
+            result = await job.method(*job.args, **job.kwargs)
+        except RetryAfter as error:
+            self._on_retry_after(job, error)
+        except Exception as error:
+            self._failed += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+        else:
+            latency = time.monotonic() - job.queued
+            self._sent += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight -= 1
+
+    async def _wait_for_token(self) -> None:
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            delay = self._bucket.take()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def _on_retry_after(self, job: _Job, error: RetryAfter) -> None:
+        self._flood_waits += 1
+        logger.warning(
+            'Flood control on chat %s, waiting %ss', job.chat_id, error.timeout,
+        )
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + error.timeout,
+        )
+        if job.retries >= self._max_retries:
+            self._failed += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+            return
+        job.retries += 1
+        self._put_later(job, error.timeout)
+
+    def _get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                self._chat_buckets = {
+                    chat_id: bucket
+                    for chat_id, bucket in self._chat_buckets.items()
+                    if not bucket.is_full()
+                }
+            # group chats have negative ids, a reply to a private chat of a
+            # few messages is sent at once
+            if chat_id < 0:
+                bucket = TokenBucket(self._group_messages_per_minute / 60, 1)
+            else:
+                bucket = TokenBucket(
+                    self._chat_messages_per_second, self._chat_burst,
+                )
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+
+message_sender = MessageSender()
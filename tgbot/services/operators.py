@@ -0,0 +1,45 @@
+import asyncio
+
+from tgbot.misc import schemas
+from tgbot.services import db, invalidation
+
+
+class OperatorRegistry:
+    '''
+    Operators loaded once and kept by telegram id. Reloaded after
+    add_operator/delete_operator through the invalidation channel.
+    '''
+
+    def __init__(self) -> None:
+        self._operators: dict[int, schemas.Operator] = {}
+        self._is_loaded = False
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, telegram_id: int | str | None = None) -> None:
+        self._is_loaded = False
+
+    async def get_operators(self) -> list[schemas.Operator]:
+        return list((await self._get()).values())
+
+    async def get_operators_ids(self) -> set[int]:
+        return set(await self._get())
+
+    async def is_operator(self, telegram_id: int) -> bool:
+        return telegram_id in await self._get()
+
+    async def _get(self) -> dict[int, schemas.Operator]:
+        if self._is_loaded:
+            return self._operators
+        async with self._lock:
+            if not self._is_loaded:
+                # set before loading, so invalidation during load is kept
+                self._is_loaded = True
+                self._operators = {
+                    operator.telegram_id: operator
+                    for operator in await db.get_operators()
+                }
+        return self._operators
+
+
+operators = OperatorRegistry()
+invalidation.subscribe('operators', operators.invalidate)
@@ -1,6 +1,17 @@
+import threading
+
+import qrcode
+from cachetools import LRUCache
+from PIL import Image # type: ignore
+
 from tgbot.misc.request import request
 
 QR_CODE_API_URL = 'https://api.qrserver.com/v1/create-qr-code/?size={size}&data={data}'
+QR_CODE_BORDER = 2
+
+_qr_codes: LRUCache = LRUCache(maxsize=1024)
+_qr_codes_lock = threading.Lock()
+
 
 async def generate_qr_code(info: str, size: tuple = (900, 900)) -> bytes:
     response = await request(
@@ -8,3 +19,27 @@ async def generate_qr_code(info: str, size: tuple = (900, 900)) -> bytes:
         url=QR_CODE_API_URL.format(size='x'.join(map(str, size)), data=info),
     )
     return response
+
+
+def render_qr_code(info: str, size: tuple = (400, 400)) -> Image.Image:
+    '''Render QR code in process, cached by info (ticket or package code)'''
+    key = (str(info), tuple(size))
+    with _qr_codes_lock:
+        image = _qr_codes.get(key)
+    if image is not None:
+        return image
+    qr = qrcode.QRCode(border=QR_CODE_BORDER)
+    qr.add_data(str(info))
+    qr.make(fit=True)
+    qr.box_size = max(
+        1, min(size) // (qr.modules_count + 2 * QR_CODE_BORDER)
+    )
+    image = (
+        qr.make_image(fill_color='black', back_color='white')
+        .get_image()
+        .convert('RGB')
+        .resize(size, Image.NEAREST)
+    )
+    with _qr_codes_lock:
+        _qr_codes[key] = image
+    return image
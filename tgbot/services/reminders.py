@@ -0,0 +1,186 @@
+import time
+import asyncio
+import logging
+import datetime
+
+from aiogram import Bot
+from aioredis import Redis, ConnectionPool
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.contrib.middlewares.i18n import I18nMiddleware
+from aiogram.utils.exceptions import TelegramAPIError
+
+from tgbot.misc import schemas
+from tgbot.keyboards import inline
+from tgbot.services import db
+from tgbot.services.message_sender import (
+    message_sender, PROMOTIONAL, TRANSACTIONAL,
+)
+
+
+GAME_LINK = 'https://poki.com/en/g/four-in-a-row'
+MAPS_URL = 'https://maps.google.com/?q={latitude},{longitude}'
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderDispatcher:
+    '''
+    Reminders about a departure are kept per slot, not per ticket: one
+    member `{kind}:{route_id}:{start_station_id}` of a Redis sorted set,
+    scored by the time it is due. When a slot is due, all its recipients
+    are loaded with one query and the message is rendered once per locale.
+    '''
+
+    SLOTS_KEY = 'reminder_slots'
+    # kind: time from departure
+    REMINDERS = {
+        'route_3h': -datetime.timedelta(hours=3),
+        'route_1h': -datetime.timedelta(hours=1),
+        'play_game': datetime.timedelta(minutes=5),
+    }
+    TICKET_REMINDERS = ('route_3h', 'route_1h', 'play_game')
+    PACKAGE_REMINDERS = ('route_3h', 'route_1h')
+    # a slot which failed is tried again until it is this late
+    MAX_DELAY = datetime.timedelta(hours=1)
+
+    def __init__(
+        self,
+        connection_pool: ConnectionPool,
+        interval: int = 30,
+    ) -> None:
+        self._connection_pool = connection_pool
+        self._interval = interval
+
+    async def schedule(
+        self,
+        route_id: int,
+        start_station_id: int,
+        departure_time: datetime.datetime,
+        kinds: tuple[str, ...],
+    ) -> None:
+        slots = {}
+        for kind in kinds:
+            due_time = (departure_time + self.REMINDERS[kind]).timestamp()
+            if due_time > time.time():
+                slots[f'{kind}:{route_id}:{start_station_id}'] = due_time
+        if slots:
+            await Redis(connection_pool=self._connection_pool).zadd(
+                self.SLOTS_KEY, slots,
+            )
+
+    async def run(self, bot: Bot) -> None:
+        while True:
+            try:
+                await self.dispatch_due(bot)
+            except Exception:
+                logger.exception('Could not dispatch reminders')
+            await asyncio.sleep(self._interval)
+
+    async def dispatch_due(self, bot: Bot) -> int:
+        redis = Redis(connection_pool=self._connection_pool)
+        slots = await redis.zrangebyscore(
+            self.SLOTS_KEY, 0, time.time(), withscores=True,
+        )
+        sent = 0
+        for slot, due_time in slots:
+            # zrem succeeds in one process only, so every slot is sent once
+            if not await redis.zrem(self.SLOTS_KEY, slot):
+                continue
+            kind, route_id, start_station_id = slot.decode().split(':')
+            try:
+                sent += await self._dispatch_slot(
+                    bot, kind, int(route_id), int(start_station_id),
+                )
+            except Exception:
+                await self._retry_slot(redis, slot, due_time)
+                raise
+        return sent
+
+    async def _retry_slot(
+        self,
+        redis: Redis,
+        slot: bytes,
+        due_time: float,
+    ) -> None:
+        delay = time.time() - due_time
+        if delay > self.MAX_DELAY.total_seconds():
+            logger.error('Reminder %s is dropped after retries', slot.decode())
+            return
+        # the wait doubles with every try
+        await redis.zadd(
+            self.SLOTS_KEY,
+            {slot: time.time() + max(delay, self._interval)},
+        )
+
+    async def _dispatch_slot(
+        self,
+        bot: Bot,
+        kind: str,
+        route_id: int,
+        start_station_id: int,
+    ) -> int:
+        is_game = kind == 'play_game'
+        station, recipients = await db.get_departure_recipients(
+            route_id,
+            start_station_id,
+            with_packages=not is_game,
+            only_notified=not is_game,
+        )
+        i18n: I18nMiddleware = bot.get('i18n')
+        messages: dict[str, tuple[str, InlineKeyboardMarkup]] = {}
+        for _, language_code in recipients:
+            if language_code not in messages:
+                messages[language_code] = (
+                    self._render_game(i18n, language_code) if is_game
+                    else self._render_route(i18n, language_code, station)
+                )
+        results = await asyncio.gather(
+            *(
+                message_sender.send_message(
+                    bot,
+                    chat_id=telegram_id,
+                    text=messages[language_code][0],
+                    reply_markup=messages[language_code][1],
+                    priority=PROMOTIONAL if is_game else TRANSACTIONAL,
+                )
+                for telegram_id, language_code in recipients
+            ),
+            return_exceptions=True,
+        )
+        for (telegram_id, _), result in zip(recipients, results):
+            if isinstance(result, TelegramAPIError):
+                logger.warning('Could not send reminder to %s', telegram_id)
+            elif isinstance(result, Exception):
+                raise result
+        return len(recipients)
+
+    @staticmethod
+    def _render_route(
+        i18n: I18nMiddleware,
+        language_code: str,
+        station: schemas.Station,
+    ) -> tuple[str, InlineKeyboardMarkup]:
+        text = i18n.gettext(
+            '<i><b>Нагадуємо про вашу поїздку о {departure_time}</b></i>\n',
+            locale=language_code,
+        ).format(departure_time=station.departure_time.strftime('%H:%M'))
+        return text, inline.link_to_start_station(
+            i18n=i18n,
+            url=MAPS_URL.format(
+                latitude=station.latitude,
+                longitude=station.longitude,
+            ),
+        )
+
+    @staticmethod
+    def _render_game(
+        i18n: I18nMiddleware,
+        language_code: str,
+    ) -> tuple[str, InlineKeyboardMarkup]:
+        text = i18n.gettext(
+            '<i>Хочеш зіграти в гру?</i>\n',
+            locale=language_code,
+        )
+        return text, inline.play_game(
+            i18n=i18n, game_link=GAME_LINK, lk=language_code,
+        )
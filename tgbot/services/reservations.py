@@ -0,0 +1,148 @@
+import time
+import asyncio
+import logging
+
+from aiogram import Bot
+from aioredis import Redis, ConnectionPool
+from aiogram.contrib.middlewares.i18n import I18nMiddleware
+from aiogram.utils.exceptions import MessageToDeleteNotFound, TelegramAPIError
+
+from web.app import models
+from tgbot.services import db
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationSweeper:
+    '''
+    Deadlines of unpaid ticket orders in one Redis sorted set, scored by
+    the time the order expires. Members are `{user_id}:{payment_message_id}`
+    and the ids of the order tickets are kept in a hash. A single
+    coroutine per bot process takes expired orders from the set, deletes
+    their tickets with one query per tick and cancels the payment messages.
+    '''
+
+    DEADLINES_KEY = 'reservation_deadlines'
+    TICKETS_KEY = 'reservation_tickets'
+
+    def __init__(
+        self,
+        connection_pool: ConnectionPool,
+        interval: int = 5,
+        batch_size: int = 500,
+    ) -> None:
+        self._connection_pool = connection_pool
+        self._interval = interval
+        self._batch_size = batch_size
+
+    async def hold(
+        self,
+        user_id: int,
+        payment_message_id: int,
+        tickets_ids: list[int],
+    ) -> None:
+        member = self._member(user_id, payment_message_id)
+        redis = Redis(connection_pool=self._connection_pool)
+        async with redis.pipeline(transaction=True) as pipeline:
+            pipeline.hset(
+                self.TICKETS_KEY, member, '|'.join(map(str, tickets_ids)),
+            )
+            pipeline.zadd(
+                self.DEADLINES_KEY,
+                {
+                    member:
+                    time.time() + models.Ticket.booking_time.total_seconds(),
+                },
+            )
+            await pipeline.execute()
+
+    async def release(self, user_id: int, payment_message_id: int) -> None:
+        '''Order is paid, so it is not swept'''
+        member = self._member(user_id, payment_message_id)
+        redis = Redis(connection_pool=self._connection_pool)
+        async with redis.pipeline(transaction=True) as pipeline:
+            pipeline.zrem(self.DEADLINES_KEY, member)
+            pipeline.hdel(self.TICKETS_KEY, member)
+            await pipeline.execute()
+
+    async def expire(self, user_id: int) -> None:
+        '''User left the order, so it is swept on the next tick'''
+        redis = Redis(connection_pool=self._connection_pool)
+        async for member, _ in redis.zscan_iter(
+            self.DEADLINES_KEY, match=f'{user_id}:*',
+        ):
+            await redis.zadd(self.DEADLINES_KEY, {member: 0}, xx=True)
+
+    async def run(self, bot: Bot) -> None:
+        while True:
+            try:
+                swept = await self.sweep(bot)
+            except Exception:
+                logger.exception('Could not sweep reservations')
+                swept = 0
+            if swept < self._batch_size:
+                await asyncio.sleep(self._interval)
+
+    async def sweep(self, bot: Bot) -> int:
+        redis = Redis(connection_pool=self._connection_pool)
+        members = await redis.zrangebyscore(
+            self.DEADLINES_KEY, 0, time.time(),
+            start=0, num=self._batch_size,
+        )
+        if not members:
+            return 0
+        # zrem succeeds in one process only, so every order is swept once
+        async with redis.pipeline(transaction=False) as pipeline:
+            for member in members:
+                pipeline.zrem(self.DEADLINES_KEY, member)
+            removed = await pipeline.execute()
+        members = [
+            member for member, is_removed in zip(members, removed)
+            if is_removed
+        ]
+        if not members:
+            return 0
+        tickets = await redis.hmget(self.TICKETS_KEY, members)
+        await redis.hdel(self.TICKETS_KEY, *members)
+        await db.delete_expired_bookings([
+            int(ticket_id)
+            for order_tickets in tickets if order_tickets
+            for ticket_id in order_tickets.decode().split('|')
+        ])
+        await asyncio.gather(
+            *(
+                self._cancel_payment(bot, *map(int, member.split(b':')))
+                for member in members
+            )
+        )
+        return len(members)
+
+    @staticmethod
+    async def _cancel_payment(
+        bot: Bot,
+        user_id: int,
+        payment_message_id: int,
+    ) -> None:
+        i18n: I18nMiddleware = bot.get('i18n')
+        try:
+            user = await db.get_telegram_user(user_id)
+            await bot.delete_message(
+                chat_id=user_id,
+                message_id=payment_message_id,
+            )
+            await bot.send_message(
+                chat_id=user_id,
+                text=i18n.gettext(
+                    '🚫 Платіж був скасований.',
+                    locale=user.language.code,
+                ),
+            )
+        except MessageToDeleteNotFound:
+            pass
+        except TelegramAPIError:
+            logger.exception('Could not cancel payment of %s', user_id)
+
+    @staticmethod
+    def _member(user_id: int, payment_message_id: int) -> str:
+        return f'{user_id}:{payment_message_id}'
@@ -0,0 +1,220 @@
+import time
+import datetime
+import logging
+from dataclasses import dataclass
+
+import redis
+from pydantic import BaseModel
+from aioredis import Redis, ConnectionPool
+
+from tgbot.misc import schemas
+from tgbot.services import db, invalidation
+from tgbot.services.async_db import async_db
+from tgbot.services.single_flight import single_flight
+from tgbot.services.timetable import Timetable
+
+
+VERSIONS_KEY = 'route_search_versions'
+# version of every search, changed when stations or buses are changed
+ALL_ROUTES = 'all'
+
+logger = logging.getLogger(__name__)
+
+
+def drop_route_searches(route_id: int | None = None) -> None:
+    '''Sync, called from Django signals after a route is changed'''
+    _drop_searches(ALL_ROUTES if route_id is None else route_id)
+
+
+def drop_schedule_searches(schedule_id: int) -> None:
+    '''Sync, called after a departure of the schedule is booked first'''
+    _drop_searches(f'schedule:{schedule_id}')
+
+
+def _drop_searches(version: int | str) -> None:
+    try:
+        invalidation.get_connection().hincrby(VERSIONS_KEY, version)
+    except redis.RedisError:
+        logger.exception('Could not drop searches of %s', version)
+
+
+def get_version(route: schemas.Route) -> int | str:
+    # a departure of a schedule has no route until it is booked
+    return route.id if route.id is not None else f'schedule:{route.schedule_id}'
+
+
+class RouteSearch(BaseModel):
+    routes: list[schemas.Route]
+    ticket_types: list[schemas.TicketType]
+    versions: list[int]
+
+
+@dataclass(frozen=True)
+class RouteSearchCacheStats:
+    hits: int
+    misses: int
+    average_hit_time: float
+    average_miss_time: float
+
+    @property
+    def hit_rate(self) -> float:
+        searches = self.hits + self.misses
+        return self.hits / searches if searches else 0
+
+
+class RouteSearchCache:
+    '''
+    Routes found for (start, end, date, language) and the ticket types of
+    the language, kept in Redis for a short time. Seats change with every
+    booking, so they are not cached: full routes are kept in the search,
+    and seats are read for every caller from the route segment occupancy
+    with one query. A search is stale when the
+    version of one of its routes, or of all routes, has changed since it
+    was cached (see drop_route_searches).
+    '''
+
+    KEY = 'route_search:{start}:{end}:{date}:{language_id}'
+
+    def __init__(
+        self,
+        connection_pool: ConnectionPool,
+        timetable: Timetable,
+        ttl: int = 120,
+    ) -> None:
+        self._connection_pool = connection_pool
+        self._timetable = timetable
+        self._ttl = ttl
+        self._hits = 0
+        self._misses = 0
+        self._hits_time = 0.0
+        self._misses_time = 0.0
+
+    async def get_routes(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        date: datetime.date,
+        telegram_id: int,
+    ) -> tuple[list[schemas.Route], list[schemas.TicketType]]:
+        started = time.monotonic()
+        user: schemas.TelegramUser = await db.get_telegram_user(telegram_id)
+        key = self.KEY.format(
+            start=start_station_id,
+            end=end_station_id,
+            date=date.strftime('%Y-%m-%d'),
+            language_id=user.language.id,
+        )
+        redis = Redis(connection_pool=self._connection_pool)
+        search = await redis.get(key)
+        if search is not None:
+            search = RouteSearch.parse_raw(search)
+            if await self._get_versions(redis, search.routes) == search.versions:
+                routes = await self._with_available_seats(
+                    search.routes, start_station_id, end_station_id,
+                )
+                self._hits += 1
+                self._hits_time += time.monotonic() - started
+                return routes, search.ticket_types
+        # users of one language searching the same at once share the query
+        search = await single_flight.run(
+            key, RouteSearch, self._search,
+            key, start_station_id, end_station_id, date, telegram_id,
+        )
+        # callers which joined one search share it, so each gets its copies
+        routes = await self._with_available_seats(
+            [route.copy() for route in search.routes],
+            start_station_id,
+            end_station_id,
+        )
+        self._misses += 1
+        self._misses_time += time.monotonic() - started
+        return routes, list(search.ticket_types)
+
+    def stats(self) -> RouteSearchCacheStats:
+        return RouteSearchCacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            average_hit_time=self._hits_time / self._hits if self._hits else 0,
+            average_miss_time=(
+                self._misses_time / self._misses if self._misses else 0
+            ),
+        )
+
+    async def _search(
+        self,
+        key: str,
+        start_station_id: int,
+        end_station_id: int,
+        date: datetime.date,
+        telegram_id: int,
+    ) -> RouteSearch:
+        # full routes are kept too, seats are read for every caller
+        routes = await async_db.get_routes_from_to_in_date(
+            start_station_id=start_station_id,
+            end_station_id=end_station_id,
+            date=date,
+            telegram_id=telegram_id,
+            with_full_routes=True,
+        )
+        ticket_types = await db.get_ticket_types(telegram_id)
+        redis = Redis(connection_pool=self._connection_pool)
+        versions = await self._get_versions(redis, routes)
+        await redis.set(
+            key,
+            RouteSearch(
+                routes=[
+                    route.copy(update={'available_seats': None})
+                    for route in routes
+                ],
+                ticket_types=ticket_types,
+                versions=versions,
+            ).json(),
+            ex=self._ttl,
+        )
+        return RouteSearch(
+            routes=routes, ticket_types=ticket_types, versions=versions,
+        )
+
+    async def _with_available_seats(
+        self,
+        routes: list[schemas.Route],
+        start_station_id: int,
+        end_station_id: int,
+    ) -> list[schemas.Route]:
+        timetable_routes = await self._timetable.get_routes()
+        segments = {}
+        for route in routes:
+            timetable_route = timetable_routes.get(route.id)
+            segment = timetable_route and timetable_route.segment(
+                start_station_id, end_station_id,
+            )
+            if segment:
+                start_stop, end_stop = segment
+                segments[route.id] = (
+                    start_stop.station_index, end_stop.station_index,
+                )
+        seats_taken = await db.get_routes_seats_taken(segments)
+        for route in routes:
+            if route.id is None:
+                # nothing is booked on a departure without a route
+                route.available_seats = route.bus.seats
+            elif route.id in segments:
+                route.available_seats = (
+                    timetable_routes[route.id].seats
+                    - seats_taken.get(route.id, 0)
+                )
+        return [
+            route for route in routes
+            if (route.id is None or route.id in segments)
+            and route.available_seats > 0
+        ]
+
+    @staticmethod
+    async def _get_versions(
+        redis: Redis,
+        routes: list[schemas.Route],
+    ) -> list[int]:
+        versions = await redis.hmget(
+            VERSIONS_KEY, [ALL_ROUTES, *map(get_version, routes)],
+        )
+        return [int(version or 0) for version in versions]
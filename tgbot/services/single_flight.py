@@ -0,0 +1,148 @@
+import json
+import asyncio
+import inspect
+import logging
+import functools
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aioredis import Redis, ConnectionPool
+from aioredis.exceptions import LockError
+from pydantic import parse_raw_as
+from pydantic.json import pydantic_encoder
+
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SingleFlightStats:
+    calls: int
+    shared: int
+    from_other_process: int
+
+
+class SingleFlight:
+    '''
+    Identical concurrent calls share one call. In a process they await the
+    same future. Across processes the first call takes a Redis lock and
+    leaves its result in Redis for a few seconds, so the calls which waited
+    for the lock read the result instead of running the query again.
+    '''
+
+    def __init__(
+        self,
+        lock_timeout: float = 30,
+        wait_timeout: float = 10,
+        result_ttl: int = 2,
+    ) -> None:
+        self._lock_timeout = lock_timeout
+        self._wait_timeout = wait_timeout
+        self._result_ttl = result_ttl
+        self._connection_pool: ConnectionPool | None = None
+        self._calls: dict[str, asyncio.Future] = {}
+        self._calls_count = 0
+        self._shared = 0
+        self._from_other_process = 0
+
+    def setup(self, connection_pool: ConnectionPool) -> None:
+        self._connection_pool = connection_pool
+
+    def __call__(
+        self,
+        result_type: Any,
+    ) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+        def decorator(
+            func: Callable[..., Awaitable[T]],
+        ) -> Callable[..., Awaitable[T]]:
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs) -> T:
+                arguments = signature.bind(*args, **kwargs)
+                arguments.apply_defaults()
+                arguments.arguments.pop('self', None)
+                key = '{}:{}'.format(
+                    func.__qualname__,
+                    json.dumps(arguments.arguments, default=str),
+                )
+                return await self.run(key, result_type, func, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    async def run(
+        self,
+        key: str,
+        result_type: Any,
+        func: Callable[..., Awaitable[T]],
+        *args,
+        **kwargs,
+    ) -> T:
+        self._calls_count += 1
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._run(key, result_type, func, args, kwargs)
+            )
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self._shared += 1
+        # a cancelled caller does not cancel the call of the others
+        return await asyncio.shield(future)
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(
+            calls=self._calls_count,
+            shared=self._shared,
+            from_other_process=self._from_other_process,
+        )
+
+    async def _run(
+        self,
+        key: str,
+        result_type: Any,
+        func: Callable[..., Awaitable[T]],
+        args: tuple,
+        kwargs: dict[str, Any],
+    ) -> T:
+        if self._connection_pool is None:
+            return await func(*args, **kwargs)
+        redis = Redis(connection_pool=self._connection_pool)
+        result_key = f'single_flight:{key}'
+        result = await redis.get(result_key)
+        if result is not None:
+            self._from_other_process += 1
+            return parse_raw_as(result_type, result)
+        lock = redis.lock(
+            f'single_flight_lock:{key}',
+            timeout=self._lock_timeout,
+            sleep=0.05,
+            blocking_timeout=self._wait_timeout,
+            thread_local=False,
+        )
+        # the call runs without the lock if waiting for it took too long
+        is_locked = await lock.acquire()
+        try:
+            result = await redis.get(result_key)
+            if result is not None:
+                self._from_other_process += 1
+                return parse_raw_as(result_type, result)
+            result = await func(*args, **kwargs)
+            await redis.set(
+                result_key,
+                json.dumps(result, default=pydantic_encoder),
+                ex=self._result_ttl,
+            )
+            return result
+        finally:
+            if is_locked:
+                try:
+                    await lock.release()
+                except LockError:
+                    logger.warning('Single flight lock of %s expired', key)
+
+
+single_flight = SingleFlight()
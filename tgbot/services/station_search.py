@@ -0,0 +1,194 @@
+import re
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+
+from tgbot.misc import schemas
+from tgbot.services import db, invalidation
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r'[ʼ’\'`"]', '', text.lower().replace('ё', 'е'))
+    return ' '.join(re.split(r'[\W_]+', text)).strip()
+
+
+def get_trigrams(text: str, is_query: bool = False) -> set[str]:
+    '''
+    Trigrams of every word padded with spaces. A query word is not padded
+    at the end, so a started word matches the whole one.
+    '''
+    trigrams = set()
+    for word in text.split():
+        word = f'  {word}' if is_query else f'  {word} '
+        trigrams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return trigrams
+
+
+class StationNameIndex:
+    '''
+    Trigram postings of station full names of one language. Stations are
+    ranked by the part of the query trigrams they have, names that
+    contain the whole query go first. Names with a few typos still have
+    most of the trigrams, so they are found too.
+    '''
+
+    def __init__(
+        self,
+        stations: list[schemas.Station],
+        min_similarity: float = 0.5,
+    ) -> None:
+        self._min_similarity = min_similarity
+        self._stations = sorted(stations, key=lambda station: station.full_name)
+        self._names = [
+            normalize(f'{station.town.name} {station.name}')
+            for station in self._stations
+        ]
+        self._postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self._names):
+            for trigram in get_trigrams(name):
+                self._postings.setdefault(trigram, []).append(i)
+
+    def search(self, query: str, limit: int = 20) -> list[schemas.Station]:
+        query = normalize(query)
+        trigrams = get_trigrams(query, is_query=True)
+        if not trigrams:
+            return []
+        counts = Counter()
+        for trigram in trigrams:
+            counts.update(self._postings.get(trigram, ()))
+        min_count = len(trigrams) * self._min_similarity
+        found = sorted(
+            (
+                (query not in self._names[i], -count, i)
+                for i, count in counts.items() if count >= min_count
+            ),
+        )
+        return [self._stations[i] for *_, i in found[:limit]]
+
+
+class StationPrefixTrie:
+    '''
+    Words of station and town names in a trie. Every node keeps the
+    stations with a word starting with its prefix, sorted by full name,
+    so completing a word is a walk of its letters.
+    '''
+
+    def __init__(self, stations: list[schemas.Station]) -> None:
+        self._stations = sorted(stations, key=lambda station: station.full_name)
+        self._by_code = {station.code: station for station in self._stations}
+        self._by_id = {station.id: station for station in self._stations}
+        self._root: dict = {}
+        for i, station in enumerate(self._stations):
+            words = normalize(f'{station.town.name} {station.name}').split()
+            for word in words:
+                node = self._root
+                for letter in word:
+                    node = node.setdefault(letter, {})
+                    node_stations = node.setdefault(None, [])
+                    # two words of a name can share the prefix
+                    if not node_stations or node_stations[-1] != i:
+                        node_stations.append(i)
+
+    def get_by_code(self, code: str) -> schemas.Station | None:
+        return self._by_code.get(code)
+
+    def get_by_id(self, station_id: int) -> schemas.Station | None:
+        return self._by_id.get(station_id)
+
+    def complete(self, query: str, limit: int = 50) -> list[schemas.Station]:
+        words = normalize(query).split()
+        if not words:
+            return self._stations[:limit]
+        found = None
+        # every word of the query starts some word of the name
+        for word in words:
+            node = self._root
+            for letter in word:
+                node = node.get(letter)
+                if node is None:
+                    return []
+            if found is None:
+                found = node[None]
+            else:
+                matches = set(node[None])
+                found = [i for i in found if i in matches]
+        return [self._stations[i] for i in found[:limit]]
+
+
+@dataclass
+class LanguageStations:
+    names: StationNameIndex
+    prefixes: StationPrefixTrie
+
+
+class StationSearchIndex:
+    '''
+    Station name indexes per language, built from the translation cache
+    on first use or at startup. Rebuilt after changes of stations, towns or
+    their translations through the invalidation channel.
+    '''
+
+    def __init__(self) -> None:
+        self._indexes: dict[int, LanguageStations] = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, language_id: int | str | None = None) -> None:
+        self._indexes = {
+            key: index for key, index in self._indexes.items()
+            if language_id is not None and key != int(language_id)
+        }
+
+    async def warm_up(self) -> None:
+        for language in await db.get_languages():
+            await self._get(language.id)
+
+    async def search(
+        self,
+        query: str,
+        language_id: int,
+        limit: int = 20,
+    ) -> list[schemas.Station]:
+        return (await self._get(language_id)).names.search(query, limit)
+
+    async def complete(
+        self,
+        query: str,
+        language_id: int,
+        limit: int = 50,
+    ) -> list[schemas.Station]:
+        return (await self._get(language_id)).prefixes.complete(query, limit)
+
+    async def get_by_code(
+        self,
+        code: str,
+        language_id: int,
+    ) -> schemas.Station | None:
+        return (await self._get(language_id)).prefixes.get_by_code(code)
+
+    async def get_by_id(
+        self,
+        station_id: int,
+        language_id: int,
+    ) -> schemas.Station | None:
+        return (await self._get(language_id)).prefixes.get_by_id(station_id)
+
+    async def _get(self, language_id: int) -> LanguageStations:
+        index = self._indexes.get(language_id)
+        if index is not None:
+            return index
+        async with self._lock:
+            indexes = self._indexes
+            if language_id not in indexes:
+                # an invalidation during loading replaces the dict, so the
+                # stale index is not kept
+                stations = await db.get_translated_stations(language_id)
+                indexes[language_id] = LanguageStations(
+                    names=StationNameIndex(stations),
+                    prefixes=StationPrefixTrie(stations),
+                )
+            return indexes[language_id]
+
+
+station_search = StationSearchIndex()
+invalidation.subscribe('translations', station_search.invalidate)
+invalidation.subscribe('stations', station_search.invalidate)
@@ -1 +1,2 @@
-from .main import TicketGenerator
\ No newline at end of file
+from .main import TicketGenerator
+from .artifacts import TicketArtifacts
@@ -0,0 +1,169 @@
+import io
+import hashlib
+import logging
+
+import aioredis
+from aioredis import Redis, ConnectionPool
+from aiogram import types
+
+from tgbot.misc import schemas
+from tgbot.services.ticket_generator.main import TicketGenerator
+
+
+# bump when layout or templates change, so old images are not reused
+ARTIFACTS_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class TicketArtifacts:
+    '''
+    Rendered tickets and packages keyed by id and a hash of the rendered
+    fields. The JPEG is kept in Redis until Telegram returns a file_id for
+    it, then only the file_id is sent.
+    '''
+
+    def __init__(
+        self,
+        ticket_generator: TicketGenerator,
+        connection_pool: ConnectionPool,
+        file_id_ttl: int = 60 * 60 * 24 * 60,
+        image_ttl: int = 60 * 60 * 24,
+    ) -> None:
+        self._ticket_generator = ticket_generator
+        self._connection_pool = connection_pool
+        self._file_id_ttl = file_id_ttl
+        self._image_ttl = image_ttl
+
+    async def get_ticket_photo(
+        self,
+        ticket: schemas.Ticket,
+    ) -> str | types.InputFile:
+        return (await self.get_tickets_photos([ticket]))[0]
+
+    async def get_tickets_photos(
+        self,
+        tickets: list[schemas.Ticket],
+    ) -> list[str | types.InputFile]:
+        keys = [self._ticket_key(ticket) for ticket in tickets]
+        photos = [await self._get(key) for key in keys]
+        missing = [i for i, photo in enumerate(photos) if photo is None]
+        images = await self._ticket_generator.generate_tickets(
+            [tickets[i] for i in missing]
+        )
+        for i, image in zip(missing, images):
+            await self._set_image(keys[i], image)
+            photos[i] = self._input_file(image)
+        return photos
+
+    async def get_package_photo(
+        self,
+        package: schemas.Package,
+    ) -> str | types.InputFile:
+        key = self._package_key(package)
+        photo = await self._get(key)
+        if photo is None:
+            image = await self._ticket_generator.generate_package(package)
+            await self._set_image(key, image)
+            photo = self._input_file(image)
+        return photo
+
+    async def remember_ticket_photo(
+        self,
+        ticket: schemas.Ticket,
+        message: types.Message,
+    ) -> None:
+        await self._set_file_id(self._ticket_key(ticket), message)
+
+    async def remember_package_photo(
+        self,
+        package: schemas.Package,
+        message: types.Message,
+    ) -> None:
+        await self._set_file_id(self._package_key(package), message)
+
+    async def _get(self, key: str) -> str | types.InputFile | None:
+        redis = Redis(connection_pool=self._connection_pool)
+        try:
+            file_id = await redis.get(f'{key}:file_id')
+            if file_id is not None:
+                return file_id.decode()
+            image = await redis.get(f'{key}:jpeg')
+        except aioredis.RedisError:
+            logger.exception('Could not get ticket artifact %s', key)
+            return None
+        if image is not None:
+            return self._input_file(image)
+        return None
+
+    async def _set_image(self, key: str, image: bytes) -> None:
+        redis = Redis(connection_pool=self._connection_pool)
+        try:
+            await redis.set(f'{key}:jpeg', image, ex=self._image_ttl)
+        except aioredis.RedisError:
+            logger.exception('Could not save ticket artifact %s', key)
+
+    async def _set_file_id(self, key: str, message: types.Message) -> None:
+        if not isinstance(message, types.Message) or not message.photo:
+            return
+        redis = Redis(connection_pool=self._connection_pool)
+        try:
+            await redis.set(
+                f'{key}:file_id', message.photo[-1].file_id,
+                ex=self._file_id_ttl,
+            )
+            await redis.delete(f'{key}:jpeg')
+        except aioredis.RedisError:
+            logger.exception('Could not save ticket artifact %s', key)
+
+    @staticmethod
+    def _input_file(image: bytes) -> types.InputFile:
+        return types.InputFile(io.BytesIO(image))
+
+    @staticmethod
+    def _ticket_key(ticket: schemas.Ticket) -> str:
+        fields = (
+            ticket.start_station.town.name,
+            ticket.end_station.town.name,
+            ticket.start_station.name,
+            ticket.end_station.name,
+            ticket.departure_time.isoformat(),
+            ticket.arrival_time.isoformat(),
+            ticket.passenger.name,
+            ticket.passenger.surname,
+            ticket.ticket_code,
+            ticket.is_paid,
+            ticket.paid_time.isoformat() if ticket.paid_time else None,
+            ticket.price,
+            ticket.type.name,
+            ticket.type.discount,
+        )
+        return f'ticket_artifact:ticket:{ticket.id}:{_hash(fields)}'
+
+    @staticmethod
+    def _package_key(package: schemas.Package) -> str:
+        fields = (
+            package.start_station.town.name,
+            package.end_station.town.name,
+            package.start_station.name,
+            package.end_station.name,
+            package.departure_time.isoformat(),
+            package.arrival_time.isoformat(),
+            package.sender.name,
+            package.sender.surname,
+            package.sender.phone,
+            package.receiver.name,
+            package.receiver.surname,
+            package.receiver.phone,
+            package.package_code,
+            package.is_paid,
+            package.paid_time.isoformat() if package.paid_time else None,
+            package.price,
+        )
+        return f'ticket_artifact:package:{package.id}:{_hash(fields)}'
+
+
+def _hash(fields: tuple) -> str:
+    return hashlib.sha1(
+        repr((ARTIFACTS_VERSION, *map(str, fields))).encode()
+    ).hexdigest()
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
+LIGHT_GREY = (130, 130, 130)
+GREEN = (31, 214, 85)
+RED = (255, 0, 0)
+
+
+@dataclass(frozen=True)
+class TextField:
+    position: tuple[int, int]
+    font: str
+    size: int
+    color: tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class StaticText(TextField):
+    text: str
+
+
+@dataclass(frozen=True)
+class QrCodeField:
+    position: tuple[int, int]
+    size: tuple[int, int]
+
+
+TICKET_FIELDS = {
+    'town_from': TextField((440, 670), 'bold', 51, BLACK),
+    'town_to': TextField((440, 970), 'bold', 52, BLACK),
+    'station_from': TextField((440, 727), 'italic', 30, LIGHT_GREY),
+    'station_to': TextField((440, 1027), 'italic', 30, GREY),
+    'date_from': TextField((440, 614), 'simple', 40, BLACK),
+    'date_to': TextField((440, 914), 'simple', 40, BLACK),
+    'time_from': TextField((130, 610), 'bold', 55, BLACK),
+    'time_to': TextField((130, 910), 'bold', 55, BLACK),
+    'passenger': TextField((70, 240), 'bold', 45, BLACK),
+    'ticket_code': TextField((70, 350), 'italic', 30, GREY),
+    'paid_time': TextField((530, 452), 'simple', 25, GREY),
+    'price': TextField((304, 417), 'italic', 30, GREY),
+    'ticket_type': TextField((304, 485), 'italic', 30, GREY),
+    'discount': TextField((650, 415), 'italic', 30, GREY),
+}
+TICKET_QR_CODE = QrCodeField((840, 120), (400, 400))
+TICKET_PAID = StaticText((304, 452), 'bold', 30, GREEN, 'ОПЛАЧЕНО')
+TICKET_NOT_PAID = StaticText((304, 452), 'bold', 30, RED, 'НЕ ОПЛАЧЕНО')
+TICKET_DISCOUNT = StaticText((530, 415), 'italic', 30, GREY, 'Знижка:')
+
+PACKAGE_FIELDS = {
+    'town_from': TextField((440, 670), 'bold', 51, BLACK),
+    'town_to': TextField((440, 970), 'bold', 52, BLACK),
+    'station_from': TextField((440, 727), 'italic', 30, LIGHT_GREY),
+    'station_to': TextField((440, 1027), 'italic', 30, GREY),
+    'date_from': TextField((440, 614), 'simple', 40, BLACK),
+    'date_to': TextField((440, 914), 'simple', 40, BLACK),
+    'time_from': TextField((130, 610), 'bold', 55, BLACK),
+    'time_to': TextField((130, 910), 'bold', 55, BLACK),
+    'sender': TextField((300, 140), 'bold', 45, BLACK),
+    'sender_phone': TextField((300, 198), 'simple', 40, BLACK),
+    'receiver': TextField((300, 250), 'bold', 45, BLACK),
+    'receiver_phone': TextField((300, 308), 'simple', 40, BLACK),
+    'package_code': TextField((400, 58), 'bold', 50, BLACK),
+    'paid_time': TextField((530, 492), 'simple', 25, GREY),
+    'price': TextField((304, 452), 'italic', 30, GREY),
+}
+PACKAGE_QR_CODE = QrCodeField((840, 120), (400, 400))
+PACKAGE_PAID = StaticText((304, 492), 'bold', 30, GREEN, 'ОПЛАЧЕНО')
+PACKAGE_NOT_PAID = StaticText((304, 492), 'bold', 30, RED, 'НЕ ОПЛАЧЕНО')
@@ -1,10 +1,16 @@
 import io
+import asyncio
+import datetime
+import threading
+import multiprocessing
 from pathlib import Path
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
-from PIL import Image, ImageFont, ImageDraw, ImageFile # type: ignore
+from PIL import Image, ImageFont, ImageDraw # type: ignore
 from PIL.ImageFont import FreeTypeFont # type: ignore
 from tgbot.misc import schemas
-from tgbot.services.qr_code import generate_qr_code
+from tgbot.services.qr_code import generate_qr_code, render_qr_code
+from tgbot.services.ticket_generator import layout
 
 CURRENT_DIR = Path(__file__)
 
@@ -34,6 +40,12 @@ WEEK_DAYS = {
 }
 
 class TicketGenerator:
+    '''
+    Renders tickets and packages outside of the event loop. Every worker
+    (process or thread) keeps its own TicketRenderer with loaded fonts
+    and templates.
+    '''
+
     def __init__(
         self,
         template_path: str='tgbot/services/ticket_generator/templates/ticket_template.jpg',
@@ -42,412 +54,284 @@ class TicketGenerator:
         italic_font_path: str='tgbot/services/ticket_generator/fonts/italic.ttf',
         simple_font_path: str='tgbot/services/ticket_generator/fonts/simple.ttf',
         italic_bold_font_path: str='tgbot/services/ticket_generator/fonts/italic-bold.ttf',
+        local_qr_codes: bool=True,
+        workers: int=2,
+        use_processes: bool=True,
     ) -> None:
-        self._template_path = template_path
-        self._bold_font = ImageFont.truetype(bold_font_path)
-        self._italic_font = ImageFont.truetype(italic_font_path)
-        self._simple_font = ImageFont.truetype(simple_font_path)
-        self._italic_bold_font = ImageFont.truetype(italic_bold_font_path)
-        self._template_img = Image.open(self._template_path)
-        self._package_img = Image.open(package_template_path)
-
+        self._local_qr_codes = local_qr_codes
+        self._renderer_options = (
+            ('template_path', template_path),
+            ('package_template_path', package_template_path),
+            ('bold_font_path', bold_font_path),
+            ('italic_font_path', italic_font_path),
+            ('simple_font_path', simple_font_path),
+            ('italic_bold_font_path', italic_bold_font_path),
+        )
+        if use_processes:
+            # bot process has running threads, so workers are forked from
+            # a fork server which preloads this module. Every worker still
+            # imports bot.py as __mp_main__ and sets up Django there, the
+            # bot itself is started only under its __main__ guard
+            mp_context = multiprocessing.get_context('forkserver')
+            mp_context.set_forkserver_preload([__name__])
+            self._executor: Executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp_context,
+                initializer=_get_renderer,
+                initargs=(self._renderer_options,),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='ticket_generator',
+            )
 
     async def generate_ticket(
         self,
         ticket: schemas.Ticket,
     ) -> bytes:
-        copied_img = self._template_img.copy()
-        draw = ImageDraw.Draw(copied_img)
-        # town from
-        self._draw_text(
-            text=ticket.start_station.town.name,
-            position=(440, 670),
-            font_size=51,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # town to
-        self._draw_text(
-            text=ticket.end_station.town.name,
-            position=(440, 970),
-            font_size=52,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # station from
-        self._draw_text(
-            text=ticket.start_station.name,
-            position=(440, 727),
-            font_size=30,
-            font=self._italic_font,
-            color=(130,130,130),
-            draw=draw,
-        )
-        # station to
-        self._draw_text(
-            text=ticket.end_station.name,
-            position=(440, 1027),
-            font_size=30,
-            font=self._italic_font,
-            color=(128,128,128),
-            draw=draw,
-        )
-        # date from
-        self._draw_text(
-            text=(
-                f'{ticket.departure_time.day} '
-                f'{MONTHS[ticket.departure_time.month]} '
-                f'{ticket.departure_time.year} '
-                f'{WEEK_DAYS[ticket.departure_time.weekday() + 1]}'
-            ),
-            position=(440, 614),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
+        qr_code = await self._get_qr_code(ticket.ticket_code)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, _render_ticket,
+            self._renderer_options, ticket, qr_code,
         )
-        # date to
-        self._draw_text(
-            text=(
-                f'{ticket.arrival_time.day} '
-                f'{MONTHS[ticket.arrival_time.month]} '
-                f'{ticket.arrival_time.year} '
-                f'{WEEK_DAYS[ticket.arrival_time.weekday() + 1]}'
-            ),
-            position=(440, 914),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # time from
-        self._draw_text(
-            text=ticket.departure_time.strftime('%H:%M'),
-            position=(130, 610),
-            font_size=55,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # time to
-        self._draw_text(
-            text=ticket.arrival_time.strftime('%H:%M'),
-            position=(130, 910),
-            font_size=55,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # FIO
-        self._draw_text(
-            text=(
-                f'{ticket.passenger.surname.capitalize()} '    
-                f'{ticket.passenger.name[0].upper()}.'
-            ),
-            position=(70, 240),
-            font_size=45,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # ticket number
-        self._draw_text(
-            text=str(ticket.ticket_code),
-            position=(70, 350),
-            font_size=30,
-            font=self._italic_font,
-            color=(128,128,128),
-            draw=draw,
-        )
-        if ticket.is_paid:
-            self._draw_text(
-                text='ОПЛАЧЕНО',
-                position=(304, 452),
-                font_size=30,
-                font=self._bold_font,
-                color=(31,214,85),
-                draw=draw,
-            )
-            # paid time
-            self._draw_text(
-                text=ticket.paid_time.strftime('%d.%m.%Y %H:%M'),
-                position=(530, 452),
-                font_size=25,
-                font=self._simple_font,
-                color=(128, 128, 128),
-                draw=draw,
-            )
-        else:
-            self._draw_text(
-                text='НЕ ОПЛАЧЕНО',
-                position=(304, 452),
-                font_size=30,
-                font=self._bold_font,
-                color=(255, 0, 0),
-                draw=draw,
-            )
-        # price
-        self._draw_text(
-            text=str(ticket.price) + ' грн.',
-            position=(304, 417),
-            font_size=30,
-            font=self._italic_font,
-            color=(128,128,128),
-            draw=draw,
-        ) 
-        # qr code
-        self._paste_image(
-            image_bytes=(await generate_qr_code(ticket.ticket_code)),
-            position=(840, 120),
-            size=(400, 400),
-            img=copied_img,
+
+    async def generate_package(
+        self,
+        package: schemas.Package,
+    ) -> bytes:
+        qr_code = await self._get_qr_code(package.package_code)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, _render_package,
+            self._renderer_options, package, qr_code,
         )
 
-        if ticket.type.name != 'Дорослий':
-            self._draw_text(
-                text=ticket.type.name.lower(),
-                font=self._italic_font,
-                font_size=30,
-                position=(304, 485),
-                color=(128,128,128),
-                draw=draw,
-            )
-            # discounte text 
-            self._draw_text(
-                text='Знижка:',
-                font=self._italic_font,
-                position=(530, 415),
-                color=(128,128,128),
-                font_size=30,
-                draw=draw,
+    async def generate_tickets(
+        self,
+        tickets: list[schemas.Ticket],
+    ) -> list[bytes]:
+        return list(await asyncio.gather(
+            *(self.generate_ticket(ticket) for ticket in tickets)
+        ))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _get_qr_code(self, info: str) -> bytes | None:
+        if self._local_qr_codes:
+            return None
+        return await generate_qr_code(str(info))
+
+
+_renderers = threading.local()
+
+
+def _get_renderer(options: tuple) -> 'TicketRenderer':
+    renderers = getattr(_renderers, 'renderers', None)
+    if renderers is None:
+        renderers = _renderers.renderers = {}
+    if options not in renderers:
+        renderers[options] = TicketRenderer(**dict(options))
+    return renderers[options]
+
+
+def _render_ticket(
+    options: tuple,
+    ticket: schemas.Ticket,
+    qr_code: bytes | None,
+) -> bytes:
+    return _get_renderer(options).render_ticket(ticket, qr_code)
+
+
+def _render_package(
+    options: tuple,
+    package: schemas.Package,
+    qr_code: bytes | None,
+) -> bytes:
+    return _get_renderer(options).render_package(package, qr_code)
+
+
+class TicketRenderer:
+    '''
+    Draws tickets by the layout spec. Fonts are sized once and static
+    labels are composited into template variants at startup.
+    '''
+
+    def __init__(
+        self,
+        template_path: str,
+        package_template_path: str,
+        bold_font_path: str,
+        italic_font_path: str,
+        simple_font_path: str,
+        italic_bold_font_path: str,
+    ) -> None:
+        font_paths = {
+            'bold': bold_font_path,
+            'italic': italic_font_path,
+            'simple': simple_font_path,
+            'italic_bold': italic_bold_font_path,
+        }
+        self._fonts: dict[tuple[str, int], FreeTypeFont] = {}
+        for field in (
+            *layout.TICKET_FIELDS.values(),
+            *layout.PACKAGE_FIELDS.values(),
+            layout.TICKET_PAID,
+            layout.TICKET_NOT_PAID,
+            layout.TICKET_DISCOUNT,
+            layout.PACKAGE_PAID,
+            layout.PACKAGE_NOT_PAID,
+        ):
+            key = (field.font, field.size)
+            if key not in self._fonts:
+                self._fonts[key] = ImageFont.truetype(
+                    font_paths[field.font], field.size,
+                )
+        template_img = Image.open(template_path).convert('RGB')
+        package_img = Image.open(package_template_path).convert('RGB')
+        # (is_paid, has_discount)
+        self._ticket_templates = {
+            (is_paid, has_discount): self._compose(
+                template_img,
+                layout.TICKET_PAID if is_paid else layout.TICKET_NOT_PAID,
+                *((layout.TICKET_DISCOUNT,) if has_discount else ()),
             )
-            self._draw_text(
-                text=f'{ticket.type.discount} %',
-                font=self._italic_font,
-                position=(650, 415),
-                color=(128,128,128),
-                font_size=30,
-                draw=draw,
+            for is_paid in (True, False)
+            for has_discount in (True, False)
+        }
+        self._package_templates = {
+            is_paid: self._compose(
+                package_img,
+                layout.PACKAGE_PAID if is_paid else layout.PACKAGE_NOT_PAID,
             )
+            for is_paid in (True, False)
+        }
 
-        b = io.BytesIO()
-        copied_img.save(b, format='JPEG')
-        return b.getvalue()
-        
-    async def generate_package(
+    def render_ticket(
         self,
-        package: schemas.Package
-    ):
-        copied_img = self._package_img.copy()
+        ticket: schemas.Ticket,
+        qr_code: bytes | None = None,
+    ) -> bytes:
+        has_discount = ticket.type.name != 'Дорослий'
+        copied_img = self._ticket_templates[
+            (bool(ticket.is_paid), has_discount)
+        ].copy()
         draw = ImageDraw.Draw(copied_img)
-        # town from
-        self._draw_text(
-            text=package.start_station.town.name,
-            position=(440, 670),
-            font_size=51,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # town to
-        self._draw_text(
-            text=package.end_station.town.name,
-            position=(440, 970),
-            font_size=52,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # station from
-        self._draw_text(
-            text=package.start_station.name,
-            position=(440, 727),
-            font_size=30,
-            font=self._italic_font,
-            color=(130,130,130),
-            draw=draw,
-        )
-        # station to
-        self._draw_text(
-            text=package.end_station.name,
-            position=(440, 1027),
-            font_size=30,
-            font=self._italic_font,
-            color=(128,128,128),
-            draw=draw,
-        )
-        # date from
-        self._draw_text(
-            text=(
-                f'{package.departure_time.day} '
-                f'{MONTHS[package.departure_time.month]} '
-                f'{package.departure_time.year} '
-                f'{WEEK_DAYS[package.departure_time.weekday() + 1]}'
-            ),
-            position=(440, 614),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # date to
-        self._draw_text(
-            text=(
-                f'{package.arrival_time.day} '
-                f'{MONTHS[package.arrival_time.month]} '
-                f'{package.arrival_time.year} '
-                f'{WEEK_DAYS[package.arrival_time.weekday() + 1]}'
-            ),
-            position=(440, 914),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # time from
-        self._draw_text(
-            text=package.departure_time.strftime('%H:%M'),
-            position=(130, 610),
-            font_size=55,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # time to
-        self._draw_text(
-            text=package.arrival_time.strftime('%H:%M'),
-            position=(130, 910),
-            font_size=55,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # sender fio
-        self._draw_text(
-            text=(
-                f'{package.sender.surname.capitalize()} '    
-                f'{package.sender.name[0].upper()}.'
-            ),
-            position=(300, 140),
-            font_size=45,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # sender phone
-        self._draw_text(
-            text=package.sender.phone,
-            position=(300, 198),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # receiver fio
-        self._draw_text(
-            text=(
-                f'{package.receiver.surname.capitalize()} '
-                f'{package.receiver.name[0].upper()}.'
-            ),
-            position=(300, 250),
-            font_size=45,
-            font=self._bold_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # sender phone
-        self._draw_text(
-            text=package.receiver.phone,
-            position=(300, 308),
-            font_size=40,
-            font=self._simple_font,
-            color=(0,0,0),
-            draw=draw,
-        )
-        # package number
-        self._draw_text(
-            text=str(package.package_code),
-            position=(400, 58),
-            font_size=50,
-            font=self._bold_font,
-            color=(0, 0, 0),
-            draw=draw,
+        texts = {
+            'town_from': ticket.start_station.town.name,
+            'town_to': ticket.end_station.town.name,
+            'station_from': ticket.start_station.name,
+            'station_to': ticket.end_station.name,
+            'date_from': self._format_date(ticket.departure_time),
+            'date_to': self._format_date(ticket.arrival_time),
+            'time_from': ticket.departure_time.strftime('%H:%M'),
+            'time_to': ticket.arrival_time.strftime('%H:%M'),
+            'passenger': self._format_person(ticket.passenger),
+            'ticket_code': str(ticket.ticket_code),
+            'price': str(ticket.price) + ' грн.',
+        }
+        if ticket.is_paid:
+            texts['paid_time'] = ticket.paid_time.strftime('%d.%m.%Y %H:%M')
+        if has_discount:
+            texts['ticket_type'] = ticket.type.name.lower()
+            texts['discount'] = f'{ticket.type.discount} %'
+        for name, text in texts.items():
+            self._draw_text(draw, layout.TICKET_FIELDS[name], text)
+        self._paste_qr_code(
+            info=str(ticket.ticket_code),
+            qr_code=qr_code,
+            field=layout.TICKET_QR_CODE,
+            img=copied_img,
         )
+        return self._encode(copied_img)
+
+    def render_package(
+        self,
+        package: schemas.Package,
+        qr_code: bytes | None = None,
+    ) -> bytes:
+        copied_img = self._package_templates[bool(package.is_paid)].copy()
+        draw = ImageDraw.Draw(copied_img)
+        texts = {
+            'town_from': package.start_station.town.name,
+            'town_to': package.end_station.town.name,
+            'station_from': package.start_station.name,
+            'station_to': package.end_station.name,
+            'date_from': self._format_date(package.departure_time),
+            'date_to': self._format_date(package.arrival_time),
+            'time_from': package.departure_time.strftime('%H:%M'),
+            'time_to': package.arrival_time.strftime('%H:%M'),
+            'sender': self._format_person(package.sender),
+            'sender_phone': package.sender.phone,
+            'receiver': self._format_person(package.receiver),
+            'receiver_phone': package.receiver.phone,
+            'package_code': str(package.package_code),
+            'price': str(package.price) + ' грн.',
+        }
         if package.is_paid:
-            self._draw_text(
-                text='ОПЛАЧЕНО',
-                position=(304, 492),
-                font_size=30,
-                font=self._bold_font,
-                color=(31,214,85),
-                draw=draw,
-            )
-            # paid time
-            self._draw_text(
-                text=package.paid_time.strftime('%d.%m.%Y %H:%M'),
-                position=(530, 492),
-                font_size=25,
-                font=self._simple_font,
-                color=(128, 128, 128),
-                draw=draw,
-            )
-        else:
-            self._draw_text(
-                text='НЕ ОПЛАЧЕНО',
-                position=(304, 492),
-                font_size=30,
-                font=self._bold_font,
-                color=(255, 0, 0),
-                draw=draw,
-            )
-        # price
-        self._draw_text(
-            text=str(package.price) + ' грн.',
-            position=(304, 452),
-            font_size=30,
-            font=self._italic_font,
-            color=(128,128,128),
-            draw=draw,
-        ) 
-        # qr code
-        self._paste_image(
-            image_bytes=(await generate_qr_code(package.package_code)),
-            position=(840, 120),
-            size=(400, 400),
+            texts['paid_time'] = package.paid_time.strftime('%d.%m.%Y %H:%M')
+        for name, text in texts.items():
+            self._draw_text(draw, layout.PACKAGE_FIELDS[name], text)
+        self._paste_qr_code(
+            info=str(package.package_code),
+            qr_code=qr_code,
+            field=layout.PACKAGE_QR_CODE,
             img=copied_img,
         )
+        return self._encode(copied_img)
 
-
-        b = io.BytesIO()
-        copied_img.save(b, format='JPEG')
-        return b.getvalue()
+    def _compose(
+        self,
+        template: Image.Image,
+        *static_texts: layout.StaticText,
+    ) -> Image.Image:
+        img = template.copy()
+        draw = ImageDraw.Draw(img)
+        for static_text in static_texts:
+            self._draw_text(draw, static_text, static_text.text)
+        return img
 
     def _draw_text(
         self,
+        draw: ImageDraw.ImageDraw,
+        field: layout.TextField,
         text: str,
-        position: tuple,
-        font_size: int,
-        font: FreeTypeFont,
-        color: tuple,
-        draw: ImageDraw,
     ) -> None:
-        font = font.font_variant(size=font_size)
-        draw.text(position, text, fill=color, font=font)
-
+        draw.text(
+            field.position,
+            text,
+            fill=field.color,
+            font=self._fonts[(field.font, field.size)],
+        )
 
-    def _paste_image(
+    def _paste_qr_code(
         self,
-        image_bytes: bytes,
-        position: tuple,
-        size: tuple,
-        img: ImageFile,
+        info: str,
+        qr_code: bytes | None,
+        field: layout.QrCodeField,
+        img: Image.Image,
     ) -> None:
-        qr_img = Image.open(io.BytesIO(image_bytes))
-        qr_img = qr_img.resize(size)
-        img.paste(qr_img, position)
-    
+        if qr_code is None:
+            img.paste(render_qr_code(info, field.size), field.position)
+            return
+        qr_img = Image.open(io.BytesIO(qr_code)).resize(field.size)
+        img.paste(qr_img, field.position)
 
-        
-        
\ No newline at end of file
+    @staticmethod
+    def _format_date(date: datetime.datetime) -> str:
+        return (
+            f'{date.day} '
+            f'{MONTHS[date.month]} '
+            f'{date.year} '
+            f'{WEEK_DAYS[date.weekday() + 1]}'
+        )
+
+    @staticmethod
+    def _format_person(person: schemas.Person) -> str:
+        return f'{person.surname.capitalize()} {person.name[0].upper()}.'
+
+    @staticmethod
+    def _encode(img: Image.Image) -> bytes:
+        b = io.BytesIO()
+        img.save(b, format='JPEG')
+        return b.getvalue()
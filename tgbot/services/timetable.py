@@ -0,0 +1,288 @@
+import asyncio
+import datetime
+from decimal import Decimal
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from tgbot.services import db
+
+
+class RouteStop(NamedTuple):
+    station_id: int
+    station_index: int
+    departure_time: datetime.datetime
+
+
+@dataclass(frozen=True)
+class RouteTimetable:
+    # None for a departure of a schedule which is not booked yet
+    id: int | None
+    code: str
+    bus_id: int
+    seats: int
+    stops: tuple[RouteStop, ...]
+    prices: dict[tuple[int, int], tuple[Decimal, Decimal]]
+    disallowed_ways: frozenset[tuple[int, int]]
+    stations: dict[int, RouteStop] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, 'stations', {stop.station_id: stop for stop in self.stops},
+        )
+
+    def segment(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+    ) -> tuple[RouteStop, RouteStop] | None:
+        start_stop = self.stations.get(start_station_id)
+        end_stop = self.stations.get(end_station_id)
+        if start_stop is None or end_stop is None:
+            return None
+        if start_stop.station_index >= end_stop.station_index:
+            return None
+        if (start_station_id, end_station_id) in self.disallowed_ways:
+            return None
+        return start_stop, end_stop
+
+
+@dataclass
+class TimetableMatch:
+    route: RouteTimetable
+    start_stop: RouteStop
+    end_stop: RouteStop
+    available_seats: int | None = None
+
+    @property
+    def user_departure_time(self) -> datetime.datetime:
+        return self.start_stop.departure_time
+
+    @property
+    def user_arrival_time(self) -> datetime.datetime:
+        return self.end_stop.departure_time
+
+    @property
+    def ticket_price(self) -> Decimal | None:
+        return self._price[0]
+
+    @property
+    def package_price(self) -> Decimal | None:
+        return self._price[1]
+
+    @property
+    def _price(self) -> tuple[Decimal | None, Decimal | None]:
+        return self.route.prices.get(
+            (self.start_stop.station_id, self.end_stop.station_id),
+            (None, None),
+        )
+
+
+class Timetable:
+    '''
+    Active routes with their stops, prices and disallowed ways.
+    Reloaded lazily after invalidation (see tgbot.services.invalidation)
+    '''
+
+    def __init__(self) -> None:
+        self._routes: dict[int, RouteTimetable] = {}
+        self._station_routes: dict[int, set[int]] = {}
+        self._is_loaded = False
+        self._stale_routes: set[int] = set()
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, route_id: int | str | None = None) -> None:
+        if route_id is None:
+            self._is_loaded = False
+        else:
+            self._stale_routes.add(int(route_id))
+
+    async def get_routes(self) -> dict[int, RouteTimetable]:
+        if self._is_loaded and not self._stale_routes:
+            return self._routes
+        async with self._lock:
+            if not self._is_loaded:
+                # set before loading, so invalidation during load is kept
+                self._is_loaded = True
+                self._stale_routes.clear()
+                self._set_routes(self._parse(await db.get_timetable_rows()))
+            elif self._stale_routes:
+                route_ids = list(self._stale_routes)
+                self._stale_routes.difference_update(route_ids)
+                routes = {
+                    route_id: route for route_id, route in self._routes.items()
+                    if route_id not in route_ids
+                }
+                routes.update(
+                    self._parse(await db.get_timetable_rows(route_ids))
+                )
+                self._set_routes(routes)
+        return self._routes
+
+    async def get_route(self, route_id: int) -> RouteTimetable | None:
+        return (await self.get_routes()).get(route_id)
+
+    async def get_schedule_departures(
+        self,
+        date_from: datetime.date,
+        date_to: datetime.date,
+    ) -> list[RouteTimetable]:
+        '''Departures of schedules without a route, read on every call'''
+        return self._parse_departures(
+            await db.get_schedule_timetable_rows(date_from, date_to),
+            date_from,
+            date_to,
+        )
+
+    async def find(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        after: datetime.datetime | None = None,
+        date: datetime.date | None = None,
+    ) -> list[TimetableMatch]:
+        routes = await self.get_routes()
+        after = after or timezone.now()
+        route_ids = (
+            self._station_routes.get(start_station_id, set())
+            & self._station_routes.get(end_station_id, set())
+        )
+        matches = []
+        for route_id in route_ids:
+            segment = routes[route_id].segment(start_station_id, end_station_id)
+            if segment is None:
+                continue
+            start_stop, _ = segment
+            if start_stop.departure_time <= after:
+                continue
+            if date is not None and start_stop.departure_time.date() != date:
+                continue
+            matches.append(TimetableMatch(routes[route_id], *segment))
+        return sorted(matches, key=lambda match: match.user_departure_time)
+
+    async def find_with_available_seats(
+        self,
+        start_station_id: int,
+        end_station_id: int,
+        after: datetime.datetime | None = None,
+        date: datetime.date | None = None,
+    ) -> list[TimetableMatch]:
+        matches = await self.find(start_station_id, end_station_id, after, date)
+        seats_taken = await db.get_routes_seats_taken({
+            match.route.id: (
+                match.start_stop.station_index, match.end_stop.station_index,
+            ) for match in matches
+        })
+        for match in matches:
+            match.available_seats = (
+                match.route.seats - seats_taken.get(match.route.id, 0)
+            )
+        return [match for match in matches if match.available_seats > 0]
+
+    def _set_routes(self, routes: dict[int, RouteTimetable]) -> None:
+        station_routes: dict[int, set[int]] = {}
+        for route in routes.values():
+            for stop in route.stops:
+                station_routes.setdefault(stop.station_id, set()).add(route.id)
+        self._routes = routes
+        self._station_routes = station_routes
+
+    @staticmethod
+    def _parse(rows: dict[str, list]) -> dict[int, RouteTimetable]:
+        stops: dict[int, list[RouteStop]] = {}
+        for route_id, station_id, station_index, departure_time in \
+                rows['route_stations']:
+            stops.setdefault(route_id, []).append(
+                RouteStop(
+                    station_id,
+                    station_index,
+                    timezone.localtime(departure_time),
+                )
+            )
+        prices: dict[int, dict] = {}
+        for route_id, from_station_id, to_station_id, ticket_price, \
+                package_price in rows['prices']:
+            prices.setdefault(route_id, {})[(from_station_id, to_station_id)] = (
+                ticket_price, package_price,
+            )
+        disallowed_ways: dict[int, set] = {}
+        for route_id, from_station_id, to_station_id in rows['disallowed_ways']:
+            disallowed_ways.setdefault(route_id, set()).add(
+                (from_station_id, to_station_id)
+            )
+        return {
+            route_id: RouteTimetable(
+                id=route_id,
+                code=code,
+                bus_id=bus_id,
+                seats=seats,
+                stops=tuple(stops.get(route_id, ())),
+                prices=prices.get(route_id, {}),
+                disallowed_ways=frozenset(disallowed_ways.get(route_id, ())),
+            ) for route_id, code, bus_id, seats in rows['routes']
+        }
+
+    @staticmethod
+    def _parse_departures(
+        rows: dict[str, list],
+        date_from: datetime.date,
+        date_to: datetime.date,
+    ) -> list[RouteTimetable]:
+        stops: dict[int, list] = {}
+        for schedule_id, *stop in rows['schedule_stations']:
+            stops.setdefault(schedule_id, []).append(stop)
+        prices: dict[int, dict] = {}
+        for schedule_id, from_station_id, to_station_id, ticket_price, \
+                package_price in rows['prices']:
+            prices.setdefault(schedule_id, {})[
+                (from_station_id, to_station_id)
+            ] = (ticket_price, package_price)
+        disallowed_ways: dict[int, set] = {}
+        for schedule_id, from_station_id, to_station_id in \
+                rows['disallowed_ways']:
+            disallowed_ways.setdefault(schedule_id, set()).add(
+                (from_station_id, to_station_id)
+            )
+        booked = set(rows['routes'])
+
+        def get_stops(
+            schedule_id: int,
+            date: datetime.date,
+        ) -> tuple[RouteStop, ...]:
+            return tuple(
+                RouteStop(
+                    station_id,
+                    station_index,
+                    timezone.make_aware(datetime.datetime.combine(
+                        date + datetime.timedelta(days=day_offset),
+                        departure_time,
+                    )),
+                )
+                for station_id, station_index, departure_time, day_offset
+                in stops.get(schedule_id, ())
+            )
+
+        departures = []
+        for schedule_id, code, bus_id, seats, weekdays, valid_from, \
+                valid_until in rows['schedules']:
+            date = max(date_from, valid_from)
+            while date <= min(date_to, valid_until or date_to):
+                if str(date.isoweekday()) in weekdays and \
+                        (schedule_id, date) not in booked:
+                    departures.append(
+                        RouteTimetable(
+                            id=None,
+                            # see RouteSchedule.get_departure_code
+                            code=f'{code}{date:%d%m}',
+                            bus_id=bus_id,
+                            seats=seats,
+                            stops=get_stops(schedule_id, date),
+                            prices=prices.get(schedule_id, {}),
+                            disallowed_ways=frozenset(
+                                disallowed_ways.get(schedule_id, ())
+                            ),
+                        )
+                    )
+                date += datetime.timedelta(days=1)
+        return departures
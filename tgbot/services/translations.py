@@ -0,0 +1,142 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from web.app import models
+from web.translations import models as translations_models
+from tgbot.services import invalidation
+
+
+@dataclass
+class LanguageTranslations:
+    stations: dict[int, str] = field(default_factory=dict)
+    towns: dict[int, str] = field(default_factory=dict)
+    ticket_types: dict[int, str] = field(default_factory=dict)
+    buses: dict[int, tuple[str, str]] = field(default_factory=dict)
+    bus_options: dict[int, str] = field(default_factory=dict)
+
+
+class TranslationCache:
+    '''
+    All web.translations rows of a language, loaded with one query per model
+    on first use. Missing translations fall back to the original names.
+    Called from sync db functions, so it is guarded by a thread lock.
+    '''
+
+    def __init__(self) -> None:
+        self._languages: dict[int, LanguageTranslations] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, language_id: int | str | None = None) -> None:
+        with self._lock:
+            if language_id is None:
+                self._languages.clear()
+            else:
+                self._languages.pop(int(language_id), None)
+
+    def get(self, language_id: int) -> LanguageTranslations:
+        translations = self._languages.get(language_id)
+        if translations is not None:
+            return translations
+        with self._lock:
+            if language_id not in self._languages:
+                self._languages[language_id] = self._load(language_id)
+            return self._languages[language_id]
+
+    def get_loaded(self, language_id: int) -> LanguageTranslations | None:
+        return self._languages.get(language_id)
+
+    def translate_stations(
+        self,
+        stations: Iterable[models.Station],
+        language_id: int,
+    ) -> list[models.Station]:
+        translations = self.get(language_id)
+        stations = list(stations)
+        for station in stations:
+            station.name = translations.stations.get(station.id, station.name)
+            station.town.name = translations.towns.get(
+                station.town_id, station.town.name,
+            )
+        return stations
+
+    def translate_station(
+        self,
+        station: models.Station,
+        language_id: int,
+    ) -> models.Station:
+        return self.translate_stations([station], language_id)[0]
+
+    def translate_ticket_types(
+        self,
+        ticket_types: Iterable[models.TicketType],
+        language_id: int,
+    ) -> list[models.TicketType]:
+        translations = self.get(language_id)
+        ticket_types = list(ticket_types)
+        for ticket_type in ticket_types:
+            ticket_type.name = translations.ticket_types.get(
+                ticket_type.id, ticket_type.name,
+            )
+        return ticket_types
+
+    def translate_bus(
+        self,
+        bus: models.Bus,
+        language_id: int,
+    ) -> models.Bus:
+        translations = self.get(language_id)
+        bus.name, bus.description = translations.buses.get(
+            bus.id, (bus.name, bus.description),
+        )
+        return bus
+
+    def translate_bus_options(
+        self,
+        bus_options: Iterable[models.BusOption],
+        language_id: int,
+    ) -> list[models.BusOption]:
+        translations = self.get(language_id)
+        bus_options = list(bus_options)
+        for bus_option in bus_options:
+            bus_option.name = translations.bus_options.get(
+                bus_option.id, bus_option.name,
+            )
+        return bus_options
+
+    @staticmethod
+    def _load(language_id: int) -> LanguageTranslations:
+        return LanguageTranslations(
+            stations=dict(
+                translations_models.StationTranslations.objects
+                .filter(language=language_id)
+                .values_list('station_id', 'translation')
+            ),
+            towns=dict(
+                translations_models.TownTranslations.objects
+                .filter(language=language_id)
+                .values_list('town_id', 'translation')
+            ),
+            ticket_types=dict(
+                translations_models.TicketTypeTranslations.objects
+                .filter(language=language_id)
+                .values_list('ticket_type_id', 'translation')
+            ),
+            buses={
+                bus_id: (name, description) for bus_id, name, description in
+                translations_models.BusTranslation.objects
+                .filter(language=language_id)
+                .values_list(
+                    'bus_id', 'name_translation', 'description_translation',
+                )
+            },
+            bus_options=dict(
+                translations_models.BusOptionTranslation.objects
+                .filter(language=language_id)
+                .values_list('bus_option_id', 'translation')
+            ),
+        )
+
+
+translations = TranslationCache()
+invalidation.subscribe('translations', translations.invalidate)
@@ -0,0 +1,117 @@
+import json
+import logging
+import functools
+import threading
+from typing import Awaitable, Callable
+
+import redis
+import aioredis
+from aioredis import Redis, ConnectionPool
+from cachetools import TTLCache
+
+from tgbot.misc import schemas
+from tgbot.services import invalidation
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserProfileCache:
+    '''
+    Telegram user profiles kept in a small in-process LRU and in Redis.
+    Entries are dropped by db functions that change the user, in every bot
+    process, through the invalidation channel.
+    '''
+
+    def __init__(
+        self,
+        ttl: int = 600,
+        local_ttl: int = 60,
+        maxsize: int = 10_000,
+    ) -> None:
+        self._ttl = ttl
+        self._local: TTLCache = TTLCache(maxsize=maxsize, ttl=local_ttl)
+        self._lock = threading.Lock()
+        self._connection_pool: ConnectionPool | None = None
+
+    def setup(self, connection_pool: ConnectionPool) -> None:
+        self._connection_pool = connection_pool
+
+    def cached(
+        self,
+        func: Callable[[int], Awaitable[schemas.TelegramUser | None]],
+    ) -> Callable[[int], Awaitable[schemas.TelegramUser | None]]:
+        @functools.wraps(func)
+        async def wrapper(telegram_id: int) -> schemas.TelegramUser | None:
+            return await self.get(telegram_id, func)
+        return wrapper
+
+    async def get(
+        self,
+        telegram_id: int,
+        load: Callable[[int], Awaitable[schemas.TelegramUser | None]],
+    ) -> schemas.TelegramUser | None:
+        with self._lock:
+            user = self._local.get(telegram_id)
+        if user is not None:
+            return user
+        user = await self._get_from_redis(telegram_id)
+        if user is None:
+            user = await load(telegram_id)
+            if user is None:
+                # not registered, so it is loaded again after registration
+                return None
+            await self._set_to_redis(user)
+        with self._lock:
+            self._local[telegram_id] = user
+        return user
+
+    def forget(self, telegram_id: int | str | None = None) -> None:
+        with self._lock:
+            if telegram_id is None:
+                self._local.clear()
+            else:
+                self._local.pop(int(telegram_id), None)
+
+    def invalidate(self, telegram_id: int) -> None:
+        '''Sync, called from db functions after the user is changed'''
+        try:
+            invalidation.get_connection().delete(self._key(telegram_id))
+        except redis.RedisError:
+            logger.exception('Could not drop cached user %s', telegram_id)
+        invalidation.publish('telegram_user', telegram_id)
+
+    async def _get_from_redis(
+        self,
+        telegram_id: int,
+    ) -> schemas.TelegramUser | None:
+        if self._connection_pool is None:
+            return None
+        try:
+            raw = await Redis(connection_pool=self._connection_pool).get(
+                self._key(telegram_id)
+            )
+        except aioredis.RedisError:
+            logger.exception('Could not get cached user %s', telegram_id)
+            return None
+        if raw is None:
+            return None
+        return schemas.TelegramUser(**json.loads(raw))
+
+    async def _set_to_redis(self, user: schemas.TelegramUser) -> None:
+        if self._connection_pool is None:
+            return
+        try:
+            await Redis(connection_pool=self._connection_pool).set(
+                self._key(user.telegram_id), user.json(), ex=self._ttl,
+            )
+        except aioredis.RedisError:
+            logger.exception('Could not cache user %s', user.telegram_id)
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f'telegram_user:{telegram_id}'
+
+
+user_profiles = UserProfileCache()
+invalidation.subscribe('telegram_user', user_profiles.forget)
@@ -218,15 +218,58 @@ class RouteAdmin(admin.ModelAdmin):
         ('bus', 'driver'),
         'active',
         'is_regular',
+        ('schedule', 'departure_date'),
     )
+    readonly_fields = ('schedule', 'departure_date')
     # search_fields = ('departure_time', )
     list_filter = ('active', 'start_station', 'end_station', RoutesInWeek)
 
-    actions = (actions.duplicate_route, actions.deactivate, actions.activate)
+    actions = (
+        actions.create_schedule,
+        actions.deactivate,
+        actions.activate,
+        actions.recount_occupancy,
+    )
 
     inlines = [RouteStationInline, DissallowedWayInline, PriceInline]
 
     
+class ScheduleStationInline(admin.TabularInline):
+    model = models.ScheduleStation
+    extra = 0
+
+
+class SchedulePriceInline(admin.TabularInline):
+    model = models.SchedulePrice
+    extra = 0
+
+
+class ScheduleDisallowedWayInline(admin.TabularInline):
+    model = models.ScheduleDisallowedWay
+    extra = 0
+
+
+class RouteScheduleAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'start_station', 'end_station', 'weekdays', 'valid_from',
+        'valid_until', 'active',
+    )
+    fields = (
+        ('start_station', 'end_station'),
+        ('bus', 'driver'),
+        'weekdays',
+        ('valid_from', 'valid_until'),
+        'active',
+    )
+    list_filter = ('active', 'start_station', 'end_station')
+
+    inlines = [
+        ScheduleStationInline,
+        SchedulePriceInline,
+        ScheduleDisallowedWayInline,
+    ]
+
+
 class PriceAdmin(admin.ModelAdmin):
     list_display = ('id', 'from_station', 'to_station', 'ticket_price', 'package_price')
    
@@ -571,6 +614,7 @@ admin.site.register(models.Station, StationAdmin)
 admin.site.register(models.Bus, BusAdmin)
 admin.site.register(models.Driver, DriverAdmin)
 admin.site.register(models.Route, RouteAdmin)
+admin.site.register(models.RouteSchedule, RouteScheduleAdmin)
 admin.site.register(models.RouteStation, RouteStationsAdmin)
 admin.site.register(models.Price, PriceAdmin)
 admin.site.register(models.TicketType, TicketTypeAdmin)
@@ -1,12 +1,14 @@
+import re
+import random
+import string
 import logging
 import math
 import datetime
 import uuid
 from uuid import uuid4
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
-from asgiref.sync import sync_to_async
 from django.core.exceptions import ValidationError
 
 
@@ -17,6 +19,16 @@ def four_number_code_generator():
 def six_number_code_generator():
     return uuid.uuid4().hex[:6]
 
+def schedule_code_generator():
+    # route codes are hex, so a departure code of a schedule never matches one
+    return random.choice(string.ascii_lowercase[6:]) + ''.join(
+        random.choices(string.digits + string.ascii_lowercase, k=3)
+    )
+
+def validate_weekdays(value: str):
+    if not value or not set(value) <= set('1234567'):
+        raise ValidationError('Вкажіть номери днів тижня від 1 до 7')
+
 
 class Language(models.Model):
 
@@ -214,6 +226,7 @@ class Route(models.Model):
         db_table = 'route'
         verbose_name = 'Маршрут'
         verbose_name_plural = 'Маршрути'
+        unique_together = ('schedule', 'departure_date')
 
     id = models.AutoField(primary_key=True)
     start_station = models.ForeignKey(
@@ -229,7 +242,7 @@ class Route(models.Model):
         verbose_name='Кінцева станція',
     )
     code = models.CharField(
-        max_length=6, 
+        max_length=8,
         unique=True,
         default=six_number_code_generator,
         editable=False
@@ -238,6 +251,17 @@ class Route(models.Model):
     bus = models.ForeignKey(Bus, on_delete=models.CASCADE, verbose_name='Автобус')
     driver = models.ForeignKey(Driver, on_delete=models.CASCADE, verbose_name='Водій')
     is_regular = models.BooleanField(default=False, verbose_name='Регулярний')
+    # set for a departure of a schedule, created when it is booked first
+    schedule = models.ForeignKey(
+        to='RouteSchedule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Розклад',
+    )
+    departure_date = models.DateField(
+        null=True, blank=True, verbose_name='Дата рейсу за розкладом',
+    )
 
 
     def __str__(self):
@@ -324,14 +348,9 @@ class Ticket(models.Model):
     paid_time = models.DateTimeField(null=True)
     created_time = models.DateTimeField(auto_now_add=True, verbose_name='Час створення')
 
+    # unpaid booking holds the seat only for this time
+    booking_time = datetime.timedelta(minutes=10)
 
-    @sync_to_async
-    def delete_after_10min(self):
-        if not self.is_booked:
-            return
-        if self.created_time + datetime.timedelta(minutes=10) < timezone.now():
-            self.delete()
-    
     def __str__(self):
         return f'Квиток {self.ticket_code}'
 
@@ -475,7 +494,421 @@ class RouteStation(models.Model):
         return (
             f'{self.route} ({self.station_index})'
         )
-    
+
+
+class RouteSegmentOccupancy(models.Model):
+    """
+    Seats taken on the route leg which starts at `segment_index` station.
+    Kept in sync with tickets by signals, so search reads the maximum over
+    [start_index, end_index) instead of counting overlapping tickets.
+    """
+    class Meta:
+        verbose_name = 'Зайнятість сегменту маршруту'
+        verbose_name_plural = 'Зайнятість сегментів маршруту'
+        db_table = 'route_segment_occupancy'
+        unique_together = ('route', 'segment_index')
+
+    id = models.AutoField(primary_key=True)
+    route = models.ForeignKey(
+        to=Route,
+        on_delete=models.CASCADE,
+        related_name='segments_occupancy',
+        verbose_name='Маршрут',
+    )
+    segment_index = models.IntegerField(verbose_name='Номер сегменту')
+    seats_taken = models.IntegerField(default=0, verbose_name='Зайнято місць')
+
+    def __str__(self):
+        return f'{self.route} ({self.segment_index}): {self.seats_taken}'
+
+    @classmethod
+    def get_segments(
+        cls,
+        route_id: int,
+        start_station_id: int,
+        end_station_id: int,
+    ) -> models.QuerySet:
+        indexes = dict(
+            RouteStation.objects
+            .filter(route=route_id)
+            .filter(station__in=(start_station_id, end_station_id))
+            .values_list('station', 'station_index')
+        )
+        if start_station_id not in indexes or end_station_id not in indexes:
+            return cls.objects.none()
+        return (
+            cls.objects
+            .filter(route=route_id)
+            .filter(segment_index__gte=indexes[start_station_id])
+            .filter(segment_index__lt=indexes[end_station_id])
+        )
+
+    @classmethod
+    def occupy(
+        cls,
+        route_id: int,
+        start_station_id: int,
+        end_station_id: int,
+        seats: int = 1,
+    ) -> int:
+        return (
+            cls.get_segments(route_id, start_station_id, end_station_id)
+            .update(seats_taken=models.F('seats_taken') + seats)
+        )
+
+    @classmethod
+    def get_seats_taken(
+        cls,
+        route_id: int,
+        start_station_id: int,
+        end_station_id: int,
+    ) -> int:
+        return (
+            cls.get_segments(route_id, start_station_id, end_station_id)
+            .aggregate(seats_taken=models.Max('seats_taken'))['seats_taken']
+        ) or 0
+
+    @classmethod
+    def rebuild(cls, route_id: int) -> None:
+        if not Route.objects.filter(pk=route_id).exists():
+            return
+        indexes = dict(
+            RouteStation.objects
+            .filter(route=route_id)
+            .values_list('station', 'station_index')
+        )
+        segments = dict.fromkeys(sorted(indexes.values())[:-1], 0)
+        tickets = (
+            Ticket.objects
+            .filter(route=route_id)
+            .values_list('start_station', 'end_station')
+        )
+        for start_station_id, end_station_id in tickets:
+            start_index = indexes.get(start_station_id)
+            end_index = indexes.get(end_station_id)
+            if start_index is None or end_index is None:
+                continue
+            for segment_index in segments:
+                if start_index <= segment_index < end_index:
+                    segments[segment_index] += 1
+        cls.objects.filter(route=route_id).delete()
+        cls.objects.bulk_create(
+            cls(route_id=route_id, segment_index=index, seats_taken=taken)
+            for index, taken in segments.items()
+        )
+
+
+class RouteSchedule(models.Model):
+    """
+    Weekly departures of a route from one timetable and one price matrix.
+    Search expands the departures of the searched days, a Route with its
+    stations and prices is created for a departure when it is booked
+    first. The departure is known by `code` and the day and month of its
+    date until then (see get_departure_code).
+    """
+    DEPARTURE_CODE = re.compile(r'\A([g-z][0-9a-z]{3})(\d{2})(\d{2})\Z')
+
+    class Meta:
+        verbose_name = 'Розклад маршруту'
+        verbose_name_plural = 'Розклади маршрутів'
+        db_table = 'route_schedule'
+
+    id = models.AutoField(primary_key=True)
+    code = models.CharField(
+        max_length=4,
+        unique=True,
+        default=schedule_code_generator,
+        editable=False,
+    )
+    start_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_start_station',
+        verbose_name='Початкова станція',
+    )
+    end_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_end_station',
+        verbose_name='Кінцева станція',
+    )
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, verbose_name='Автобус')
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, verbose_name='Водій')
+    weekdays = models.CharField(
+        max_length=7,
+        validators=[validate_weekdays],
+        verbose_name='Дні тижня',
+        help_text='Номери днів відправлення: 1 - понеділок, 7 - неділя. '
+            'Наприклад: 135',
+    )
+    valid_from = models.DateField(verbose_name='Діє з')
+    valid_until = models.DateField(null=True, blank=True, verbose_name='Діє до')
+    active = models.BooleanField(default=True, verbose_name='Активний')
+
+    def __str__(self):
+        return f'{self.start_station}-{self.end_station} ({self.weekdays})'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        for _ in range(10):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not RouteSchedule.objects.filter(code=self.code).exists():
+                    raise
+                self.code = schedule_code_generator()
+        return super().save(*args, **kwargs)
+
+    def runs_on(self, date: datetime.date) -> bool:
+        return (
+            self.active
+            and str(date.isoweekday()) in self.weekdays
+            and self.valid_from <= date
+            and (self.valid_until is None or date <= self.valid_until)
+        )
+
+    def get_departure_code(self, date: datetime.date) -> str:
+        return f'{self.code}{date:%d%m}'
+
+    @classmethod
+    def parse_departure_code(
+        cls,
+        code: str,
+    ) -> tuple[str, datetime.date] | None:
+        match = cls.DEPARTURE_CODE.match(code)
+        if match is None:
+            return None
+        schedule_code, day, month = match.groups()
+        # departures are published less than a year ahead
+        today = timezone.localdate()
+        for year in (today.year - 1, today.year, today.year + 1):
+            try:
+                date = datetime.date(year, int(month), int(day))
+            except ValueError:
+                continue
+            if date >= today - datetime.timedelta(days=7):
+                return schedule_code, date
+        return None
+
+    def materialize(self, departure_date: datetime.date) -> Route:
+        route = Route.objects.filter(
+            schedule=self, departure_date=departure_date,
+        ).first()
+        if route is not None:
+            return route
+        code = self.get_departure_code(departure_date)
+        with transaction.atomic():
+            # the route of the same day of the last year gets another code
+            (
+                Route.objects
+                .filter(code=code)
+                .exclude(schedule=self, departure_date=departure_date)
+                .update(code=six_number_code_generator())
+            )
+            route, created = Route.objects.get_or_create(
+                schedule=self,
+                departure_date=departure_date,
+                defaults={
+                    'start_station_id': self.start_station_id,
+                    'end_station_id': self.end_station_id,
+                    'bus_id': self.bus_id,
+                    'driver_id': self.driver_id,
+                    'is_regular': True,
+                    'code': code,
+                },
+            )
+            if not created:
+                return route
+            RouteStation.objects.bulk_create(
+                RouteStation(
+                    route=route,
+                    station_id=stop.station_id,
+                    station_index=stop.station_index,
+                    departure_time=stop.get_departure_time(departure_date),
+                )
+                for stop in self.schedulestation_set.all()
+            )
+            Price.objects.bulk_create(
+                Price(
+                    route=route,
+                    from_station_id=price.from_station_id,
+                    to_station_id=price.to_station_id,
+                    ticket_price=price.ticket_price,
+                    package_price=price.package_price,
+                )
+                for price in self.scheduleprice_set.all()
+            )
+            DisallowedWay.objects.bulk_create(
+                DisallowedWay(
+                    route=route,
+                    from_station_id=way.from_station_id,
+                    to_station_id=way.to_station_id,
+                )
+                for way in self.scheduledisallowedway_set.all()
+            )
+            RouteSegmentOccupancy.rebuild(route.id)
+        return route
+
+    @classmethod
+    def from_route(cls, route: Route) -> 'RouteSchedule':
+        """Weekly schedule with the timetable and prices of the route"""
+        route_stations = list(
+            RouteStation.objects.filter(route=route).order_by('station_index')
+        )
+        departure_time = timezone.localtime(route_stations[0].departure_time)
+        with transaction.atomic():
+            schedule = cls.objects.create(
+                start_station_id=route.start_station_id,
+                end_station_id=route.end_station_id,
+                bus_id=route.bus_id,
+                driver_id=route.driver_id,
+                weekdays=str(departure_time.isoweekday()),
+                valid_from=departure_time.date(),
+            )
+            ScheduleStation.objects.bulk_create(
+                ScheduleStation(
+                    schedule=schedule,
+                    station_id=route_station.station_id,
+                    station_index=route_station.station_index,
+                    departure_time=timezone.localtime(
+                        route_station.departure_time,
+                    ).time(),
+                    day_offset=(
+                        timezone.localtime(route_station.departure_time).date()
+                        - departure_time.date()
+                    ).days,
+                )
+                for route_station in route_stations
+            )
+            SchedulePrice.objects.bulk_create(
+                SchedulePrice(
+                    schedule=schedule,
+                    from_station_id=price.from_station_id,
+                    to_station_id=price.to_station_id,
+                    ticket_price=price.ticket_price,
+                    package_price=price.package_price,
+                )
+                for price in Price.objects.filter(route=route)
+            )
+            ScheduleDisallowedWay.objects.bulk_create(
+                ScheduleDisallowedWay(
+                    schedule=schedule,
+                    from_station_id=way.from_station_id,
+                    to_station_id=way.to_station_id,
+                )
+                for way in DisallowedWay.objects.filter(route=route)
+            )
+            # the route is the first departure of the schedule
+            Route.objects.filter(id=route.id).update(
+                schedule=schedule, departure_date=departure_time.date(),
+            )
+        return schedule
+
+
+class ScheduleStation(models.Model):
+    class Meta:
+        verbose_name = 'Станція розкладу'
+        verbose_name_plural = 'Станції розкладу'
+        db_table = 'schedule_station'
+
+    id = models.AutoField(primary_key=True)
+    schedule = models.ForeignKey(
+        to=RouteSchedule,
+        on_delete=models.CASCADE,
+        verbose_name='Розклад',
+    )
+    station_index = models.IntegerField(verbose_name='Номер станції')
+    station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        verbose_name='Станція',
+    )
+    departure_time = models.TimeField(verbose_name='Час відправлення')
+    day_offset = models.IntegerField(
+        default=0, verbose_name='Днів від початку рейсу',
+    )
+
+    def __str__(self):
+        return f'{self.schedule} ({self.station_index})'
+
+    def get_departure_time(self, date: datetime.date) -> datetime.datetime:
+        return timezone.make_aware(
+            datetime.datetime.combine(
+                date + datetime.timedelta(days=self.day_offset),
+                self.departure_time,
+            )
+        )
+
+
+class SchedulePrice(models.Model):
+    class Meta:
+        verbose_name = 'Ціни розкладу'
+        verbose_name_plural = 'Ціни розкладу'
+        db_table = 'schedule_price'
+
+    id = models.AutoField(primary_key=True)
+    schedule = models.ForeignKey(
+        to=RouteSchedule,
+        on_delete=models.CASCADE,
+        verbose_name='Розклад',
+    )
+    from_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_price_from_station',
+        verbose_name='З станції',
+    )
+    to_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_price_to_station',
+        verbose_name='До станції',
+    )
+    ticket_price = models.DecimalField(
+        decimal_places=2,
+        max_digits=6,
+        verbose_name='Ціна квитка',
+    )
+    package_price = models.DecimalField(
+        decimal_places=2,
+        max_digits=6,
+        verbose_name='Ціна посилки',
+    )
+
+    def __str__(self):
+        return f'{self.from_station} -> {self.to_station}'
+
+
+class ScheduleDisallowedWay(models.Model):
+    class Meta:
+        db_table = 'schedule_disallowed_way'
+        verbose_name = 'Недопустимий маршрут розкладу'
+        verbose_name_plural = 'Недопустимі маршрути розкладу'
+
+    id = models.AutoField(primary_key=True)
+    schedule = models.ForeignKey(
+        to=RouteSchedule,
+        on_delete=models.CASCADE,
+        verbose_name='Розклад',
+    )
+    from_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_disallowed_way_from_station',
+        verbose_name='З станції',
+    )
+    to_station = models.ForeignKey(
+        to=Station,
+        on_delete=models.CASCADE,
+        related_name='schedule_disallowed_way_to_station',
+        verbose_name='До станції',
+    )
+
+    def __str__(self):
+        return f'{self.from_station} -> {self.to_station}'
+
 
 class UserStartStationHistory(models.Model):
     class Meta:
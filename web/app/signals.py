@@ -1,7 +1,21 @@
 from django.dispatch import receiver
-from django.db.models.signals import post_save, ModelSignal, pre_init
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, ModelSignal, pre_init, \
+    pre_save
 
-from ..app.models import Route, RouteStation, Price, Station
+from ..app.models import (
+    Route, RouteStation, Price, Station, Ticket, RouteSegmentOccupancy,
+    DisallowedWay, Bus, Operator, Town, RouteSchedule, ScheduleStation,
+    SchedulePrice, ScheduleDisallowedWay,
+)
+from tgbot.services import invalidation
+from tgbot.services.search_cache import drop_route_searches, \
+    drop_schedule_searches
+
+
+def invalidate_route(route_id: int | None = None) -> None:
+    invalidation.publish('timetable', route_id)
+    drop_route_searches(route_id)
 
 
 @receiver(signal=post_save, sender=Route)
@@ -33,4 +47,208 @@ def create_prices(
                     to_station=to_station.station,
                     ticket_price=0,
                     package_price=0,
-                )
\ No newline at end of file
+                )
+
+
+TICKET_SEGMENT_FIELDS = ('route_id', 'start_station_id', 'end_station_id')
+
+
+@receiver(signal=pre_save, sender=Ticket)
+def remember_route_segments(
+    signal: ModelSignal,
+    sender: Ticket,
+    instance: Ticket,
+    raw: bool,
+    update_fields: frozenset | None,
+    **kwargs,
+):
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not update_fields & {
+        'route', 'start_station', 'end_station', *TICKET_SEGMENT_FIELDS,
+    }:
+        return
+    instance._saved_segments = (
+        Ticket.objects
+        .filter(id=instance.id)
+        .values_list(*TICKET_SEGMENT_FIELDS)
+        .first()
+    )
+
+
+@receiver(signal=post_save, sender=Ticket)
+def occupy_route_segments(
+    signal: ModelSignal,
+    sender: Ticket,
+    instance: Ticket,
+    created: bool,
+    raw: bool,
+    **kwargs,
+):
+    if raw:
+        return
+    if not created:
+        saved_segments = instance.__dict__.pop('_saved_segments', None)
+        segments = tuple(
+            getattr(instance, field) for field in TICKET_SEGMENT_FIELDS
+        )
+        if saved_segments is None or saved_segments == segments:
+            return
+        # stations could be changed from admin, the route as well
+        route_ids = {saved_segments[0], instance.route_id}
+
+        def rebuild() -> None:
+            for route_id in route_ids:
+                RouteSegmentOccupancy.rebuild(route_id)
+        transaction.on_commit(rebuild)
+        return
+    if not RouteSegmentOccupancy.occupy(
+        instance.route_id, instance.start_station_id, instance.end_station_id,
+    ):
+        transaction.on_commit(
+            lambda: RouteSegmentOccupancy.rebuild(instance.route_id)
+        )
+
+
+@receiver(signal=post_delete, sender=Ticket)
+def release_route_segments(
+    signal: ModelSignal,
+    sender: Ticket,
+    instance: Ticket,
+    **kwargs,
+):
+    RouteSegmentOccupancy.occupy(
+        instance.route_id,
+        instance.start_station_id,
+        instance.end_station_id,
+        seats=-1,
+    )
+
+
+@receiver(signal=post_save, sender=RouteStation)
+@receiver(signal=post_delete, sender=RouteStation)
+def rebuild_route_segments(
+    signal: ModelSignal,
+    sender: RouteStation,
+    instance: RouteStation,
+    **kwargs,
+):
+    if kwargs.get('raw'):
+        return
+    transaction.on_commit(
+        lambda: RouteSegmentOccupancy.rebuild(instance.route_id)
+    )
+
+
+@receiver(signal=post_save, sender=Route)
+@receiver(signal=post_delete, sender=Route)
+def invalidate_route_timetable(
+    signal: ModelSignal,
+    sender: Route,
+    instance: Route,
+    **kwargs,
+):
+    # pk is cleared after delete, so it is bound before commit
+    route_id = instance.id
+    schedule_id = instance.schedule_id
+    # a new or changed route can be found by searches it was not in, a
+    # departure of a schedule replaces the one in searches of the schedule
+    drop_all = signal is post_save and not (
+        kwargs.get('created') and schedule_id is not None
+    )
+
+    def invalidate() -> None:
+        invalidate_route(route_id)
+        if schedule_id is not None:
+            # searches with the departure show the route now
+            drop_schedule_searches(schedule_id)
+        if drop_all:
+            drop_route_searches()
+    transaction.on_commit(invalidate)
+
+
+@receiver(signal=post_save, sender=RouteStation)
+@receiver(signal=post_delete, sender=RouteStation)
+@receiver(signal=post_save, sender=Price)
+@receiver(signal=post_delete, sender=Price)
+@receiver(signal=post_save, sender=DisallowedWay)
+@receiver(signal=post_delete, sender=DisallowedWay)
+def invalidate_timetable(
+    signal: ModelSignal,
+    sender: RouteStation | Price | DisallowedWay,
+    instance: RouteStation | Price | DisallowedWay,
+    **kwargs,
+):
+    route_id = instance.route_id
+    # the route can be found by searches it was not in
+    drop_all = (
+        (sender is RouteStation and signal is post_save)
+        or (sender is DisallowedWay and signal is post_delete)
+    )
+
+    def invalidate() -> None:
+        invalidate_route(route_id)
+        if drop_all:
+            drop_route_searches()
+    transaction.on_commit(invalidate)
+
+
+@receiver(signal=post_save, sender=RouteSchedule)
+@receiver(signal=post_delete, sender=RouteSchedule)
+@receiver(signal=post_save, sender=ScheduleStation)
+@receiver(signal=post_delete, sender=ScheduleStation)
+@receiver(signal=post_save, sender=SchedulePrice)
+@receiver(signal=post_delete, sender=SchedulePrice)
+@receiver(signal=post_save, sender=ScheduleDisallowedWay)
+@receiver(signal=post_delete, sender=ScheduleDisallowedWay)
+def invalidate_schedules(
+    signal: ModelSignal,
+    sender: RouteSchedule | ScheduleStation | SchedulePrice
+        | ScheduleDisallowedWay,
+    instance: RouteSchedule | ScheduleStation | SchedulePrice
+        | ScheduleDisallowedWay,
+    **kwargs,
+):
+    # a schedule can have departures in any search
+    transaction.on_commit(drop_route_searches)
+
+
+@receiver(signal=post_save, sender=Bus)
+def invalidate_bus_timetable(
+    signal: ModelSignal,
+    sender: Bus,
+    instance: Bus,
+    **kwargs,
+):
+    # seats are stored per route
+    transaction.on_commit(invalidate_route)
+
+
+@receiver(signal=post_save, sender=Operator)
+@receiver(signal=post_delete, sender=Operator)
+def invalidate_operators(
+    signal: ModelSignal,
+    sender: Operator,
+    instance: Operator,
+    **kwargs,
+):
+    telegram_id = instance.telegram_id
+    transaction.on_commit(
+        lambda: invalidation.publish('operators', telegram_id)
+    )
+
+
+@receiver(signal=post_save, sender=Station)
+@receiver(signal=post_delete, sender=Station)
+@receiver(signal=post_save, sender=Town)
+@receiver(signal=post_delete, sender=Town)
+def invalidate_stations(
+    signal: ModelSignal,
+    sender: Station | Town,
+    instance: Station | Town,
+    **kwargs,
+):
+    def invalidate() -> None:
+        invalidation.publish('stations')
+        drop_route_searches()
+    transaction.on_commit(invalidate)
@@ -1,3 +1,591 @@
-from django.test import TestCase
+import dataclasses
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from tgbot.config import DbConfig
+from tgbot.misc import schemas
+from tgbot.services import db
+from tgbot.services.async_db import async_db
+from tgbot.services.db_executor import db_executor
+from tgbot.services.journeys import ConnectionScan
+from tgbot.services.station_search import StationNameIndex, StationPrefixTrie
+from tgbot.services.timetable import RouteStop, RouteTimetable, Timetable
+from web.app import models
+
+
+def create_route() -> dict:
+    language = models.Language.objects.create(id=1, name='Українська', code='uk')
+    user = models.TelegramUser.objects.create(
+        telegram_id=1000, full_name='Тарас Шевченко', phone='+380000000000',
+        language=language,
+    )
+    stations = [
+        models.Station.objects.create(
+            name=f'Автостанція {i}',
+            town=models.Town.objects.create(name=f'Місто {i}'),
+            latitude=50 + i,
+            longitude=30 + i,
+        )
+        for i in range(3)
+    ]
+    bus = models.Bus.objects.create(
+        seats=20, name='Neoplan', numbers='AA0000AA', description='Опис',
+    )
+    bus.photos.add(models.BusPhotos.objects.create(photo='data/buses/1.jpg'))
+    bus.options.add(models.BusOption.objects.create(name='Wi-Fi'))
+    driver = models.Driver.objects.create(
+        telegram_id=2000, full_name='Іван Франко', phone='+380000000001',
+    )
+    route = models.Route.objects.create(
+        start_station=stations[0], end_station=stations[-1],
+        bus=bus, driver=driver,
+    )
+    departure_time = timezone.now() + datetime.timedelta(days=3)
+    for i, station in enumerate(stations):
+        models.RouteStation.objects.create(
+            route=route, station=station, station_index=i + 1,
+            departure_time=departure_time + datetime.timedelta(hours=i),
+        )
+    for i, from_station in enumerate(stations):
+        for to_station in stations[i + 1:]:
+            models.Price.objects.create(
+                route=route, from_station=from_station, to_station=to_station,
+                ticket_price=Decimal(100), package_price=Decimal(50),
+            )
+    ticket_type = models.TicketType.objects.create(name='Дитячий', discount=10)
+    passenger = models.Person.objects.create(
+        name='Леся', surname='Українка', telegram_user=user,
+    )
+    models.Ticket.objects.create(
+        owner=user, route=route, start_station=stations[0],
+        end_station=stations[1], type=ticket_type, passenger=passenger,
+        is_paid=True, is_booked=False, paid_time=timezone.now(),
+    )
+    return {
+        'user': user,
+        'stations': stations,
+        'route': route,
+        'departure_time': departure_time,
+    }
+
+
+def without_now(data):
+    '''Drops datetimes that schemas fill with now() for missing values'''
+    if isinstance(data, dict):
+        return {
+            key: without_now(value) for key, value in data.items()
+            if not (
+                isinstance(value, datetime.datetime)
+                and abs(value - timezone.now()) < datetime.timedelta(minutes=1)
+            )
+        }
+    if isinstance(data, list):
+        return [without_now(value) for value in data]
+    return data
+
+
+class AsyncDatabaseParityTest(TransactionTestCase):
+    def setUp(self):
+        self.data = create_route()
+
+    @classmethod
+    def tearDownClass(cls):
+        db_executor.close()
+        super().tearDownClass()
+
+    def assertSameSchemas(self, orm_result, async_result):
+        if not isinstance(orm_result, list):
+            orm_result, async_result = [orm_result], [async_result]
+        self.assertEqual(
+            without_now([schema.dict() for schema in orm_result]),
+            without_now([schema.dict() for schema in async_result]),
+        )
+
+    def run_async_db(self, method: str, *args):
+        async def run():
+            await async_db.setup(DbConfig(
+                host=connection.settings_dict['HOST'],
+                port=connection.settings_dict['PORT'],
+                user=connection.settings_dict['USER'],
+                password=connection.settings_dict['PASSWORD'],
+                database=connection.settings_dict['NAME'],
+                pool_size=2,
+            ))
+            try:
+                return await getattr(async_db, method)(*args)
+            finally:
+                await async_db.close()
+        return async_to_sync(run)()
+
+    def test_get_route(self):
+        stations = self.data['stations']
+        args = (stations[0].code, stations[2].code, self.data['route'].code)
+        self.assertSameSchemas(
+            db.get_route.func(*args),
+            self.run_async_db('get_route', *args),
+        )
+
+    def test_get_routes_from_to_in_date(self):
+        stations = self.data['stations']
+        args = (
+            stations[1].id,
+            stations[2].id,
+            timezone.localtime(self.data['departure_time']).date(),
+            self.data['user'].telegram_id,
+        )
+        orm_routes = db.get_routes_from_to_in_date.func(*args)
+        self.assertEqual(len(orm_routes), 1)
+        self.assertSameSchemas(
+            orm_routes, self.run_async_db('get_routes_from_to_in_date', *args),
+        )
+
+    def test_get_user_valid_tickets(self):
+        telegram_id = self.data['user'].telegram_id
+        orm_tickets = db.get_user_valid_tickets.func(telegram_id)
+        self.assertEqual(len(orm_tickets), 1)
+        self.assertSameSchemas(
+            orm_tickets,
+            self.run_async_db('get_user_valid_tickets', telegram_id),
+        )
+
+    def test_get_route_from_to_stations(self):
+        stations = self.data['stations']
+        args = (
+            stations[0].code,
+            stations[2].code,
+            self.data['route'].code,
+            self.data['user'].telegram_id,
+        )
+        orm_stations = db.get_route_from_to_stations.func(*args)
+        self.assertEqual(len(orm_stations), 3)
+        self.assertSameSchemas(
+            orm_stations,
+            self.run_async_db('get_route_from_to_stations', *args),
+        )
+
+
+class RouteSearchQueryTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data = create_route()
+
+    def add_route(self) -> models.Route:
+        route = self.data['route']
+        new_route = models.Route.objects.create(
+            start_station=route.start_station, end_station=route.end_station,
+            bus=route.bus, driver=route.driver,
+        )
+        for route_station in route.routestation_set.all():
+            models.RouteStation.objects.create(
+                route=new_route, station=route_station.station,
+                station_index=route_station.station_index,
+                departure_time=route_station.departure_time,
+            )
+        for price in route.price_set.all():
+            models.Price.objects.create(
+                route=new_route, from_station=price.from_station,
+                to_station=price.to_station, ticket_price=price.ticket_price,
+                package_price=price.package_price,
+            )
+        return new_route
+
+    def test_search_is_one_query(self):
+        stations = self.data['stations']
+        with self.assertNumQueries(1):
+            routes = list(
+                db.get_route_search_queryset(stations[0].id, stations[2].id)
+            )
+        self.assertEqual(len(routes), 1)
+        self.assertEqual(routes[0].available_seats, 19)
+        self.assertEqual(routes[0].ticket_price, 100)
+        self.assertEqual(
+            routes[0].departure_time, self.data['departure_time'],
+        )
+
+    def test_search_plan_has_no_subqueries(self):
+        stations = self.data['stations']
+        plan = (
+            db.get_route_search_queryset(stations[0].id, stations[2].id)
+            .filter(available_seats__gt=0)
+            .explain()
+        )
+        self.assertNotIn('SubPlan', plan)
+
+    def test_search_queries_do_not_grow_with_routes(self):
+        stations = self.data['stations']
+        args = (
+            stations[0].id,
+            stations[2].id,
+            timezone.localtime(self.data['departure_time']).date(),
+            self.data['user'].telegram_id,
+        )
+        with CaptureQueriesContext(connection) as one_route_queries:
+            self.assertEqual(len(db.get_routes_from_to_in_date.func(*args)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_route()
+            self.add_route()
+        with CaptureQueriesContext(connection) as three_routes_queries:
+            self.assertEqual(len(db.get_routes_from_to_in_date.func(*args)), 3)
+        self.assertEqual(
+            len(one_route_queries.captured_queries),
+            len(three_routes_queries.captured_queries),
+        )
+
+
+class TicketSegmentsTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.data = create_route()
+        self.ticket = models.Ticket.objects.get()
+
+    def get_seats_taken(self, start: int, end: int) -> int:
+        stations = self.data['stations']
+        return models.RouteSegmentOccupancy.get_seats_taken(
+            self.data['route'].id, stations[start].id, stations[end].id,
+        )
+
+    def test_saving_ticket_keeps_segments(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ticket.is_booked = True
+            self.ticket.save()
+            self.ticket.save(update_fields=['is_booked'])
+        self.assertEqual(callbacks, [])
+
+    def test_changing_stations_rebuilds_segments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.end_station = self.data['stations'][2]
+            self.ticket.save()
+        self.assertEqual(self.get_seats_taken(1, 2), 1)
+
+
+class NotifiedUsersPageTest(TestCase):
+    def test_pages_skip_users_without_notifications(self):
+        language = models.Language.objects.create(id=1, name='Українська', code='uk')
+        users = [
+            models.TelegramUser.objects.create(
+                telegram_id=1000 + i, full_name=f'Користувач {i}',
+                phone='+380000000000', language=language,
+                is_notifications_enabled=i % 3 != 0,
+            )
+            for i in range(10)
+        ]
+        pages, after_id = [], 0
+        while page := db.get_notified_users_after.func(after_id, 3):
+            pages.append(page)
+            after_id = page[-1][0]
+        self.assertEqual([len(page) for page in pages], [3, 3])
+        self.assertEqual(
+            [telegram_id for page in pages for _, telegram_id in page],
+            [user.telegram_id for user in users if user.is_notifications_enabled],
+        )
+
+
+def create_stations() -> list[schemas.Station]:
+    return [
+        schemas.Station(
+            id=i, name=name, town=schemas.Town(id=i, name=town),
+            code=str(1000 + i), latitude=0, longitude=0,
+        )
+        for i, (town, name) in enumerate([
+            ('Київ', 'АС Центральна'),
+            ('Київ', 'Видубичі'),
+            ('Львів', 'Двірцева площа'),
+            ('Кам\'янець-Подільський', 'АС'),
+        ])
+    ]
+
+
+class StationNameIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = StationNameIndex(create_stations())
+
+    def search(self, query: str) -> list[str]:
+        return [station.full_name for station in self.index.search(query)]
+
+    def test_finds_started_words(self):
+        self.assertEqual(
+            self.search('київ'), ['Київ-АС Центральна', 'Київ-Видубичі'],
+        )
+        self.assertEqual(self.search('вид'), ['Київ-Видубичі'])
+
+    def test_finds_names_with_typos(self):
+        self.assertEqual(self.search('львв'), ['Львів-Двірцева площа'])
+        self.assertEqual(
+            self.search('камянец'), ['Кам\'янець-Подільський-АС'],
+        )
+
+    def test_does_not_find_other_names(self):
+        self.assertEqual(self.search('одеса'), [])
+
+
+class StationPrefixTrieTest(SimpleTestCase):
+    def setUp(self):
+        self.trie = StationPrefixTrie(create_stations())
+
+    def complete(self, query: str) -> list[str]:
+        return [station.full_name for station in self.trie.complete(query)]
+
+    def test_completes_any_word_of_the_name(self):
+        self.assertEqual(
+            self.complete('ки'), ['Київ-АС Центральна', 'Київ-Видубичі'],
+        )
+        self.assertEqual(self.complete('под'), ['Кам\'янець-Подільський-АС'])
+
+    def test_completes_all_words_of_the_query(self):
+        self.assertEqual(
+            self.complete('ас к'),
+            ['Кам\'янець-Подільський-АС', 'Київ-АС Центральна'],
+        )
+        self.assertEqual(self.complete('київ львів'), [])
+
+    def test_gets_station_by_code(self):
+        self.assertEqual(self.trie.get_by_code('1002').name, 'Двірцева площа')
+        self.assertIsNone(self.trie.get_by_code('9999'))
+
+
+def create_route_timetable(
+    route_id: int,
+    stops: list[tuple[int, datetime.datetime]],
+    disallowed_ways: frozenset = frozenset(),
+) -> RouteTimetable:
+    return RouteTimetable(
+        id=route_id,
+        code=f'{route_id:04}',
+        bus_id=1,
+        seats=10,
+        stops=tuple(
+            RouteStop(station_id, station_index, departure_time)
+            for station_index, (station_id, departure_time) in enumerate(stops)
+        ),
+        prices={},
+        disallowed_ways=disallowed_ways,
+    )
+
+
+class ConnectionScanTest(SimpleTestCase):
+    def setUp(self):
+        self.start = timezone.make_aware(datetime.datetime(2030, 1, 1, 8))
+        hour = lambda hours: self.start + datetime.timedelta(hours=hours)
+        self.scan = ConnectionScan([
+            create_route_timetable(1, [(1, hour(0)), (2, hour(1)), (3, hour(2))]),
+            # leaves 5 minutes after route 1 comes
+            create_route_timetable(2, [(3, hour(2.1)), (4, hour(3))]),
+            create_route_timetable(3, [(3, hour(2.5)), (4, hour(4))]),
+            create_route_timetable(
+                4, [(5, hour(0)), (6, hour(1)), (7, hour(2))],
+                disallowed_ways=frozenset({(5, 7)}),
+            ),
+        ])
+
+    def search(self, start_station_id, end_station_id, **kwargs):
+        return self.scan.search(
+            start_station_id=start_station_id,
+            end_station_id=end_station_id,
+            after=self.start,
+            departure_before=self.start + datetime.timedelta(days=1),
+            arrival_before=self.start + datetime.timedelta(days=2),
+            min_transfer_time=datetime.timedelta(minutes=15),
+            **kwargs,
+        )
+
+    def legs(self, journey) -> list[tuple[int, int, int]]:
+        return [
+            (leg.route.id, leg.start_stop.station_id, leg.end_stop.station_id)
+            for leg in journey.legs
+        ]
+
+    def test_transfers_after_minimum_transfer_time(self):
+        journey = self.search(1, 4)
+        self.assertEqual(self.legs(journey), [(1, 1, 3), (3, 3, 4)])
+        self.assertEqual(journey.transfers, 1)
+        self.assertEqual(journey.arrival_time, self.start + datetime.timedelta(hours=4))
+
+    def test_skips_legs_without_free_seats(self):
+        self.assertIsNone(self.search(1, 4, seats_taken={(3, 0): 10}))
+        journey = self.search(1, 4, seats_taken={(1, 1): 9})
+        self.assertEqual([leg.available_seats for leg in journey.legs], [1, 10])
+
+    def test_keeps_disallowed_ways(self):
+        self.assertIsNone(self.search(5, 7))
+        self.assertEqual(self.legs(self.search(5, 6)), [(4, 5, 6)])
+
+    def test_window_adds_schedule_departures(self):
+        hour = lambda hours: self.start + datetime.timedelta(hours=hours)
+        departure = dataclasses.replace(
+            create_route_timetable(5, [(4, hour(4.5)), (8, hour(6))]),
+            id=None,
+        )
+        self.assertIsNone(self.search(1, 8))
+        self.scan = self.scan.window(
+            self.start, self.start + datetime.timedelta(days=2), [departure],
+        )
+        self.assertEqual(
+            self.legs(self.search(1, 8)),
+            [(1, 1, 3), (3, 3, 4), (None, 4, 8)],
+        )
+
+
+class RouteScheduleTest(TestCase):
+    def setUp(self):
+        self.data = create_route()
+        self.schedule = models.RouteSchedule.from_route(self.data['route'])
+        self.next_week = (
+            timezone.localdate(self.data['departure_time'])
+            + datetime.timedelta(weeks=1)
+        )
+
+    def get_local_departure_times(self, route: models.Route) -> list:
+        return [
+            timezone.localtime(departure_time).replace(tzinfo=None)
+            for departure_time in
+            models.RouteStation.objects
+            .filter(route=route)
+            .order_by('station_index')
+            .values_list('departure_time', flat=True)
+        ]
+
+    def test_route_is_first_departure(self):
+        route = models.Route.objects.get(id=self.data['route'].id)
+        self.assertEqual(route.schedule, self.schedule)
+        self.assertTrue(self.schedule.runs_on(self.next_week))
+        self.assertFalse(
+            self.schedule.runs_on(self.next_week + datetime.timedelta(days=1))
+        )
+
+    def test_parses_departure_code(self):
+        code = self.schedule.get_departure_code(self.next_week)
+        self.assertEqual(
+            models.RouteSchedule.parse_departure_code(code),
+            (self.schedule.code, self.next_week),
+        )
+        self.assertIsNone(
+            models.RouteSchedule.parse_departure_code(self.data['route'].code)
+        )
+
+    def test_materializes_departure_once(self):
+        route = self.schedule.materialize(self.next_week)
+        self.assertEqual(
+            route.code, self.schedule.get_departure_code(self.next_week),
+        )
+        self.assertEqual(
+            self.get_local_departure_times(route),
+            [
+                departure_time + datetime.timedelta(weeks=1)
+                for departure_time in
+                self.get_local_departure_times(self.data['route'])
+            ],
+        )
+        self.assertEqual(models.Price.objects.filter(route=route).count(), 3)
+        self.assertEqual(self.schedule.materialize(self.next_week), route)
+
+    def test_copies_disallowed_ways(self):
+        stations = self.data['stations']
+        models.DisallowedWay.objects.create(
+            route=self.data['route'],
+            from_station=stations[0],
+            to_station=stations[1],
+        )
+        schedule = models.RouteSchedule.from_route(self.data['route'])
+        route = schedule.materialize(self.next_week)
+        self.assertEqual(
+            list(
+                models.DisallowedWay.objects
+                .filter(route=route)
+                .values_list('from_station', 'to_station')
+            ),
+            [(stations[0].id, stations[1].id)],
+        )
+
+    def test_books_departure_without_route(self):
+        stations = self.data['stations']
+        ticket_type = models.TicketType.objects.get()
+        tickets = db.book_tickets.func(
+            route_id=None,
+            start_station_id=stations[0].id,
+            end_station_id=stations[2].id,
+            telegram_id=self.data['user'].telegram_id,
+            passengers=[
+                (
+                    schemas.Person(
+                        id=1, name='Іван', surname='Франко', phone=None,
+                    ),
+                    ticket_type.id,
+                ),
+            ],
+            route_code=self.schedule.get_departure_code(self.next_week),
+        )
+        route = models.Route.objects.get(
+            schedule=self.schedule, departure_date=self.next_week,
+        )
+        self.assertEqual(
+            models.Ticket.objects.get(id=tickets[0].id).route, route,
+        )
+        self.assertEqual(
+            models.RouteSegmentOccupancy.get_seats_taken(
+                route.id, stations[0].id, stations[2].id,
+            ),
+            1,
+        )
+
+    def test_expands_schedule_departures(self):
+        def get_departures():
+            return Timetable._parse_departures(
+                db.get_schedule_timetable_rows.func(
+                    self.next_week - datetime.timedelta(days=1),
+                    self.next_week + datetime.timedelta(days=1),
+                ),
+                self.next_week - datetime.timedelta(days=1),
+                self.next_week + datetime.timedelta(days=1),
+            )
+
+        departures = get_departures()
+        self.assertEqual(
+            [departure.code for departure in departures],
+            [self.schedule.get_departure_code(self.next_week)],
+        )
+        self.assertEqual(
+            [
+                timezone.localtime(stop.departure_time).replace(tzinfo=None)
+                for stop in departures[0].stops
+            ],
+            [
+                departure_time + datetime.timedelta(weeks=1)
+                for departure_time in
+                self.get_local_departure_times(self.data['route'])
+            ],
+        )
+        self.schedule.materialize(self.next_week)
+        self.assertEqual(get_departures(), [])
+
+    def test_creates_many_schedules(self):
+        for _ in range(500):
+            models.RouteSchedule.from_route(self.data['route'])
+        codes = models.RouteSchedule.objects.values_list('code', flat=True)
+        self.assertEqual(len(set(codes)), 501)
+
+    def test_regenerates_taken_code(self):
+        schedule = models.RouteSchedule.objects.create(
+            code=self.schedule.code,
+            start_station_id=self.schedule.start_station_id,
+            end_station_id=self.schedule.end_station_id,
+            bus_id=self.schedule.bus_id,
+            driver_id=self.schedule.driver_id,
+            weekdays='1',
+            valid_from=self.next_week,
+        )
+        self.assertNotEqual(schedule.code, self.schedule.code)
+
+    def test_finds_schedules_between_stations(self):
+        stations = self.data['stations']
+        self.assertTrue(
+            db.has_schedules_between.func(stations[0].id, stations[2].id)
+        )
+        self.assertFalse(
+            db.has_schedules_between.func(stations[2].id, stations[0].id)
+        )
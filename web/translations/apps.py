@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TranslationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'web.translations'
+
+    def ready(self) -> None:
+        from . import signals
@@ -0,0 +1,33 @@
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import post_save, post_delete, ModelSignal
+
+from ..translations.models import (
+    TicketTypeTranslations, BusTranslation, BusOptionTranslation,
+    StationTranslations, TownTranslations,
+)
+from tgbot.services import invalidation
+from tgbot.services.search_cache import drop_route_searches
+
+
+@receiver(signal=post_save, sender=TicketTypeTranslations)
+@receiver(signal=post_delete, sender=TicketTypeTranslations)
+@receiver(signal=post_save, sender=BusTranslation)
+@receiver(signal=post_delete, sender=BusTranslation)
+@receiver(signal=post_save, sender=BusOptionTranslation)
+@receiver(signal=post_delete, sender=BusOptionTranslation)
+@receiver(signal=post_save, sender=StationTranslations)
+@receiver(signal=post_delete, sender=StationTranslations)
+@receiver(signal=post_save, sender=TownTranslations)
+@receiver(signal=post_delete, sender=TownTranslations)
+def invalidate_translations(
+    signal: ModelSignal,
+    sender: type[Model],
+    instance: Model,
+    **kwargs,
+):
+    def invalidate() -> None:
+        invalidation.publish('translations', instance.language_id)
+        drop_route_searches()
+    transaction.on_commit(invalidate)
@@ -33,6 +33,8 @@ ALLOWED_HOSTS = ['*']
 
 CSRF_TRUSTED_ORIGINS = config.misc.csrf_trusted_origins
 
+REDIS_URL = config.redis.url
+
 
 DJANGO_ALLOW_ASYNC_UNSAFE = True
 # Application definition
@@ -109,7 +111,9 @@ DATABASES = {
         'PASSWORD': config.db.password,
         'USER': config.db.user,
         'HOST': config.db.host,
-        'PORT': 5432,
+        'PORT': config.db.port,
+        'CONN_MAX_AGE': config.db.conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 